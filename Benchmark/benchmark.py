@@ -0,0 +1,154 @@
+import argparse
+import json
+import platform
+import sys
+import numpy as np
+import scipy
+from Benchmark.generators import CASES, generate_case
+from Driver.initialization.initialization import initialize_tower_from_dict
+from Driver.modeling.tower_modeling import tower_building
+from Utils.Progress import Progress, StageReport
+
+# 比较时间时忽略基准值小于该值(s)的阶段, 避免计时噪声造成误报
+MIN_TIME = 0.005
+# 比较内存时忽略基准值小于该值(bytes)的阶段
+MIN_MEMORY = 1 << 20
+
+
+def _run_once(case, max_length, frequency, trace_memory):
+    report = StageReport()
+    progress = Progress([report], trace_memory)
+    tower = initialize_tower_from_dict(case, max_length, progress=progress)
+    tower_building(tower, frequency, max_length, progress=progress)
+    return tower, report
+
+
+def run_case(name, size, max_length=20, frequency=2e4, repeat=3, trace_memory=True):
+    """
+    【函数功能】生成一个基准用例并运行initialize_tower和tower_building, 统计各阶段和各计算函数调用的耗时和内存
+    【入参】
+    name(str): 用例名称(CASES的键)
+    size(int): 用例规模
+    max_length(float): 线段的最大长度
+    frequency(float): 频率
+    repeat(int): 计时的重复次数, 各阶段取最小耗时
+    trace_memory(bool): 是否另外运行一次统计tracemalloc内存峰值(不计入耗时)
+
+    【出参】
+    record(dict): wires、branches、nodes为模型规模, stages为各阶段的elapsed、cpu、traced_peak及结果矩阵大小;
+                  同名阶段(如多次调用的计算函数)的耗时相加
+    """
+    case = generate_case(name, size)
+    stages = {}
+    for _ in range(max(1, repeat)):
+        tower, report = _run_once(case, max_length, frequency, False)
+        totals = {}
+        for record in report.stages:
+            total = totals.setdefault(record['stage'], {'elapsed': 0.0, 'cpu': 0.0})
+            total['elapsed'] += record['elapsed']
+            total['cpu'] += record['cpu']
+            total.update({key: record[key] for key in ('shape', 'nnz', 'nbytes') if key in record})
+        for stage, total in totals.items():
+            if stage not in stages or total['elapsed'] < stages[stage]['elapsed']:
+                stages[stage] = total
+    if trace_memory:
+        _, report = _run_once(case, max_length, frequency, True)
+        for record in report.stages:
+            stage = stages[record['stage']]
+            stage['traced_peak'] = max(stage.get('traced_peak', 0), record['traced_peak'])
+    return {'wires': len(case['Tower']['Wire']), 'branches': tower.wires.count(), 'nodes': tower.wires.count_distinct_points(), 'stages': stages}
+
+
+def run_benchmarks(cases=None, sizes=(1, 2, 4), **options):
+    """
+    【函数功能】对各用例按各规模运行run_case, 得到耗时和内存随规模变化的曲线
+    【入参】
+    cases(iterable): 用例名称, 默认为全部用例
+    sizes(iterable): 用例规模
+    options: run_case的其他参数
+
+    【出参】
+    results(dict): environment为运行环境, options为参数, cases[name][str(size)]为run_case的结果
+    """
+    results = {'environment': {'python': platform.python_version(), 'numpy': np.__version__, 'scipy': scipy.__version__,
+                               'machine': platform.machine(), 'system': platform.system()},
+               'options': dict(options), 'cases': {}}
+    for name in cases or CASES:
+        results['cases'][name] = {str(size): run_case(name, size, **options) for size in sizes}
+    return results
+
+
+def compare(results, baseline, tolerance=1.5, min_time=MIN_TIME, min_memory=MIN_MEMORY):
+    """
+    【函数功能】与保存的基准结果比较, 找出耗时或内存峰值超过基准tolerance倍的阶段
+    【入参】
+    results, baseline(dict): run_benchmarks的结果
+    tolerance(float): 允许的倍数
+    min_time(float): 忽略基准耗时小于该值(s)的阶段
+    min_memory(int): 忽略基准内存峰值小于该值(bytes)的阶段
+
+    【出参】
+    regressions(list): 每项为(case, size, stage, metric, baseline, current)
+    """
+    regressions = []
+    for name, curve in results['cases'].items():
+        for size, record in curve.items():
+            base_record = baseline.get('cases', {}).get(name, {}).get(size)
+            if base_record is None:
+                continue
+            for stage, values in record['stages'].items():
+                base_values = base_record['stages'].get(stage)
+                if base_values is None:
+                    continue
+                for metric, threshold in (('elapsed', min_time), ('traced_peak', min_memory)):
+                    if metric in values and metric in base_values and base_values[metric] >= threshold \
+                            and values[metric] > tolerance * base_values[metric]:
+                        regressions.append((name, size, stage, metric, base_values[metric], values[metric]))
+    return regressions
+
+
+def format_results(results, stage="tower building"):
+    """
+    【函数功能】把各用例的曲线格式化为表格(每个规模一行)
+    """
+    lines = ['{:<14}{:>6}{:>8}{:>10}{:>8}{:>12}{:>12}{:>14}'.format('case', 'size', 'wires', 'branches', 'nodes', 'elapsed/s', 'cpu/s', 'peak/MB')]
+    for name, curve in results['cases'].items():
+        for size, record in curve.items():
+            values = record['stages'].get(stage, {})
+            peak = values.get('traced_peak')
+            lines.append('{:<14}{:>6}{:>8}{:>10}{:>8}{:>12.4f}{:>12.4f}{:>14}'.format(
+                name, size, record['wires'], record['branches'], record['nodes'], values.get('elapsed', float('nan')),
+                values.get('cpu', float('nan')), '-' if peak is None else '{:.2f}'.format(peak / 2 ** 20)))
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="杆塔建模的基准测试: 程序生成不同规模的杆塔并统计各阶段的耗时和内存")
+    parser.add_argument('--cases', nargs='+', choices=sorted(CASES), default=list(CASES), help="用例名称")
+    parser.add_argument('--sizes', nargs='+', type=int, default=[1, 2, 4], help="用例规模")
+    parser.add_argument('--repeat', type=int, default=3, help="计时的重复次数")
+    parser.add_argument('--max-length', type=float, default=20, help="线段的最大长度")
+    parser.add_argument('--frequency', type=float, default=2e4, help="频率")
+    parser.add_argument('--no-memory', action='store_true', help="不统计tracemalloc内存峰值")
+    parser.add_argument('--output', help="保存结果的JSON文件, 可作为以后比较的基准")
+    parser.add_argument('--baseline', help="与之比较的基准结果JSON文件")
+    parser.add_argument('--tolerance', type=float, default=1.5, help="允许超过基准的倍数")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.cases, args.sizes, max_length=args.max_length, frequency=args.frequency,
+                             repeat=args.repeat, trace_memory=not args.no_memory)
+    print(format_results(results))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for name, size, stage, metric, base, current in regressions:
+            print('regression: {} size={} [{}] {}: {:.4g} -> {:.4g}'.format(name, size, stage, metric, base, current))
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,136 @@
+import numpy as np
+
+# 生成与Data/*.json格式相同的杆塔字典, 用于基准测试
+# 所有生成的杆塔都带一根(且只有一根)电缆, 与Tower中管状线段唯一的约定一致
+
+GROUND = {'glb': 1, 'sig': 0.001, 'mur': 1, 'epr': 4, 'gnd_model': 'Lossy',
+          'ionisation_intensity': 'weak', 'ionisation_model': 'isolational'}
+
+
+class _WireList:
+    def __init__(self):
+        """
+        【函数功能】依次生成线段的支路名和节点名(按坐标共用节点), 保证同一杆塔中的名字唯一
+        """
+        self.wires = []
+        self._nodes = {}
+        self._bran_count = 0
+
+    def node(self, position):
+        key = tuple(np.round(position, 6))
+        if key not in self._nodes:
+            self._nodes[key] = 'X{:04d}'.format(len(self._nodes) + 1)
+        return self._nodes[key]
+
+    def bran(self):
+        self._bran_count += 1
+        return 'Y{:04d}'.format(self._bran_count)
+
+    def add(self, wire_type, pos_1, pos_2, r0=0.005, sig=5.8e7, mur=1, epr=1, **fields):
+        wire = {'type': wire_type, 'bran': self.bran(), 'node1': self.node(pos_1), 'node2': self.node(pos_2),
+                'pos_1': [float(x) for x in pos_1], 'pos_2': [float(x) for x in pos_2],
+                'oft': 0, 'r0': r0, 'rs2': None, 'rs3': None, 'r': 1, 'l': 0, 'sig': sig, 'mur': mur, 'epr': epr,
+                'model1': 0, 'model2': 2000, 'b0': None, 'n1': None, 'n2': None}
+        wire.update(fields)
+        self.wires.append(wire)
+        return wire
+
+
+def _tower_body(wires, height, levels, width):
+    """
+    【函数功能】四根主材、每层水平横材和单斜材构成的格构式塔身, 返回各层的高度
+    """
+    corners = np.array([[-1, -1], [1, -1], [1, 1], [-1, 1]]) * width / 2
+    heights = np.linspace(0, height, levels + 1)
+    for lower, upper in zip(heights[:-1], heights[1:]):
+        for k in range(4):
+            x0, y0 = corners[k]
+            x1, y1 = corners[(k + 1) % 4]
+            wires.add('air', (x0, y0, lower), (x0, y0, upper))
+            wires.add('air', (x0, y0, upper), (x1, y1, upper))
+            wires.add('air', (x0, y0, lower), (x1, y1, upper))
+    return heights
+
+
+def generate_tower(levels=4, height=30.0, width=2.0, circuits=1, spans=0, span_length=300.0, grid=0, grid_spacing=5.0,
+                   grid_depth=0.8, cores=3, cable_length=100.0):
+    """
+    【函数功能】程序生成一基杆塔(Data/*.json格式), 各部分的规模可单独设置
+    【入参】
+    levels(int): 塔身的层数, 每层12根线段
+    height(float): 塔高(m)
+    width(float): 塔身宽度(m)
+    circuits(int): 回路数, 每回3相导线挂在塔身两侧的横担上, 塔顶一根地线
+    spans(int): 杆塔两侧各挂的档数, 0时不生成导线和地线
+    span_length(float): 档距(m)
+    grid(int): 接地网每边的网格数, 0时不生成接地网
+    grid_spacing(float): 接地网网格的边长(m)
+    grid_depth(float): 接地网埋深(m)
+    cores(int): 电缆的芯线数
+    cable_length(float): 电缆长度(m)
+
+    【出参】
+    case(dict): 与Data/*.json格式相同的字典
+    """
+    wires = _WireList()
+    heights = _tower_body(wires, height, levels, width)
+
+    # 横担和导线: 回路交替挂在塔身两侧, 自上而下每相一层横担
+    arm = width / 2 + 2.0
+    arm_heights = heights[:0:-1]
+    for circuit in range(circuits):
+        side = 1 if circuit % 2 == 0 else -1
+        for phase in range(3):
+            z = arm_heights[(circuit // 2 * 3 + phase) % len(arm_heights)]
+            tip = (0, side * (arm + circuit // 2), z)
+            wires.add('air', (0, side * width / 2, z), tip)
+            if spans:
+                # 导线经1m绝缘子串悬挂, 与杆塔不相连
+                conductor = (0, tip[1], z - 1.0)
+                wires.add('air', (-spans * span_length, tip[1], z - 1.0), conductor, r0=0.0135, sig=3.5e7)
+                wires.add('air', conductor, (spans * span_length, tip[1], z - 1.0), r0=0.0135, sig=3.5e7)
+    if spans:
+        top = (0, 0, height + 3.0)
+        wires.add('air', (0, 0, height), top)
+        wires.add('air', (-spans * span_length, 0, top[2]), top, r0=0.0055, sig=2.0e7)
+        wires.add('air', top, (spans * span_length, 0, top[2]), r0=0.0055, sig=2.0e7)
+
+    # 接地网: 埋深grid_depth的方格网, 以杆塔中心为中心
+    if grid:
+        coordinates = (np.arange(grid + 1) - grid / 2) * grid_spacing
+        for a in coordinates:
+            for lower, upper in zip(coordinates[:-1], coordinates[1:]):
+                wires.add('ground', (a, lower, -grid_depth), (a, upper, -grid_depth), prob=None)
+                wires.add('ground', (lower, a, -grid_depth), (upper, a, -grid_depth), prob=None)
+
+    # 电缆: 与01_2相同的布置和参数, 从塔身第一层引下线接到离塔10m处竖直向上的电缆, 芯线沿圆周均匀分布
+    start, end = (width / 2 + 10.0, -width / 2, 0), (width / 2 + 10.0, -width / 2, cable_length)
+    wires.add('air', (width / 2, -width / 2, heights[1]), start)
+    sheath = wires.add('sheath', start, end, r0=2, sig=1e7, mur=50, rs2=2.05, rs3=2.1, num=cores, prob=None)
+    core_list = []
+    for k in range(cores):
+        core = {'type': 'core', 'bran': wires.bran(), 'node1': 'C{}_{}_1'.format(sheath['bran'], k), 'node2': 'C{}_{}_2'.format(sheath['bran'], k),
+                'pos_1': list(sheath['pos_1']), 'pos_2': list(sheath['pos_2']), 'oft': 0, 'r0': 0.0087, 'r': 1, 'l': 0,
+                'sig': 5.8e7, 'mur': 1, 'epr': 1, 'rs2': 1.9, 'rs3': 360.0 * k / cores}
+        core_list.append(core)
+    wires.wires.remove(sheath)
+    wires.wires.append({'type': 'tube', 'sheath': sheath, 'core': core_list})
+
+    info = {'id': '1', 'type': 'synthetic', 'position': [0, 0, 0], 'pole_height': height}
+    return {'user_id': 'benchmark', 'case_id': 0, 'Tower': {'info': info, 'ground': dict(GROUND), 'Wire': wires.wires}}
+
+
+# 各基准用例: 名称 -> 规模size对应的generate_tower参数
+CASES = {
+    'tower': lambda size: {'levels': 2 * size},
+    'line': lambda size: {'circuits': 2 * size, 'spans': 1},
+    'counterpoise': lambda size: {'grid': 2 * size},
+    'cable': lambda size: {'cores': size + 2, 'cable_length': 50.0 * size},
+}
+
+
+def generate_case(name, size):
+    """
+    【函数功能】按基准用例名称和规模生成杆塔字典
+    """
+    return generate_tower(**CASES[name](size))
@@ -1,16 +1,22 @@
 import json
 import numpy as np
-from Model.Node import Node
+from Model.Node import Node, NodeRegistry
 from Model.Wires import Wire, Wires, CoreWire, TubeWire
 from Model.Ground import Ground
 from Model.Tower import Tower
+from Utils.Progress import QUIET
 
 def connect_nodes(nodes, node1):
-    for node in nodes:
-        name = node.name
-        if node1.name == name:
-            return node
-    return False
+    """
+    【函数功能】注册节点, 同名(或在注册表容差内坐标重合)的节点已存在时返回已有节点, 使相连线段共用同一节点对象
+    【入参】
+    nodes(NodeRegistry): 节点注册表
+    node1(Node): 新建的节点
+
+    【出参】
+    node(Node): 注册表中的节点
+    """
+    return nodes.add(node1)
 
 # initialize wire in tower
 def initialize_wire(wire, nodes):
@@ -21,18 +27,8 @@ def initialize_wire(wire, nodes):
     pos_end = wire['pos_2']
     node_start = Node(node_name_start, pos_start[0], pos_start[1], pos_start[2])
     node_end = Node(node_name_end, pos_end[0], pos_end[1], pos_end[2])
-    connect_start = connect_nodes(nodes,node_start)
-    connect_end = connect_nodes(nodes, node_end)
-
-    if connect_start:
-        node_start = connect_start
-    else:
-        nodes.append(node_start)
-
-    if connect_end:
-        node_end = connect_end
-    else:
-        nodes.append(node_end)
+    node_start = connect_nodes(nodes, node_start)
+    node_end = connect_nodes(nodes, node_end)
 
     offset = wire['oft']
     radius = wire['r0']
@@ -65,56 +61,69 @@ def initialize_ground(ground_dic):
     model = ground_dic['gnd_model']
     ionisation_intensity = ground_dic['ionisation_intensity']
     ionisation_model = ground_dic['ionisation_model']
+    # 双层土壤(可选): 下层电导率和上层厚度
+    sig2 = ground_dic.get('sig2')
+    thickness = ground_dic.get('thickness')
 
-    return Ground(sig, mur, epr, model, ionisation_intensity, ionisation_model)
+    return Ground(sig, mur, epr, model, ionisation_intensity, ionisation_model, sig2, thickness)
 
 
-def initialize_tower(file_name, max_length):
+def initialize_tower(file_name, max_length, merge_tol=None, progress=QUIET):
     json_file_path = "Data/" + file_name + ".json"
     # 0. read json file
     with open(json_file_path, 'r') as j:
         load_dict = json.load(j)
-
-    # 1. initialize wires
-    wires = Wires()
-    tube_wire = TubeWire(None, None, None, None)
-    nodes = []
-    for wire in load_dict['Tower']['Wire']:
-
-        # 1.1 initialize air wire
-        if wire['type'] == 'air':
-            wire_air = initialize_wire(wire, nodes)
-            wires.add_air_wire(wire_air)  # add air wire in wires
-
-        # 1.2 initialize ground wire
-        elif wire['type'] == 'ground':
-            wire_ground = initialize_wire(wire, nodes)
-            wires.add_ground_wire(wire_ground)  # add ground wire in wires
-
-        # 1.3 initialize tube
-        elif wire['type'] == 'tube':
-            sheath_wire = initialize_wire(wire['sheath'], nodes)
-            tube_wire = TubeWire(sheath_wire, wire['sheath']['rs2'], wire['sheath']['rs3'], wire['sheath']['num'])
-
-            for core in wire['core']:
-                core_wire = initialize_wire(core, nodes)
-                tube_wire.add_core_wire(core_wire)
-
-            wires.add_tube_wire(tube_wire)  # add tube in wires
+    return initialize_tower_from_dict(load_dict, max_length, merge_tol, progress, file_name)
+
+
+def initialize_tower_from_dict(load_dict, max_length, merge_tol=None, progress=QUIET, file_name=None):
+    # load_dict: 与Data/*.json格式相同的字典(如程序生成的杆塔)
+    # progress: 进度事件(Utils.Progress.Progress), 默认不输出; 不再逐条打印线段
+    with progress.stage("tower loading", file=file_name) as info:
+        # 1. initialize wires
+        # 节点注册表由初始化和线段切分共用, merge_tol给出时坐标重合的节点合并
+        nodes = NodeRegistry(merge_tol)
+        wires = Wires(nodes=nodes)
+        tube_wire = TubeWire(None, None, None, None)
+        for wire in load_dict['Tower']['Wire']:
+
+            # 1.1 initialize air wire
+            if wire['type'] == 'air':
+                wire_air = initialize_wire(wire, nodes)
+                wires.add_air_wire(wire_air)  # add air wire in wires
+
+            # 1.2 initialize ground wire
+            elif wire['type'] == 'ground':
+                wire_ground = initialize_wire(wire, nodes)
+                wires.add_ground_wire(wire_ground)  # add ground wire in wires
+
+            # 1.3 initialize tube
+            elif wire['type'] == 'tube':
+                sheath_wire = initialize_wire(wire['sheath'], nodes)
+                tube_wire = TubeWire(sheath_wire, wire['sheath']['rs2'], wire['sheath']['rs3'], wire['sheath']['num'])
+
+                for core in wire['core']:
+                    core_wire = initialize_wire(core, nodes)
+                    tube_wire.add_core_wire(core_wire)
+
+                wires.add_tube_wire(tube_wire)  # add tube in wires
+        info.update(wires=wires.count(), nodes=len(nodes))
 
     # ---对所有线段进行切分----
-    wires.display()
-    wires.split_long_wires_all(max_length)
+    with progress.stage("wire splitting", max_length=max_length) as info:
+        wires.split_long_wires_all(max_length)
+
+        # 将表皮线段添加到空气线段集合中
+        for tubeWire in wires.tube_wires:
+            wires.add_air_wire(tubeWire.sheath)  # sheath wire is in the air, we need to calculate it in air part.
+        info.update(wires=wires.count())
 
-    # 将表皮线段添加到空气线段集合中
-    for tubeWire in wires.tube_wires:
-        wires.add_air_wire(tubeWire.sheath)  # sheath wire is in the air, we need to calculate it in air part.
-    wires.display()
     # 2. initialize ground
     ground_dic = load_dict['Tower']['ground']
     ground = initialize_ground(ground_dic)
 
     # 3. initalize tower
-    tower = Tower(None, wires, tube_wire, None, ground, None, None)
-    print("Tower loaded.")
+    with progress.stage("tower initialization") as info:
+        tower = Tower(None, wires, tube_wire, None, ground, None, None)
+        info.update(nodes=len(tower.nodesList), branches=len(tower.bransList))
     return tower
\ No newline at end of file
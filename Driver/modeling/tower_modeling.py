@@ -1,162 +1,373 @@
 import numpy as np
-from Function.Calculators.Inductance import calculate_coreWires_inductance, calculate_sheath_inductance, calculate_wires_inductance_potential_with_ground
+from Function.Calculators.Inductance import calculate_coreWires_inductance, calculate_sheath_inductance, calculate_wires_inductance_potential_incremental, \
+    calculate_wires_inductance_potential_hmatrix
 from Function.Calculators.Capacitance import calculate_coreWires_capacitance, calculate_sheath_capacitance
-from Function.Calculators.Impedance import calculate_coreWires_impedance, calculate_sheath_impedance, calculate_multual_impedance
+from Function.Calculators.Impedance import calculate_coreWires_impedance, calculate_sheath_impedance, calculate_multual_impedance, \
+    calculate_wires_ground_corrections
 from Model.Contant import Constant
+from Utils.Matrix import scatter_blocks
+from Utils.HMatrix import HMatrix, ExpandedHMatrix
+from Utils.Progress import QUIET, Progress, StageReport
 from scipy.linalg import block_diag
 
 
-def build_incidence_matrix(tower):
+def build_incidence_matrix(tower, progress=QUIET):
     # A矩阵
-    print("------------------------------------------------")
-    print("A matrix is building...")
+    with progress.stage("A matrix") as info:
+        tower.initialize_incidence_matrix()
+        info["matrix"] = tower.incidence_matrix
 
-    tower.initialize_incidence_matrix()
 
-    print(tower.incidence_matrix)
-    print("A matrix is built successfully")
-    print("------------------------------------------------")
+def build_resistance_matrix(tower, Rin, Rx, progress=QUIET, compressed=False):
+    # R矩阵, compressed时为稀疏矩阵
+    with progress.stage("R matrix") as info:
+        if compressed:
+            tower.initialize_sparse_resistance_matrix(Rin, Rx)
+        else:
+            tower.initialize_resistance_matrix()
 
+            tower.expand_resistance_matrix()
 
-def build_resistance_matrix(tower, Rin, Rx):
-    # R矩阵
-    print("------------------------------------------------")
-    print("R matrix is building...")
+            tower.update_resistance_matrix_by_tubeWires(Rin, Rx)
+        info["matrix"] = tower.resistance_matrix
 
-    tower.initialize_resistance_matrix()
 
-    tower.expand_resistance_matrix()
+def build_inductance_matrix(tower, L, Lin, Lx, progress=QUIET):
+    # L矩阵, L为分层矩阵时不展开(ExpandedHMatrix)
+    with progress.stage("L matrix") as info:
+        if isinstance(L, HMatrix):
+            tower.initialize_inductance_hmatrix(L, Lin, Lx)
+        else:
+            tower.initialize_inductance_matrix()
 
-    tower.update_resistance_matrix_by_tubeWires(Rin, Rx)
+            tower.add_inductance_matrix(L)
 
-    print(tower.resistance_matrix)
-    print("R matrix is built successfully")
-    print("------------------------------------------------")
+            tower.expand_inductance_matrix()
 
+            sheath_inductance_matrix = tower.update_inductance_matrix_by_coreWires()
 
-def build_inductance_matrix(tower, L, Lin, Lx):
-    # L矩阵
-    print("------------------------------------------------")
-    print("L matrix is building...")
+            tower.update_inductance_matrix_by_tubeWires(sheath_inductance_matrix, Lin, Lx)
+        info["matrix"] = tower.inductance_matrix
 
-    tower.initialize_inductance_matrix()
 
-    tower.add_inductance_matrix(L)
+def build_potential_matrix(tower, P, progress=QUIET):
+    # P矩阵, P为分层矩阵时直接使用
+    with progress.stage("P matrix") as info:
+        if isinstance(P, HMatrix):
+            tower.potential_hmatrix = tower.potential_matrix = P
+        else:
+            tower.initialize_potential_matrix()
 
-    tower.expand_inductance_matrix()
+            tower.add_potential_matrix(P)
+        info["matrix"] = tower.potential_matrix
 
-    sheath_inductance_matrix = tower.update_inductance_matrix_by_coreWires()
 
-    tower.update_inductance_matrix_by_tubeWires(sheath_inductance_matrix, Lin, Lx)
+def build_capacitance_matrix(tower, Cin, progress=QUIET, compressed=False):
+    # C矩阵, compressed时为稀疏矩阵
+    with progress.stage("C matrix") as info:
+        if compressed:
+            tower.initialize_sparse_capacitance_matrix(Cin)
+        else:
+            tower.initialize_capacitance_matrix()
 
-    print(tower.inductance_matrix)
-    print("L matrix is built successfully")
-    print("------------------------------------------------")
+            tower.update_capacitance_matrix_by_tubeWires(Cin)
+        info["matrix"] = tower.capacitance_matrix
 
 
-def build_potential_matrix(tower, P):
-    # P矩阵
-    print("------------------------------------------------")
-    print("P matrix is building...")
+def calculate(progress, calculator, *args):
+    # 调用计算函数, 以函数名为阶段名记录耗时和结果大小
+    with progress.stage(calculator.__name__) as info:
+        result = calculator(*args)
+        info["matrix"] = result
+    return result
 
-    tower.initialize_potential_matrix()
 
-    tower.add_potential_matrix(P)
-
-    print(tower.potential_matrix)
-    print("P matrix is built successfully")
-    print("------------------------------------------------")
-
-
-def build_capacitance_matrix(tower, Cin):
-    # C矩阵
-    print("------------------------------------------------")
-    print("C matrix is building...")
-
-    tower.initialize_capacitance_matrix()
-
-    tower.update_capacitance_matrix_by_tubeWires(Cin)
-
-    print(tower.capacitance_matrix)
-    print("C matrix is built successfully")
-    print("------------------------------------------------")
-
-
-def build_impedance_matrix(tubeWire, frequency):
+def build_impedance_matrix(tubeWire, frequency, progress=QUIET):
     # 计算套管和芯线内部的阻抗矩阵
+    # frequency为数组时各矩阵按频率堆叠为(Nf*m*m), 所有频率一次计算
+    frequencies = np.atleast_1d(np.asarray(frequency, dtype=float))
     # Core wires impedance
-    Zc = calculate_coreWires_impedance(tubeWire.get_coreWires_radii(), tubeWire.get_coreWires_innerOffset(), tubeWire.get_coreWires_innerAngle(), tubeWire.get_coreWires_mur(),
-                                       tubeWire.get_coreWires_sig(), tubeWire.sheath.mur, tubeWire.sheath.sig, tubeWire.inner_radius, frequency)
+    Zc = calculate(progress, calculate_coreWires_impedance, tubeWire.get_coreWires_radii(), tubeWire.get_coreWires_innerOffset(), tubeWire.get_coreWires_innerAngle(),
+                   tubeWire.get_coreWires_mur(), tubeWire.get_coreWires_sig(), tubeWire.sheath.mur, tubeWire.sheath.sig, tubeWire.inner_radius, frequencies)
 
     # Sheath impedance
-    Zs = calculate_sheath_impedance(tubeWire.sheath.mur, tubeWire.sheath.sig, tubeWire.inner_radius, tubeWire.sheath.r, frequency)
+    Zs = calculate(progress, calculate_sheath_impedance, tubeWire.sheath.mur, tubeWire.sheath.sig, tubeWire.inner_radius, tubeWire.sheath.r, frequencies)
 
     # Multual impedance
-    Zcs, Zsc = calculate_multual_impedance(tubeWire.get_coreWires_radii(), tubeWire.sheath.mur, tubeWire.sheath.sig, tubeWire.inner_radius, tubeWire.sheath.r, frequency)
-    
+    Zcs, Zsc = calculate(progress, calculate_multual_impedance, tubeWire.get_coreWires_radii(), tubeWire.sheath.mur, tubeWire.sheath.sig, tubeWire.inner_radius,
+                         tubeWire.sheath.r, frequencies)
+
+    # 计算函数给出的频率维在最后, 移到最前
+    Zc, Zs, Zcs, Zsc = (np.moveaxis(Z, -1, 0) for Z in (Zc, Zs, Zcs, Zsc))
+
     # 构成套管和芯线内部的阻抗矩阵，其中实部为电阻、虚部为电感，后续将会按照实部和虚部分别取出
     Zin = np.block([[Zs, Zsc],
                     [Zcs, Zc]])
+    if np.ndim(frequency) == 0:
+        return Zin[0], Zcs[0], Zsc[0]
     return Zin, Zcs, Zsc
 
 
-def build_tubeWire_inductance_capacitance(tubeWire):
+def build_tubeWire_inductance_capacitance(tubeWire, progress=QUIET):
     # Core wires inductance
-    Lc = calculate_coreWires_inductance(tubeWire.get_coreWires_radii(), tubeWire.get_coreWires_innerOffset(), tubeWire.get_coreWires_innerAngle(), tubeWire.sheath.r)
+    Lc = calculate(progress, calculate_coreWires_inductance, tubeWire.get_coreWires_radii(), tubeWire.get_coreWires_innerOffset(), tubeWire.get_coreWires_innerAngle(),
+                   tubeWire.sheath.r)
 
     # Core wires capacitance
-    Cc = calculate_coreWires_capacitance(tubeWire.outer_radius, tubeWire.inner_radius, tubeWire.get_coreWires_epr(), Lc)
+    Cc = calculate(progress, calculate_coreWires_capacitance, tubeWire.outer_radius, tubeWire.inner_radius, tubeWire.get_coreWires_epr(), Lc)
 
     # Sheath inductance
-    Ls = calculate_sheath_inductance(tubeWire.get_coreWires_endNodeZ(), tubeWire.sheath.r, tubeWire.outer_radius)
+    Ls = calculate(progress, calculate_sheath_inductance, tubeWire.get_coreWires_endNodeZ(), tubeWire.sheath.r, tubeWire.outer_radius)
 
     # Sheath capacitance
-    Cs = calculate_sheath_capacitance(tubeWire.get_coreWires_endNodeZ(), tubeWire.sheath.epr, Ls)
+    Cs = calculate(progress, calculate_sheath_capacitance, tubeWire.get_coreWires_endNodeZ(), tubeWire.sheath.epr, Ls)
 
     return Lc, Cc, Ls, Cs
 
 
-def prepare_building_parameters(tubeWire, max_length, frequency):
-    Zin, Zcs, Zsc = build_impedance_matrix(tubeWire, frequency)
-    Lc, Cc, Ls, Cs = build_tubeWire_inductance_capacitance(tubeWire)
+def prepare_building_parameters(tubeWire, max_length, frequency, progress=QUIET):
+    # frequency为数组时Rin、Rx、Lin、Lx按频率堆叠为(Nf*m*m), Cin与频率无关
+    Zin, Zcs, Zsc = build_impedance_matrix(tubeWire, frequency, progress)
+    Lc, Cc, Ls, Cs = build_tubeWire_inductance_capacitance(tubeWire, progress)
+    omega = 2 * np.pi * np.reshape(frequency, np.shape(frequency) + (1, 1))
     # 构成套管和芯线内部的电阻矩阵
     Rin = np.real(Zin) * max_length
 
     # 构成套管和芯线内部的电感矩阵
-    Lin = (np.imag(Zin) / (2 * np.pi * frequency) + block_diag(Ls, Lc)) * max_length
+    Lin = (np.imag(Zin) / omega + block_diag(Ls, Lc)) * max_length
 
     # 构建套管和芯线内部的电容矩阵
     Cin = block_diag(Cs, Cc)
 
-    # 计算套管和芯线的电感矩阵
-    Lx = block_diag(0, (np.tile(np.imag(Zcs) / (2 * np.pi * frequency), (1, 3)) + np.tile(np.imag(Zsc) / (2 * np.pi * frequency), (3, 1))) * max_length)
+    # 计算套管和芯线的电感矩阵: 芯线之间的部分为Zcs(列)与Zsc(行)之和, 与表皮相关的行列为0
+    Lx = np.zeros(Lin.shape)
+    Lx[..., 1:, 1:] = (np.imag(Zcs) / omega + np.imag(Zsc) / omega) * max_length
     # 计算套管和芯线的电阻矩阵
-    Rx = block_diag(0, (np.real(Zsc) + np.real(Zcs)) * max_length)
+    Rx = np.zeros(Rin.shape)
+    Rx[..., 1:, 1:] = (np.real(Zsc) + np.real(Zcs)) * max_length
 
     return Rin, Rx, Lin, Lx, Cin
 
 
-def tower_building(tower, frequency, max_length):
-    print("------------------------------------------------")
-    print("Tower building...")
-    # 0.参数准备
-    constants = Constant()
-    Rin, Rx, Lin, Lx, Cin = prepare_building_parameters(tower.tubeWire, max_length, frequency)
-    L, P = calculate_wires_inductance_potential_with_ground(tower.wires, tower.ground, constants)
-
-    # 1. 构建A矩阵
-    build_incidence_matrix(tower)
-
-    # 2. 构建R矩阵
-    build_resistance_matrix(tower, Rin, Rx)
-
-    # 3. 构建L矩阵
-    build_inductance_matrix(tower, L, Lin, Lx)
-
-    # 4. 构建P矩阵
-    build_potential_matrix(tower, P)
-
-    # 5. 构建C矩阵
-    build_capacitance_matrix(tower, Cin)
-    print("Tower building is completed.")
-    print("------------------------------------------------")
\ No newline at end of file
+def calculate_coefficients(tower, constants, hmatrix=None, progress=QUIET):
+    # 计算与频率无关的L和P(见tower_building的hmatrix说明), 给出hmatrix时返回分层矩阵
+    with progress.stage("L/P coefficients") as info:
+        if hmatrix is None:
+            L, P, tower.coefficient_cache = calculate_wires_inductance_potential_incremental(tower.wires, tower.ground, constants, tower.coefficient_cache)
+            tower.inductance_hmatrix = tower.potential_hmatrix = None
+            info.update(matrix=(L, P), reused_branches=tower.coefficient_cache['reused_branches'], reused_nodes=tower.coefficient_cache['reused_nodes'])
+        else:
+            L, P = calculate_wires_inductance_potential_hmatrix(tower.wires, tower.ground, constants, **hmatrix)
+            info.update(matrix=(L, P), L_compression=L.compression, P_compression=P.compression)
+    return L, P
+
+
+def tower_building(tower, frequency, max_length, hmatrix=None, progress=QUIET):
+    # hmatrix: 给出时(calculate_wires_inductance_potential_hmatrix的参数字典, 可为空字典)按分层矩阵计算L和P, 全程不展开为稠密矩阵:
+    # tower.potential_matrix为HMatrix, tower.inductance_matrix为ExpandedHMatrix(芯线的行列按编号映射取表皮的行列, 管状线段的子矩阵为稀疏修正),
+    # R、C矩阵为稀疏矩阵, 存储量约为O(N log N); 矩阵只提供matvec/solve等运算, to_dense()可展开
+    # 稠密计算的结果缓存在tower上, tower.remesh后再次建模时只计算网格变化的行和列
+    # progress: 进度事件(Utils.Progress.Progress), 默认不输出
+    with progress.stage("tower building", branches=tower.wires.count(), nodes=tower.wires.count_distinct_points()):
+        # 0.参数准备
+        constants = Constant()
+        with progress.stage("tube parameters"):
+            Rin, Rx, Lin, Lx, Cin = prepare_building_parameters(tower.tubeWire, max_length, frequency, progress)
+        L, P = calculate_coefficients(tower, constants, hmatrix, progress)
+
+        # 1. 构建A矩阵
+        build_incidence_matrix(tower, progress)
+
+        # 2. 构建R矩阵
+        build_resistance_matrix(tower, Rin, Rx, progress, hmatrix is not None)
+
+        # 3. 构建L矩阵
+        build_inductance_matrix(tower, L, Lin, Lx, progress)
+
+        # 4. 构建P矩阵
+        build_potential_matrix(tower, P, progress)
+
+        # 5. 构建C矩阵
+        build_capacitance_matrix(tower, Cin, progress, hmatrix is not None)
+
+
+class TowerSweep:
+    def __init__(self, frequencies, tower, resistance_blocks, inductance_blocks, tube_parameters, ground_corrections=None):
+        """
+        频率扫描的结果: 与频率无关的矩阵只保存一份, 随频率变化的只有管状线段的表皮和芯线在R、L矩阵中的子矩阵, 按频率堆叠保存;
+        给出有损大地修正时, 空气中线段(及其中的芯线)的R、L和空气中节点的P再加上按频率堆叠的修正。
+        按分层矩阵建模时R为稀疏矩阵、L为ExpandedHMatrix、P为HMatrix, 各频率的L只复制稀疏修正, 分层矩阵共用
+
+        参数:
+        frequencies (numpy.ndarray, Nf): 频率
+        tower (Tower): 按frequencies[0]建模后的杆塔, 取其A、R、L、P、C矩阵(引用, 不复制)
+        resistance_blocks (numpy.ndarray, Nf*m*m): 各频率下管状线段在R矩阵中的子矩阵(各段相同)
+        inductance_blocks (numpy.ndarray, Nf*k*m*m): 各频率下各段管状线段在L矩阵中的子矩阵
+        tube_parameters (dict): 按频率堆叠的管状线段内部参数Rin、Rx、Lin、Lx(Nf*m*m), 以及与频率无关的Cin(m*m)
+        ground_corrections (tuple): 有损大地下空气中线段的阻抗修正dZ(Nf*Nba*Nba)和空气中节点的电位系数修正dP(Nf*Nna*Nna)
+                                    (见calculate_wires_ground_corrections), None表示不修正
+        """
+        self.frequencies = frequencies
+        self.incidence_matrix = tower.incidence_matrix
+        self.resistance_matrix = tower.resistance_matrix
+        self.inductance_matrix = tower.inductance_matrix
+        self.potential_matrix = tower.potential_matrix
+        self.capacitance_matrix = tower.capacitance_matrix
+        self.tube_indices = tower.get_tubeWires_indices()
+        self.resistance_blocks = resistance_blocks
+        self.inductance_blocks = inductance_blocks
+        self.tube_parameters = tube_parameters
+        self.ground_impedance, self.ground_potential = ground_corrections if ground_corrections is not None else (None, None)
+        # R、L矩阵各支路的大地修正取自空气中线段的第几行: 芯线与其他线段的互感取自表皮(见Tower.expand_inductance_matrix), 芯线取所在表皮的行;
+        # 同一段的表皮和芯线之间都加上表皮的自感, 修正同样取表皮的自感; 地面线段没有修正(-1)
+        self.ground_branches = np.arange(self.inductance_matrix.shape[0])
+        self.ground_branches[tower.wires.count_airWires():] = -1
+        self.ground_branches[self.tube_indices[:, 1:]] = self.tube_indices[:, :1]
+        self.compressed = isinstance(self.inductance_matrix, ExpandedHMatrix)
+
+    def __len__(self):
+        return len(self.frequencies)
+
+    def resistance(self, index):
+        """
+        第index个频率下的R矩阵
+        """
+        matrix = scatter_blocks(self.resistance_matrix.copy(), self.tube_indices, self.resistance_blocks[index])
+        if self.ground_impedance is not None:
+            matrix += np.real(self._expand_ground(self.ground_impedance[index]))
+        return matrix
+
+    def inductance(self, index):
+        """
+        第index个频率下的L矩阵
+        """
+        if self.compressed:
+            return self.inductance_matrix.copy().scatter_blocks(self.tube_indices, self.inductance_blocks[index])
+        matrix = scatter_blocks(self.inductance_matrix.copy(), self.tube_indices, self.inductance_blocks[index])
+        if self.ground_impedance is not None:
+            matrix += np.imag(self._expand_ground(self.ground_impedance[index])) / (2 * np.pi * self.frequencies[index])
+        return matrix
+
+    def potential(self, index):
+        """
+        第index个频率下的P矩阵, 有大地修正时为复数矩阵
+        """
+        if self.ground_potential is None:
+            # 分层矩阵不修改, 直接共用
+            return self.potential_matrix if self.compressed else self.potential_matrix.copy()
+        matrix = self.potential_matrix.astype(complex)
+        matrix[:self.ground_potential.shape[-1], :self.ground_potential.shape[-1]] += self.ground_potential[index]
+        return matrix
+
+    def resistance_matrices(self):
+        """
+        按频率堆叠的R矩阵(Nf*n*n), 按分层矩阵建模时为各频率矩阵的列表
+        """
+        if self.compressed:
+            return [self.resistance(index) for index in range(len(self))]
+        stacked = self._stack(self.resistance_matrix, self.resistance_blocks[:, np.newaxis])
+        if self.ground_impedance is not None:
+            stacked += np.real(self._expand_ground(self.ground_impedance))
+        return stacked
+
+    def inductance_matrices(self):
+        """
+        按频率堆叠的L矩阵(Nf*n*n), 按分层矩阵建模时为各频率矩阵的列表
+        """
+        if self.compressed:
+            return [self.inductance(index) for index in range(len(self))]
+        stacked = self._stack(self.inductance_matrix, self.inductance_blocks)
+        if self.ground_impedance is not None:
+            stacked += np.imag(self._expand_ground(self.ground_impedance)) / (2 * np.pi * self.frequencies[:, np.newaxis, np.newaxis])
+        return stacked
+
+    def potential_matrices(self):
+        """
+        按频率堆叠的P矩阵(Nf*n*n), 有大地修正时为复数矩阵, 按分层矩阵建模时为各频率矩阵的列表
+        """
+        if self.compressed:
+            return [self.potential(index) for index in range(len(self))]
+        stacked = np.repeat(self.potential_matrix[np.newaxis], len(self.frequencies), axis=0)
+        if self.ground_potential is None:
+            return stacked
+        stacked = stacked.astype(complex)
+        stacked[:, :self.ground_potential.shape[-1], :self.ground_potential.shape[-1]] += self.ground_potential
+        return stacked
+
+    def _expand_ground(self, correction):
+        # 空气中线段的修正(..., Nba, Nba)按ground_branches扩展到R、L矩阵的大小, 末尾补零行零列对应-1
+        padded = np.zeros(correction.shape[:-2] + (correction.shape[-1] + 1, correction.shape[-1] + 1), dtype=correction.dtype)
+        padded[..., :-1, :-1] = correction
+        return padded[..., self.ground_branches[:, np.newaxis], self.ground_branches]
+
+    def _stack(self, matrix, blocks):
+        stacked = np.repeat(matrix[np.newaxis], len(self.frequencies), axis=0)
+        indices = self.tube_indices
+        stacked[:, indices[:, :, np.newaxis], indices[:, np.newaxis, :]] = blocks
+        return stacked
+
+
+def tower_sweep(tower, frequencies, max_length, hmatrix=None, progress=QUIET, ground_impedance=None):
+    """
+    在多个频率下建立杆塔模型: 与频率无关的A、L/P系数、P、C只计算一次, 管状线段的阻抗按所有频率一次计算,
+    各频率的R、L矩阵只在管状线段的索引位置不同, 结果中只按频率保存这些子矩阵
+
+    参数:
+    tower (Tower): 杆塔, 建模后其矩阵为frequencies[0]下的结果(与tower_building相同)
+    frequencies (numpy.ndarray, Nf): 频率, 如VF['frq']
+    max_length, hmatrix, progress: 同tower_building
+    ground_impedance (dict): 给出时(calculate_wires_ground_corrections的参数字典, 可为空字典)按复深度镜像法计算有损大地的频变修正,
+                             空气中线段的R、L和空气中节点的P随频率变化(sweep.potential(i)为复数矩阵), 默认为准静态的大地模型;
+                             修正为稠密矩阵, 不能与hmatrix同时给出
+
+    返回:
+    sweep (TowerSweep): 频率扫描的结果, sweep.resistance(i)、sweep.inductance(i)为第i个频率下的R、L矩阵
+    """
+    if hmatrix is not None and ground_impedance is not None:
+        raise ValueError("ground_impedance gives dense corrections and cannot be combined with hmatrix.")
+    frequencies = np.atleast_1d(np.asarray(frequencies, dtype=float))
+    with progress.stage("tower sweep", branches=tower.wires.count(), nodes=tower.wires.count_distinct_points(), frequencies=len(frequencies)):
+        # 0.参数准备: 管状线段参数按频率堆叠
+        constants = Constant()
+        with progress.stage("tube parameters"):
+            Rin, Rx, Lin, Lx, Cin = prepare_building_parameters(tower.tubeWire, max_length, frequencies, progress)
+        L, P = calculate_coefficients(tower, constants, hmatrix, progress)
+
+        # 1-5. 按第一个频率构建A、R、L、P、C矩阵
+        build_incidence_matrix(tower, progress)
+        build_resistance_matrix(tower, Rin[0], Rx[0], progress, hmatrix is not None)
+        build_inductance_matrix(tower, L, Lin[0], Lx[0], progress)
+        build_potential_matrix(tower, P, progress)
+        build_capacitance_matrix(tower, Cin, progress, hmatrix is not None)
+
+        # 6. 各频率下管状线段在R、L矩阵中的子矩阵
+        with progress.stage("frequency blocks") as info:
+            resistance_blocks = tower.get_tubeWires_resistance_blocks(Rin, Rx)
+            inductance_blocks = tower.get_tubeWires_inductance_blocks(Lin, Lx)
+            info["matrix"] = (resistance_blocks, inductance_blocks)
+
+        # 7. 可选: 有损大地下空气中线段和节点的频变修正
+        ground_corrections = None
+        if ground_impedance is not None:
+            with progress.stage("ground corrections") as info:
+                ground_corrections = calculate_wires_ground_corrections(tower.wires, tower.ground, constants, frequencies, **ground_impedance)
+                info["matrix"] = ground_corrections
+
+    return TowerSweep(frequencies, tower, resistance_blocks, inductance_blocks, {'Rin': Rin, 'Rx': Rx, 'Lin': Lin, 'Lx': Lx, 'Cin': Cin}, ground_corrections)
+
+
+def profile_tower_building(tower, frequency, max_length, hmatrix=None, trace_memory=True, sinks=()):
+    """
+    运行tower_building并统计各阶段和各计算函数调用的墙钟时间、CPU时间、tracemalloc内存峰值和结果矩阵大小
+
+    参数:
+    tower, frequency, max_length, hmatrix: 同tower_building
+    trace_memory (bool): 是否统计tracemalloc内存峰值(会使计算变慢)
+    sinks (iterable): 同时接收进度事件的其他输出端, 如print_sink
+
+    返回:
+    report (StageReport): 统计报告, report.as_dict()为可机读的记录, 可用to_json、to_chrome_trace导出
+    """
+    report = StageReport()
+    tower_building(tower, frequency, max_length, hmatrix, Progress([report, *sinks], trace_memory))
+    return report
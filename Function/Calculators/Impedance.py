@@ -1,13 +1,53 @@
 import sys
 
 sys.path.append('../..')
+from collections import OrderedDict
 import numpy as np
-from scipy.special import iv as besseli
-from scipy.special import kv as besselk
-from Utils.Math import Bessel_IK, Bessel_K2
+from Function.Calculators.Inductance import calculate_inductance, calculate_potential, _image_segments, _ground_image_weights
+from Utils.Math import Bessel_IK, Bessel_K2, Bessel_I_ratio, Bessel_IK_product, Bessel_K_ratio, calculate_direction_cosines
+
+# 缓存的套管Bessel函数比值表数量(按套管内径处的传播常数Rsa区分)
+BESSEL_RATIO_CACHE_SIZE = 16
+_bessel_ratio_cache = OrderedDict()
+
+
+def _sheath_bessel_ratios(Rsa, orders, index, Nbesl, Besl_Max):
+    """
+    【函数功能】计算Kn(Rsa)/Kn+1(Rsa), 已算过的比值从缓存中取出, 只计算缺少的阶数和频率
+    【入参】
+    Rsa(numpy.ndarray: Nf): 套管内径处的传播常数
+    orders(numpy.ndarray: k): 需要的Bessel函数阶数
+    index(numpy.ndarray: m): 需要的频率编号
+    Nbesl(int): 最大阶数
+    Besl_Max(float): 实部不超过该值时用scipy精确计算, 否则用渐近展开
+
+    【出参】
+    KR(numpy.ndarray: k*m): Bessel函数比值
+    """
+    key = (Nbesl, Besl_Max, Rsa.tobytes())
+    if key in _bessel_ratio_cache:
+        _bessel_ratio_cache.move_to_end(key)
+        table, known = _bessel_ratio_cache[key]
+    else:
+        table, known = np.zeros((Nbesl, Rsa.size), dtype='complex'), np.zeros((Nbesl, Rsa.size), dtype=bool)
+        _bessel_ratio_cache[key] = (table, known)
+        if len(_bessel_ratio_cache) > BESSEL_RATIO_CACHE_SIZE:
+            _bessel_ratio_cache.popitem(last=False)
+
+    rows, cols = np.nonzero(~known[np.ix_(orders, index)])
+    if rows.size:
+        n, f = orders[rows], index[cols]
+        z = Rsa[f]
+        ratio = Bessel_K2(z, n, n + 1)
+        low = np.real(z) <= Besl_Max
+        ratio[low] = Bessel_K_ratio(z[low], n[low], n[low] + 1)
+        table[n, f] = ratio
+        known[n, f] = True
+    return table[np.ix_(orders, index)]
+
 
 def calculate_coreWires_impedance(core_wires_r, core_wires_offset, core_wires_angle, core_wires_mur,
-                                  core_wires_sig, sheath_mur, sheath_sig, sheath_inner_radius, Frq):
+                                  core_wires_sig, sheath_mur, sheath_sig, sheath_inner_radius, Frq, tol=None):
     """
     【函数功能】芯线阻抗计算
     【入参】
@@ -20,6 +60,8 @@ def calculate_coreWires_impedance(core_wires_r, core_wires_offset, core_wires_an
     sheath_sig (float): 套管的电导率
     sheath_inner_radius (float): 套管的内径
     Frq(numpy.ndarray,1*Nf):Nf个频率组成的频率矩阵
+    tol (float): 给出时自适应截断邻近效应级数, 某频率下第n项的最大幅值低于tol乘以该频率阻抗矩阵的最大幅值后不再累加;
+                 默认累加全部Nbesl项
 
     【出参】
     Zc(numpy.ndarray:n*n*Nf): n条芯线在Nf个频率下的阻抗矩阵
@@ -41,36 +83,37 @@ def calculate_coreWires_impedance(core_wires_r, core_wires_offset, core_wires_an
     Rc = core_wires_r * gamma_c
     kc = 1 / (2 * np.pi * core_wires_r) * (1j * omega * Mu_c / gamma_c)
     low = np.where(np.real(Rc) <= Besl_Max)
-    Zc_diag[low] = kc[low] * besseli(0, Rc[low]) / besseli(1, Rc[low])
+    Zc_diag[low] = kc[low] * Bessel_I_ratio(Rc[low], 0, 1)
     Nc = core_wires_r.shape[0]
     Zc = np.zeros((Nc, Nc, Nf), dtype='complex')
-    for ik in range(Nf):
-        Zc[:, :, ik] = np.diag(Zc_diag[:, ik])
+    Zc[np.arange(Nc), np.arange(Nc), :] = Zc_diag
 
     tmat = np.tile(core_wires_angle, (1, Npha))
     angle = (tmat - tmat.T) * np.pi / 180
     didk = core_wires_offset * core_wires_offset.T
-    KR = np.zeros((Nbesl, Nf), dtype='complex')
-    for ik in range(Nbesl):
-        KR[ik, :] = Bessel_K2(Rsa, ik, ik + 1)
-        low = np.where(np.real(Rsa) <= Besl_Max)
-        KR[ik, low] = besselk(ik, Rsa[low]) / besselk(ik + 1, Rsa[low])
-
     ks = 1j * omega * Mu_s / (2 * np.pi)
-    for jk in range(Nf):
-        K0 = ks[jk] * KR[0, jk] / Rsa[jk]
-        Zc[:, :, jk] += K0
-
-    Kt = 0
-    Ktmp = np.zeros((Npha, Npha, Nf), dtype='complex')
-    Km = np.zeros((Nbesl, Nf), dtype='complex')
-    for ik in range(Nbesl):
-        Km[ik, :] = ks * (2 / ((ik + 1) * (1 + sheath_mur) + Rsa * KR[ik, :]))
-        Kn = (didk / (sheath_inner_radius * sheath_inner_radius)) ** (ik + 1) * np.cos((ik + 1) * angle)
-        for jk in range(Nf):
-            Ktmp[:, :, jk] = Kn * Km[ik, jk]
-        Kt += Ktmp
-    Zc += Kt
+    frequencies = np.arange(Nf)
+    Zc += ks * _sheath_bessel_ratios(Rsa, np.array([0]), frequencies, Nbesl, Besl_Max)[0] / Rsa
+
+    order = np.arange(Nbesl)[:, np.newaxis]
+    Kn = (didk / (sheath_inner_radius * sheath_inner_radius)) ** (order[:, :, np.newaxis] + 1) * np.cos((order[:, :, np.newaxis] + 1) * angle)
+    if tol is None:
+        # 各阶Bessel函数按(Nbesl, Nf)一次计算, Kt(Npha, Npha, Nf) = sum_n Kn(n, Npha, Npha) * Km(n, Nf)
+        KR = _sheath_bessel_ratios(Rsa, order[:, 0], frequencies, Nbesl, Besl_Max)
+        Km = ks * (2 / ((order + 1) * (1 + sheath_mur) + Rsa * KR))
+        Zc += np.einsum('nij,nf->ijf', Kn, Km)
+    else:
+        # 逐阶累加, 每阶只计算尚未收敛的频率
+        scale = np.abs(Zc).max(axis=(0, 1))
+        Kn_max = np.abs(Kn).max(axis=(1, 2))
+        active = frequencies
+        for ik in range(Nbesl):
+            KR = _sheath_bessel_ratios(Rsa, np.array([ik]), active, Nbesl, Besl_Max)[0]
+            Km = ks[active] * (2 / ((ik + 1) * (1 + sheath_mur) + Rsa[active] * KR))
+            Zc[:, :, active] += Kn[ik][:, :, np.newaxis] * Km
+            active = active[Kn_max[ik] * np.abs(Km) > tol * scale[active]]
+            if not active.size:
+                break
     # process the data, because the Z matrix is 3-dimensional matrix, but when fre is a float, we need Z is a 2-dimensional array
     if isinstance(Frq, float):
         Zc = np.squeeze(Zc)
@@ -108,14 +151,13 @@ def calculate_sheath_impedance(sheath_mur, sheath_sig, sheath_inner_radius, shea
     Zs_diag[low] = ks[low] * np.cosh(dR[low]) / np.sinh(dR[low])
 
     low = np.where(np.real(Rsb) <= Besl_Max)
-    tmp1 = besseli(0, Rsb[low]) * besselk(1, Rsa[low]) + besseli(1, Rsa[low]) * besselk(0, Rsb[low])
-    tmp2 = besseli(1, Rsb[low]) * besselk(1, Rsa[low]) - besseli(1, Rsa[low]) * besselk(1, Rsb[low])
+    tmp1 = Bessel_IK_product(Rsb[low], 0, Rsa[low], 1) + Bessel_IK_product(Rsa[low], 1, Rsb[low], 0)
+    tmp2 = Bessel_IK_product(Rsb[low], 1, Rsa[low], 1) - Bessel_IK_product(Rsa[low], 1, Rsb[low], 1)
     Zs_diag[low] = ks[low] * tmp1 / tmp2
 
     Ns = np.array([sheath_sig]).reshape(-1).shape[0]
     Zs = np.zeros((Ns, 1, Nf), dtype='complex')
-    for ik in range(Nf):
-        Zs[:, 0, ik] = Zs_diag[ik]
+    Zs[:, 0, :] = Zs_diag
     # process the data, because the Z matrix is 3-dimensional matrix, but when fre is a float, we need Z is a 2-dimensional array
     if isinstance(Frq, float):
         Zs = np.squeeze(Zs)
@@ -158,14 +200,13 @@ def calculate_multual_impedance(core_wires_r, sheath_mur, sheath_sig, sheath_inn
     Z0[low] = ks[low] / Itmp1
 
     low = np.where(np.real(Rsb) <= Besl_Max)
-    Itmp2 = besseli(1, Rsa[low]) * besselk(1, Rsb[low]) - besseli(1, Rsb[low]) * besselk(1, Rsa[low])
+    Itmp2 = Bessel_IK_product(Rsa[low], 1, Rsb[low], 1) - Bessel_IK_product(Rsb[low], 1, Rsa[low], 1)
     Z0[low] = ks[low] / Itmp2
 
     Zcs = np.zeros((Npha, 1, Nf), dtype='complex')
     Zsc = np.zeros((1, Npha, Nf), dtype='complex')
-    for ik in range(Nf):
-        Zcs[:, 0, ik] = Z0[ik]
-        Zsc[0, :, ik] = Z0[ik]
+    Zcs[:, 0, :] = Z0
+    Zsc[0, :, :] = Z0
     # process the data, because the Z matrix is 3-dimensional matrix, but when fre is a float, we need Z is a 2-dimensional array
     if isinstance(Frq, float):
         Zsc = np.squeeze(Zsc) # Zsc should be 1*n
@@ -181,13 +222,13 @@ def calculate_ground_impedance(ground_mur, ground_epr, ground_sig, end_node_z, s
     ground_mur(float):大地相对磁导率
     ground_epr(float):大地相对介电常数
     ground_sig(float):大地电导率
-    end_node_z (numpy.ndarray,n*1): n条芯线的第二个节点的z值
-    sheath_outer_radius (float): 整体外径
-    Dist:未知
+    end_node_z (numpy.ndarray,n*1): n条导体的高度
+    sheath_outer_radius (float/numpy.ndarray,n): 整体外径
+    Dist(numpy.ndarray,n): n条导体的水平位置
     Frq(numpy.ndarray,1*Nf):Nf个频率组成的频率矩阵
 
     【出参】
-    Zg(numpy.ndarray:1*1*Nf): Nf个频率下的地阻抗矩阵
+    Zg(numpy.ndarray:n*n*Nf): Nf个频率下的单位长度地阻抗矩阵
     """
     mu0 = 4 * np.pi * 1e-7
     ep0 = 8.854187818e-12
@@ -203,23 +244,240 @@ def calculate_ground_impedance(ground_mur, ground_epr, ground_sig, end_node_z, s
     gamma = np.sqrt(1j * Mur_g * omega * (ground_sig + 1j * omega * Epr_g))
     km = 1j * omega * Mur_g / 4 / np.pi
 
-    if end_node_z[0] > 0 and end_node_z[0] < 1e6:
-        for i1 in range(Ncon):
-            for i2 in range(Ncon - i1):
-                d = abs(Dist[i1] - Dist[i2 + i1])
-                h1 = end_node_z[0][i1]
-                h2 = end_node_z[0][i2 + i1]
-                Zg[i1, i2 + i1, :] = km * np.log(((1 + gamma * (h1 + h2) / 2) ** 2 + (d * gamma / 2) ** 2) / (
-                        (gamma * (h1 + h2) / 2) ** 2 + (d * gamma / 2) ** 2))
-                Zg[i2 + i1, i1, :] = np.copy(Zg[i1, i2 + i1, :])
-
-        for i in range(Ncon):
-            h = end_node_z[0][i]
-            Zg[i, i, :] = km * np.log(((1 + gamma * h) ** 2) / ((gamma * h) ** 2))
-
-    elif end_node_z[0] < 0:
-        for i1 in range(Ncon):
-            R0 = r0 * gamma
-            Zg[i1, i1, :] = 2 * km * np.log((1 + R0) / R0)
-
-    return Zg
\ No newline at end of file
+    z = np.ravel(end_node_z)
+    if z[0] > 0 and z[0] < 1e6:
+        # 所有导体对同时计算, 自阻抗为d=0, h1=h2的情况
+        h = z[:Ncon]
+        Dist = np.ravel(Dist)[:Ncon]
+        gh = gamma * ((h[:, np.newaxis] + h) / 2)[..., np.newaxis]
+        gd = gamma * (np.abs(Dist[:, np.newaxis] - Dist) / 2)[..., np.newaxis]
+        Zg = km * np.log(((1 + gh) ** 2 + gd ** 2) / (gh ** 2 + gd ** 2))
+
+    elif z[0] < 0:
+        R0 = r0[:, np.newaxis] * gamma
+        Zg[np.arange(Ncon), np.arange(Ncon), :] = 2 * km * np.log((1 + R0) / R0)
+
+    return Zg
+
+
+def ground_propagation_constant(ground, Frq):
+    """
+    【函数功能】大地的传播常数和复透入深度
+    【入参】
+    ground(Ground): 大地参数
+    Frq(numpy.ndarray,1*Nf): Nf个频率
+
+    【出参】
+    gamma(numpy.ndarray:Nf): 传播常数 sqrt(jωμ(σ+jωε))
+    p(numpy.ndarray:Nf): 复透入深度 1/gamma
+    """
+    mu0 = 4 * np.pi * 1e-7
+    ep0 = 8.854187818e-12
+    omega = 2 * np.pi * np.array([Frq]).reshape(-1)
+    gamma = np.sqrt(1j * ground.mur * mu0 * omega * (ground.sig + 1j * omega * ground.epr * ep0))
+    return gamma, 1 / gamma
+
+
+def ground_reflection_coefficient(ground, Frq):
+    """
+    【函数功能】电位系数中镜像电荷的频变系数 K(f) = (σ+jω(ε-ε0)) / (σ+jω(ε+ε0)),
+    有损大地上空气中节点的电位系数为 P(f) = P_free - K(f) * P_image(K=1时为理想大地)
+    【入参】
+    ground(Ground): 大地参数
+    Frq(numpy.ndarray,1*Nf): Nf个频率
+
+    【出参】
+    K(numpy.ndarray:Nf): 镜像电荷系数
+    """
+    ep0 = 8.854187818e-12
+    omega = 2 * np.pi * np.array([Frq]).reshape(-1)
+    if ground.gnd_model == "No":
+        return np.zeros(omega.size, dtype='complex')
+    if ground.gnd_model == "Perfect":
+        return np.ones(omega.size, dtype='complex')
+    return (ground.sig + 1j * omega * (ground.epr - 1) * ep0) / (ground.sig + 1j * omega * (ground.epr + 1) * ep0)
+
+
+def _composite_gauss(order, divisions):
+    # [-1, 1]等分为divisions段, 每段order点Gauss-Legendre公式
+    xs, ws = np.polynomial.legendre.leggauss(order)
+    centers = -1 + (2 * np.arange(divisions) + 1) / divisions
+    return (centers[:, np.newaxis] + xs / divisions).ravel(), np.tile(ws / divisions, divisions)
+
+
+def calculate_segments_complex_image(start_points, end_points, radii, ground, Frq, order=3, max_divisions=16, memory_budget=None, **options):
+    """
+    【函数功能】复深度镜像法的镜像积分: 线段i的镜像(与_image_segments一致, 中点高度低于半径的线段镜像放在地面下2.2倍半径处)
+    与线段j之间的积分 ∫∫ dl_i'·dl_j / R。理想大地的镜像积分(R_0)按INT_SLAN_2D精确计算, 与
+    calculate_wires_inductance_potential_with_ground中的镜像项相同; 复深度镜像(理想镜像再下移2p, p为复透入深度)的积分(R_c)
+    用分段Gauss公式计算: 按线段对到复深度镜像距离的下界d_c划分子段, 子段长度不超过d_c(误差约为(子段半长/d_c)^(2*order)),
+    贴近复深度镜像的线段对(高频、低电阻率土壤)细分, 其余不细分。子段数按所有频率中最小的d_c确定, 与频率分批无关。
+    复深度镜像相对理想镜像的位移2|p|不到最细子段长度的1/4时(高电导率土壤), 改为积分1/R_0 - 1/R_c再从精确的理想镜像项中减去
+    (奇异性扣除): 如地面上的竖直线段, 两个镜像都贴近线段端点, 差值只在端点附近不为零, 直接积分1/R_c则无法分辨端点附近的峰值。
+    镜像积分矩阵对称, 只计算上三角; 镜像调整过的线段所在的行和列单独计算。
+    【入参】
+    start_points, end_points(numpy.ndarray: n*3): 线段的起点、终点坐标(空气中的线段)
+    radii(numpy.ndarray: n*1): 线段半径
+    ground(Ground): 大地参数
+    Frq(numpy.ndarray,1*Nf): Nf个频率
+    order(int): 每个子段上的Gauss积分点数
+    max_divisions(int): 每条线段的最大子段数
+    memory_budget(int): 每批计算的临时内存预算(bytes), 按预算划分频率批次, 同时传递给INT_SLAN_2D
+    options: 传递给INT_SLAN_2D的其他计算选项(tile_size, workers等)
+
+    【出参】
+    I0(numpy.ndarray: n*n): 理想大地镜像的积分, 第i行为线段i的镜像
+    Ic(numpy.ndarray: Nf*n*n): Nf个频率下复深度镜像的积分
+    """
+    frq = np.array([Frq]).reshape(-1)
+    start_points = np.asarray(start_points, dtype=float)
+    end_points = np.asarray(end_points, dtype=float)
+    radii = np.asarray(radii, dtype=float).reshape(-1, 1)
+    n = len(start_points)
+    p = ground_propagation_constant(ground, frq)[1]
+    pf1, pf2, reflected = _image_segments(start_points, end_points, radii)
+    I0 = calculate_inductance(start_points, end_points, radii[:, 0], pf1, pf2, radii[:, 0], symmetric=reflected,
+                              memory_budget=memory_budget, **options)
+
+    # 线段对(镜像i, 线段j): 两条线段的镜像都严格对称时只取上三角, 否则两个方向都计算
+    i, j = np.triu_indices(n)
+    upper = i.size
+    lower = ~(reflected[i] & reflected[j]) & (i != j)
+    i, j = np.concatenate((i, j[lower])), np.concatenate((j, i[lower]))
+    image_center, image_ds = 0.5 * (pf1 + pf2), pf2 - pf1
+    center, ds = 0.5 * (start_points + end_points), end_points - start_points
+    dot = np.einsum('kd,kd->k', image_ds[i], ds[j])
+
+    # 到复深度镜像的距离R_c^2 = ρ^2 + (Z + 2p)^2, Z >= Zmin, ρ >= ρmin时 |R_c|^2 >= max(2ab, ρmin^2 + a^2 - b^2),
+    # 其中a = Zmin + 2Re(p), b = 2|Im(p)|; 到理想镜像的距离R_0 >= sqrt(ρmin^2 + Zmin^2)
+    z_min = np.maximum(np.minimum(start_points[j, 2], end_points[j, 2]) - np.maximum(pf1[i, 2], pf2[i, 2]), 0)
+    horizontal = np.linalg.norm(ds[:, :2], axis=1)
+    rho_min = np.maximum(np.linalg.norm(center[i, :2] - center[j, :2], axis=1) - 0.5 * (horizontal[i] + horizontal[j]), 0)
+    a = z_min[:, np.newaxis] + 2 * p.real
+    b = 2 * np.abs(p.imag)
+    distance = np.sqrt(np.maximum(2 * a * b, rho_min[:, np.newaxis] ** 2 + a ** 2 - b ** 2)).min(axis=1)
+    distance0 = np.sqrt(rho_min ** 2 + z_min ** 2)
+    length = np.sqrt(np.maximum(np.einsum('kd,kd->k', ds[i], ds[i]), np.einsum('kd,kd->k', ds[j], ds[j])))
+    subtract = 8 * np.abs(p).min() * max_divisions < length
+    distance = np.where(subtract, np.minimum(distance, distance0), distance)
+    divisions = np.clip(np.ceil(length / np.maximum(distance, 1e-300)), 1, max_divisions).astype(int)
+
+    Ic = np.zeros((frq.size, n, n), dtype='complex')
+    budget = (1 << 27) if memory_budget is None else memory_budget
+    for m, difference in sorted(set(zip(divisions.tolist(), subtract.tolist()))):
+        group = np.flatnonzero((divisions == m) & (subtract == difference))
+        gi, gj = i[group], j[group]
+        # 积分点对的水平距离平方、高度差只与几何有关, 各频率共用
+        xs, ws = _composite_gauss(order, m)
+        points_i = image_center[gi, np.newaxis, :] + 0.5 * xs[:, np.newaxis] * image_ds[gi, np.newaxis, :]
+        points_j = center[gj, np.newaxis, :] + 0.5 * xs[:, np.newaxis] * ds[gj, np.newaxis, :]
+        rho2 = ((points_i[:, :, np.newaxis, :2] - points_j[:, np.newaxis, :, :2]) ** 2).sum(axis=3).transpose(1, 2, 0)
+        Z = (points_j[:, np.newaxis, :, 2] - points_i[:, :, np.newaxis, 2]).transpose(1, 2, 0)
+        weights = 0.25 * ws[:, np.newaxis] * ws
+
+        # 按内存预算划分频率批次, 每批的临时数组为(线段对数, 频率数)的复数矩阵
+        batch = max(1, int(budget // (48 * group.size)))
+        for f0 in range(0, frq.size, batch):
+            f1 = min(f0 + batch, frq.size)
+            depth = 2 * p[np.newaxis, f0:f1]
+            mean = np.zeros((group.size, f1 - f0), dtype='complex')
+            for a in range(len(xs)):
+                for b in range(len(xs)):
+                    mean += weights[a, b] / np.sqrt(rho2[a, b][:, np.newaxis] + (Z[a, b][:, np.newaxis] + depth) ** 2)
+                    if difference:
+                        mean -= weights[a, b] / np.sqrt(rho2[a, b] + Z[a, b] ** 2)[:, np.newaxis]
+            Ic[f0:f1, gi, gj] = (dot[group, np.newaxis] * mean).T
+            if difference:
+                Ic[f0:f1, gi, gj] += I0[gi, gj]
+
+    mirrored = np.flatnonzero(i[:upper] != j[:upper])
+    mirrored = mirrored[reflected[i[mirrored]] & reflected[j[mirrored]]]
+    Ic[:, j[mirrored], i[mirrored]] = Ic[:, i[mirrored], j[mirrored]]
+    return I0, Ic
+
+
+def calculate_segments_ground_impedance(start_points, end_points, radii, ground, Frq, **options):
+    """
+    【函数功能】复深度镜像法计算线段间的频变大地回路阻抗(相对理想大地的修正):
+    线段的镜像电流水平分量反向, 理想大地的镜像位于地面下z处, 有损大地的镜像位于z+2p处(p为复透入深度),
+    Zg_ij(f) = jωμ0/(4π) ∫∫ dl_i·dl_j' (1/R_0 - 1/R_c), 加到理想大地下的线段阻抗上即为计及有损大地的阻抗。
+    平行长导线时与calculate_ground_impedance的单位长度公式一致。
+    镜像积分见calculate_segments_complex_image: 理想大地项精确计算, 复深度镜像项按线段对的远近细分积分区间。
+    【入参】
+    start_points, end_points(numpy.ndarray: n*3): 线段的起点、终点坐标(空气中的线段)
+    radii(numpy.ndarray: n*1): 线段半径, 中点高度低于半径的线段的镜像与_image_segments的处理一致
+    ground(Ground): 大地参数
+    Frq(numpy.ndarray,1*Nf): Nf个频率
+    options: calculate_segments_complex_image的计算选项(order, max_divisions, memory_budget等)
+
+    【出参】
+    Zg(numpy.ndarray: Nf*n*n): Nf个频率下的大地回路阻抗矩阵(Ω), 无大地和理想大地时为0
+    """
+    mu0 = 4 * np.pi * 1e-7
+    frq = np.array([Frq]).reshape(-1)
+    n = len(start_points)
+    if ground.gnd_model in ("No", "Perfect") or n == 0:
+        return np.zeros((frq.size, n, n), dtype='complex')
+    I0, Ic = calculate_segments_complex_image(start_points, end_points, radii, ground, frq, **options)
+    km = 1j * 2 * np.pi * frq * mu0 / (4 * np.pi)
+    return km[:, np.newaxis, np.newaxis] * (I0 - Ic)
+
+
+def calculate_wires_ground_impedance(wires, ground, Frq, **options):
+    """
+    【函数功能】计算所有空气中线段的频变大地回路阻抗(见calculate_segments_ground_impedance)
+    【入参】
+    wires(Wires): 线段集合
+    ground(Ground): 大地参数
+    Frq(numpy.ndarray,1*Nf): Nf个频率
+    options: calculate_segments_ground_impedance的计算选项(order, max_divisions, memory_budget等)
+
+    【出参】
+    Zg(numpy.ndarray: Nf*Nba*Nba): 空气中线段的大地回路阻抗矩阵
+    """
+    air = wires.arrays.ranges['air']
+    return calculate_segments_ground_impedance(wires.get_start_points()[air], wires.get_end_points()[air], wires.get_radii()[air],
+                                               ground, Frq, **options)
+
+
+def calculate_wires_ground_corrections(wires, ground, constants, Frq, **options):
+    """
+    【函数功能】有损大地下空气中线段的频变阻抗和空气中节点的频变电位系数, 以calculate_wires_inductance_potential_with_ground的结果为基准的修正:
+    空气中线段之间L矩阵的准静态镜像项换为复深度镜像项(方向余弦的处理与理想大地的镜像项相同), 即 dZ(f) = jω*km*(-Ic(f)∘cos - 准静态镜像项);
+    空气中节点之间的电位系数为 P(f) = P_free - K(f) * P_image, 即 dP(f) = ke*(-K(f) - 基准中镜像项的系数) * P_image。
+    空气中线段的R、L矩阵加上Re(dZ)、Im(dZ)/ω, P矩阵加上dP即为该频率下的结果; 地面线段及空气与地面之间的部分不变。
+    【入参】
+    wires(Wires): 线段集合
+    ground(Ground): 大地参数, 只有gnd_model为"Lossy"时有修正
+    constants(Constant): 常数
+    Frq(numpy.ndarray,1*Nf): Nf个频率
+    options: calculate_segments_complex_image的计算选项(order, max_divisions, memory_budget等)
+
+    【出参】
+    dZ(numpy.ndarray: Nf*Nba*Nba): 空气中线段的阻抗修正(Ω)
+    dP(numpy.ndarray: Nf*Nna*Nna): 空气中节点的电位系数修正
+    """
+    frq = np.array([Frq]).reshape(-1)
+    Nba, Nna = wires.count_airWires(), wires.count_distinct_airPoints()
+    dZ = np.zeros((frq.size, Nba, Nba), dtype='complex')
+    dP = np.zeros((frq.size, Nna, Nna), dtype='complex')
+    if ground.gnd_model != "Lossy" or Nba == 0:
+        return dZ, dP
+
+    air = wires.arrays.ranges['air']
+    start_points, end_points = wires.get_start_points()[air], wires.get_end_points()[air]
+    radii, lengths = wires.get_radii()[air], wires.get_lengths()[air]
+    I0, Ic = calculate_segments_complex_image(start_points, end_points, radii, ground, frq, **options)
+    x_cosines, y_cosines, z_cosines = calculate_direction_cosines(start_points, end_points, lengths)
+    cosines = x_cosines * x_cosines.T + y_cosines * y_cosines.T + z_cosines * z_cosines.T
+    _, LB, LC, _, PB = _ground_image_weights(ground, wires.count_distinct_gndPoints())
+    quasi_static = I0 * (LB[0, 0] * z_cosines * z_cosines.T + LC[0, 0] * cosines)
+    omega = 2 * np.pi * frq[:, np.newaxis, np.newaxis]
+    dZ[:] = 1j * omega * constants.km * (-Ic * cosines - quasi_static)
+
+    pf1, pf2, reflected = _image_segments(start_points, end_points, radii)
+    P_image = calculate_potential(start_points, end_points, lengths[:, 0], radii[:, 0], pf1, pf2, lengths[:, 0], radii[:, 0],
+                                  wires.get_bran_index()[air], Nna, symmetric=reflected)
+    K = ground_reflection_coefficient(ground, frq)
+    dP[:] = constants.ke * (-K - PB[0, 0])[:, np.newaxis, np.newaxis] * P_image
+    return dZ, dP
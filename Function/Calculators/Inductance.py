@@ -1,6 +1,28 @@
+import threading
+from math import factorial
 import numpy as np
-import numpy.matlib
-from Utils.Math import calculate_direction_cosines, calculate_distances
+from scipy import sparse
+from Function.Calculators.LayeredSoil import calculate_layered_integrals, calculate_layered_potential, is_layered, two_layer_green_table
+from Utils.HMatrix import build_hmatrix
+from Utils.Math import calculate_direction_cosines
+from Utils.Parallel import parallel_executor, resolve_workers, run_tasks
+
+# 电位/电感积分核每次计算的线段对数量上限(控制临时矩阵的内存占用)
+SLAN_BLOCK_PAIRS = 1 << 20
+# 积分核每个线段对的临时内存峰值估计(bytes), 用于按内存预算确定分块大小
+SLAN_PAIR_BYTES = 256
+# 并行计算时每块的线段对数量下限(块太小时线程调度开销占主导)
+SLAN_MIN_PARALLEL_PAIRS = 1 << 14
+# 对称模式下至少划分的行块数量
+SLAN_SYMMETRIC_STRIPS = 16
+# 远场近似使用的Gauss-Legendre积分阶数(1阶即中点公式)及其相对误差系数(n!)^4 / ((2n+1)((2n)!)^2)
+FAR_FIELD_ORDERS = (1, 2, 3, 4)
+FAR_FIELD_RULES = {n: np.polynomial.legendre.leggauss(n) for n in FAR_FIELD_ORDERS}
+FAR_FIELD_ERROR = {n: factorial(n) ** 4 / ((2 * n + 1) * factorial(2 * n) ** 2) for n in FAR_FIELD_ORDERS}
+FAR_FIELD_PATHS = ('exact', 'midpoint', 'gauss2', 'gauss3', 'gauss4')
+# 分层矩阵默认启用远场积分: 精确公式在远距离共线线段上有抵消误差, 会使远场块失去低秩性
+HMATRIX_FAR_RATIO = 1.5
+_report_lock = threading.Lock()
 
 
 def calculate_coreWires_inductance(core_wires_r, core_wires_offset, core_wires_angle, sheath_inner_radius):
@@ -59,118 +81,81 @@ def calculate_sheath_inductance(end_node_z, sheath_r, sheath_outer_radius):
     return Ls
 
 
-def calculate_potential(ps1, ps2, ls, rs, pf1, pf2, lf, rf, At, Nnode):
+def calculate_potential(ps1, ps2, ls, rs, pf1, pf2, lf, rf, At, Nnode, **options):
+    """
+    【函数功能】计算节点的电位系数矩阵(以每个节点相连的半线段为积分单元)
+    【入参】
+    ps1, ps2(numpy.ndarray: n*3): 源线段的起点、终点坐标
+    ls, rs(numpy.ndarray: n*1): 源线段的长度、半径
+    pf1, pf2(numpy.ndarray: n*3): 场线段的起点、终点坐标
+    lf, rf(numpy.ndarray: n*1): 场线段的长度、半径
+    At(numpy.ndarray: n*2): 线段起点、终点的节点编号
+    Nnode(int): 节点数量
+    options: 传递给INT_SLAN_2D的计算选项(tile_size, memory_budget等)
+
+    【出参】
+    P(numpy.ndarray: Nnode*Nnode): 电位系数矩阵
+    """
 
     # (2) Generating coordinates of node segments (half of bran segments)
+    # 每条线段分为两个半线段: 前半段属于起点节点, 后半段属于终点节点
+    Nbran = len(ps1)
+    if Nbran == 0:
+        return np.zeros((Nnode, Nnode))
     ps0 = 0.5 * (ps1 + ps2)
     pf0 = 0.5 * (pf1 + pf2)
-    ofs = 0
-
-    # init
-    ps1_len = len(ps1)
-    rs = rs.reshape(ps1_len, 1)
-    rf = rf.reshape(ps1_len, 1)
-    ls = ls.reshape(ps1_len, 1)
-    lf = lf.reshape(ps1_len, 1)
-    N = ps1_len * 2
-    nrs = np.zeros((N, 1))
-    nls = np.zeros((N, 1))
-    nps1 = np.zeros((N, 3))
-    nps2 = np.zeros((N, 3))
-    nrf = np.zeros((N, 1))
-    nlf = np.zeros((N, 1))
-    npf1 = np.zeros((N, 3))
-    npf2 = np.zeros((N, 3))
-    ncom = np.zeros((Nnode, 1))
-
-    for ik in range(int(np.min(At)), int(np.min(At))+Nnode):  # size of node segments for source
-        pt1 = np.where(At[:, 0] == ik)[0]  # pos of ith node in branch
-        pt2 = np.where(At[:, 1] == ik)[0]  # pos of ith node in branch
-        d1 = len(pt1)  # total # of common nodes for ith node
-        d2 = len(pt2)  # total # of common nodes for ith node
-
-        # (2a) 1st half segment
-        if d1 != 0:
-            indices = slice(ofs, ofs + d1)
-            nrs[indices, 0:1] = rs[pt1]  # radius (n1)-source
-            nls[indices, 0:1] = ls[pt1] / 2  # length (n1)
-            nps1[indices, 0:3] = ps1[pt1, 0:3]  # start points
-            nps2[indices, 0:3] = ps0[pt1, 0:3]  # end points
-
-            nrf[indices, 0:1] = rf[pt1]  # radius(n1)-field
-            nlf[indices, 0:1] = lf[pt1] / 2  # length(n1)
-            npf1[indices, 0:3] = pf1[pt1, 0:3]  # start points
-            npf2[indices, 0:3] = pf0[pt1, 0:3]  # end points
-
-        ofs += d1
-        # (2b) 2nd half segment
-        if d2 != 0:
-            indices = slice(ofs, ofs + d2)
-            nrs[indices, 0:1] = rs[pt2]  # radius (n2)
-            nls[indices, 0:1] = ls[pt2] / 2  # length (n2)
-            nps1[indices, 0:3] = ps0[pt2, 0:3]  # start points
-            nps2[indices, 0:3] = ps2[pt2, 0:3]  # end points
-
-            nrf[indices, 0:1] = rf[pt2]  # radius(n1)
-            nlf[indices, 0:1] = lf[pt2] / 2  # length(n2)
-            npf1[indices, 0:3] = pf0[pt2, 0:3]  # start points
-            npf2[indices, 0:3] = pf2[pt2, 0:3]  # end points
-
-        ofs += d2
-        ncom[ik - int(np.min(At)) - 1] = d1 + d2  # of segments for each node
+    rs = np.reshape(rs, (Nbran, 1))
+    rf = np.reshape(rf, (Nbran, 1))
+    ls = np.reshape(ls, (Nbran, 1))
+    lf = np.reshape(lf, (Nbran, 1))
+
+    nps1 = np.concatenate((ps1, ps0))  # start points (source)
+    nps2 = np.concatenate((ps0, ps2))  # end points (source)
+    nrs = np.concatenate((rs, rs))  # radius (source)
+    nls = np.concatenate((ls, ls)) / 2  # length (source)
+    npf1 = np.concatenate((pf1, pf0))  # start points (field)
+    npf2 = np.concatenate((pf0, pf2))  # end points (field)
+    nrf = np.concatenate((rf, rf))  # radius (field)
+    nlf = np.concatenate((lf, lf)) / 2  # length (field)
+
+    # (3) node-by-half-segment incidence operator, 节点编号从At中的最小编号开始
+    At = np.asarray(At, dtype=int)
+    node_index = np.concatenate((At[:, 0], At[:, 1])) - np.min(At)
+    S = sparse.csr_matrix((np.ones(2 * Nbran), (node_index, np.arange(2 * Nbran))), shape=(Nnode, 2 * Nbran))
 
     # (4) Calculating potential matrix
     PROD_MOD = 2  # matrix product
     COEF_MOD = 1  # integration only
+    if np.ndim(options.get('symmetric')) == 1:
+        # 线段的对称性掩码对应到两个半线段
+        options['symmetric'] = np.tile(options['symmetric'], 2)
 
-    INT = INT_SLAN_2D(nps1, nps2, nrs, npf1, npf2, nrf, PROD_MOD, COEF_MOD)
-
-    # (5) merging common nodes
-    P = INT
-
-    Idel = []  # 假设 Idel 是一个已经初始化的列表
-    ofs = 0  # 假设 ofs 是一个初始偏移量
-    nlns = np.zeros((Nnode, 1))  # 初始化 nlns
-    nlnf = np.zeros((Nnode, 1))  # 初始化 nlnf
-
-    for ik in range(Nnode):
-        nc = ncom[ik][0]  # of common nodes for ith node
-        nc = int(nc)
-        if nc >= 1:
-            Idel.extend(range(ofs + 1, ofs + nc))  # collecting deleted row/col
-        # 使用切片来求和
-        nlns[ik] = np.sum(nls[ofs:ofs + nc])  # total length of ith node (source)
-        nlnf[ik] = np.sum(nlf[ofs:ofs + nc])  # total length of ith node (field)
+    INT = INT_SLAN_2D(nps1, nps2, nrs, npf1, npf2, nrf, PROD_MOD, COEF_MOD, **options)
 
-        # 收集共同节点的行和列
-        tmp = P[ofs:ofs + nc, :]  # collecting rows of common nodes
-        P[ofs, :] = np.sum(tmp, axis=0)  # sum of all rows
-        tmp = P[:, ofs:ofs + nc]  # collecting cols of common nodes
-        P[:, ofs] = np.sum(tmp, axis=1)  # sum of all cols
-
-        ofs += nc
-
-    P = np.delete(P, Idel, axis=0)
-    P = np.delete(P, Idel, axis=1)
+    # (5) merging common nodes: P = S * INT * S^T, 再按节点的半线段总长度归一化
+    nlns = S @ nls  # total length of each node (source)
+    nlnf = S @ nlf  # total length of each node (field)
+    P = (S @ (S @ INT).T).T
     P = P / (nlns * np.transpose(nlnf))
 
     return P
 
 
-def calculate_inductance(ps1, ps2, rs, pf1, pf2, rf):
+def calculate_inductance(ps1, ps2, rs, pf1, pf2, rf, **options):
     """
     【函数功能】计算线段集的电感矩阵
     【入参】
     ps1(numpy.ndarray: n*3): n条线的起始点坐标
     ps2(numpy.ndarray: n*3): n条线的终止点坐标
     rs(numpy.ndarray: n*1): n条线的半径
+    options: 传递给INT_SLAN_2D的计算选项(tile_size, memory_budget, out等)
 
     【出参】
     INT(numpy.ndarray: n*n): n条线段的电感矩阵
     """
     PROD_MOD = 2  # matrix product
     COEF_MOD = 2  # inductance
-    return INT_SLAN_2D(ps1, ps2, rs, pf1, pf2, rf, PROD_MOD, COEF_MOD)
+    return INT_SLAN_2D(ps1, ps2, rs, pf1, pf2, rf, PROD_MOD, COEF_MOD, **options)
 
 
 def INT_LINE_D2P_D(U1a, U1b, V1, W1, r1, U2a, U2b, V2, W2, r2):
@@ -233,210 +218,423 @@ def INT_LINE_D2P_D(U1a, U1b, V1, W1, r1, U2a, U2b, V2, W2, r2):
         return out
 
 
-def INT_SLAN_2D(ps1, ps2, rs, pf1, pf2, rf, PROD_MOD, COEF_MOD):
+def _int_slan_block(ps1, ps2, ls, ls2, rs, pf1, pf2, lf, lf2, rf, COEF_MOD):
     """
-    【函数功能】计算线段集的电位系数/电感矩阵
+    【函数功能】线段对积分核(逐元素计算, 支持任意可广播的形状)
     【入参】
-    ps1(numpy.ndarray: n*3): n条线的起始点坐标矩阵
-    ps2(numpy.ndarray: n*3): n条线的终止点坐标矩阵
-    rs(numpy.ndarray: n*1): n条线的半径矩阵
-    PROD_MOD(int): 计算模式(1 for dot product, 2 for vector product)
+    ps1, ps2(numpy.ndarray: ...*3): 源线段起点/终点坐标, 与场线段坐标可广播
+    ls, ls2, rs(numpy.ndarray): 源线段长度、长度平方、半径, 形状与输出可广播
+    pf1, pf2(numpy.ndarray: ...*3): 场线段起点/终点坐标
+    lf, lf2, rf(numpy.ndarray): 场线段长度、长度平方、半径
     COEF_MOD(int): 计算内容(1 for 电位系数potential (P), 2 for 电感inductance (L))
 
     【出参】
-    INT(numpy.ndarray: n*n): 电位系数矩阵((COEF_MOD == 1))/n条线段的电感矩阵(COEF_MOD == 2)
+    INT(numpy.ndarray): 广播后形状的积分结果
     """
     # (0) initialization
     g0 = 1e-5
     d0 = 1e-6
     r0 = 1e-10
 
-    # get the size of matrix
-    Ns = len(ps1[:, 0])  # report error if len directly
-    Nf = len(pf1[:, 0])
-    # 定义rs和rf
-    rs = rs.reshape(Ns, 1)
-    rf = rf.reshape(Nf, 1)
-    # a = ps1 - ps2
-    ls2 = np.sum((ps1 - ps2) * (ps1 - ps2), axis=1)
-    lf2 = np.sum((pf1 - pf2) * (pf1 - pf2), axis=1)
-    # ls2 = [round(num, 2) for num in ls2]
-    # lf2 = [round(num, 2) for num in lf2]
-    # 无法使用np.round四舍五入，强制保留小数，其中  只能现在这么操作了 ，其中的2代表保留几位小数（已解决）
-    ls2_elements = ls2.size
-    lf2_elements = lf2.size
-    if ls2_elements == 0:
-        pass
-    else:
-        ls2_row = int(ls2_elements / Ns)
-        ls2 = ls2.reshape(Ns, ls2_row)
-    if lf2_elements == 0:
-        pass
-    else:
-        lf2_row = int(lf2_elements / Nf)
-        lf2 = lf2.reshape(Nf, lf2_row)
-
-    ls2 = np.array(ls2, dtype=float)
-    lf2 = np.array(lf2, dtype=float)
-    ls = np.sqrt(ls2)
-    lf = np.sqrt(lf2)
-
     # (1) determine the distance of 4 points
-    if PROD_MOD == 1:  # dot product
-        # case 1
-        OMG = np.zeros((Nf, 1))
-        tp = np.zeros((Nf, 1))
-
-        # 计算两点之间距离的平方的矩阵集合
-        R12 = calculate_distances(ps2, pf2)
-        R22 = calculate_distances(ps2, pf1)
-        R32 = calculate_distances(ps1, pf1)
-        R42 = calculate_distances(ps1, pf2)
-    elif PROD_MOD == 2:  # vector product
-        # case 2
-        OMG = np.zeros((Nf, Ns))
-        tp = np.zeros((Nf, Ns))
-
-        # ensure matrix has elements in all positions
-        ls = np.matlib.repmat(np.transpose(ls), Nf, 1)
-        lf = np.matlib.repmat(lf, 1, Ns)
-        ls2 = np.matlib.repmat(np.transpose(ls2), Nf, 1)
-        lf2 = np.matlib.repmat(lf2, 1, Ns)
-
-        # 如果你需要保持二维形状，即形状为 (m, 1) 而不是 (m,)，你需要显式地进行重塑操作：
-        # column_2d = my_array[:, j:j+1]  # 保持二维形状
-        a = np.tile(pf2[:, 0: 1], (1, Ns))
-        b = np.tile(np.transpose(ps2[:, 0: 1]), (Nf, 1))
-        dx = np.tile(pf2[:, 0: 1], (1, Ns)) - np.tile(np.transpose(ps2[:, 0: 1]), (Nf, 1))  # transpose matrix
-        dy = np.tile(pf2[:, 1: 2], (1, Ns)) - np.tile(np.transpose(ps2[:, 1: 2]), (Nf, 1))
-        dz = np.tile(pf2[:, 2: 3], (1, Ns)) - np.tile(np.transpose(ps2[:, 2: 3]), (Nf, 1))
-        R12 = dx ** 2 + dy ** 2 + dz ** 2
-
-        dx = np.tile(pf1[:, 0: 1], (1, Ns)) - np.tile(np.transpose(ps2[:, 0: 1]), (Nf, 1))
-        dy = np.tile(pf1[:, 1: 2], (1, Ns)) - np.tile(np.transpose(ps2[:, 1: 2]), (Nf, 1))
-        dz = np.tile(pf1[:, 2: 3], (1, Ns)) - np.tile(np.transpose(ps2[:, 2: 3]), (Nf, 1))
-        R22 = dx ** 2 + dy ** 2 + dz ** 2
-
-        dx = np.tile(pf1[:, 0: 1], (1, Ns)) - np.tile(np.transpose(ps1[:, 0: 1]), (Nf, 1))
-        dy = np.tile(pf1[:, 1: 2], (1, Ns)) - np.tile(np.transpose(ps1[:, 1: 2]), (Nf, 1))
-        dz = np.tile(pf1[:, 2: 3], (1, Ns)) - np.tile(np.transpose(ps1[:, 2: 3]), (Nf, 1))
-        R32 = dx ** 2 + dy ** 2 + dz ** 2
-
-        dx = np.tile(pf2[:, 0: 1], (1, Ns)) - np.tile(np.transpose(ps1[:, 0: 1]), (Nf, 1))
-        dy = np.tile(pf2[:, 1: 2], (1, Ns)) - np.tile(np.transpose(ps1[:, 1: 2]), (Nf, 1))
-        dz = np.tile(pf2[:, 2: 3], (1, Ns)) - np.tile(np.transpose(ps1[:, 2: 3]), (Nf, 1))
-        R42 = dx ** 2 + dy ** 2 + dz ** 2
+    R12 = _squared_distances(pf2, ps2)
+    R22 = _squared_distances(pf1, ps2)
+    R32 = _squared_distances(pf1, ps1)
+    R42 = _squared_distances(pf2, ps1)
+    shape = R12.shape
+    ls = np.broadcast_to(ls, shape)
+    lf = np.broadcast_to(lf, shape)
+    ls2 = np.broadcast_to(ls2, shape)
+    lf2 = np.broadcast_to(lf2, shape)
 
-    else:
-        print('No such case in INT_ARBI_2D')
-        exit()
-
-    R12 = np.array(R12, dtype=float)
-    R22 = np.array(R22, dtype=float)
-    R32 = np.array(R32, dtype=float)
-    R42 = np.array(R42, dtype=float)
     # get the distance between each point
     R1 = np.sqrt(R12)  # pf2-ps2
     R2 = np.sqrt(R22)  # pf1-ps2
     R3 = np.sqrt(R32)  # pf1-ps1
     R4 = np.sqrt(R42)  # pf2-ps1
 
-    # (2) find the cos and sin
-    a2 = (R42 - R32 + R22 - R12)
-    cose = a2 / (2 * ls * lf)
-    sine2 = 1 - cose ** 2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # (2) find the cos and sin
+        a2 = (R42 - R32 + R22 - R12)
+        cose = a2 / (2 * ls * lf)
+        sine2 = 1 - cose ** 2
+
+        # 存在负数的情况
+        sine = np.sqrt(sine2.astype(complex))
+        # (2a) update u (alpha) and v (beta)
+        DIS = 4 * ls2 * lf2 - a2 * a2
+
+        par1 = cose > 1 - g0  # parallel lines 1
+        par2 = cose < g0 - 1  # parallel lines 2
+        para = np.logical_or(par1, par2)
+
+        u = ls * ((2 * lf2 * (R22 - R32 - ls2) + a2 * (R42 - R32 - lf2)) / DIS)
+        v = lf * ((2 * ls2 * (R42 - R32 - lf2) + a2 * (R22 - R32 - ls2)) / DIS)
+        u = np.where(para, 0, u)
+        v = np.where(para, -(R22 - R32 - ls2) / (2 * ls), v)  # parallel lines
+
+        d2 = abs(R32 - u ** 2 - v ** 2 + 2 * u * v * cose)
+        d = np.sqrt(d2)
+
+        copn = d < d0  # co-plane
+        id = ~(para | copn)  # lines other than co-plane and parallel lines
+
+        R1 = np.maximum(r0, R1)  # avoid zero distance
+        R2 = np.maximum(r0, R2)
+        R3 = np.maximum(r0, R3)
+        R4 = np.maximum(r0, R4)
+
+        # (3) lines in different planes and non-parallel lines
+        OMG = (np.arctan(np.real((d2 * cose + (u + ls) * (v + lf) * sine2) / (d * R1 * sine)))
+               - np.arctan(np.real((d2 * cose + (u + ls) * v * sine2) / (d * R2 * sine)))
+               + np.arctan(np.real((d2 * cose + (u * v) * sine2) / (d * R3 * sine)))
+               - np.arctan(np.real((d2 * cose + u * (v + lf) * sine2) / (d * R4 * sine))))
+        OMG = np.where(id, OMG, 0)
+
+        # (4) main item (end pt positioned on the another line)
+        INT = 0
+        tp0 = lf / (R1 + R2)
+        tp1 = (u + ls) * np.arctanh(tp0)
+        INT = INT + np.where(abs(tp0 - 1) < r0, 0, tp1)
+
+        tp0 = ls / (R1 + R4)
+        tp1 = (v + lf) * np.arctanh(tp0)
+        INT = INT + np.where(abs(tp0 - 1) < r0, 0, tp1)
+
+        tp0 = lf / (R3 + R4)
+        tp1 = u * np.arctanh(tp0)
+        INT = INT - np.where(abs(tp0 - 1) < r0, 0, tp1)
+
+        tp0 = ls / (R2 + R3)
+        tp1 = v * np.arctanh(tp0)
+        INT = INT - np.where(abs(tp0 - 1) < r0, 0, tp1)
+
+        tp0 = OMG * d / sine
+        tp0 = np.where(abs(sine) < g0, 0, tp0)
+        INT = 2 * INT - tp0
+        INT = np.real(INT)  # 输出将只包含实数部分
 
-    # 存在负数的情况
-    sine = np.sqrt(sine2.astype(complex))
-    # (2a) update u (alpha) and v (beta)
-    DIS = 4 * ls2 * lf2 - a2 * a2
+    # (5) update integral with parallel line results
+    if np.any(para):
+        sign = (np.where(par1, 1, 0) - np.where(par2, 1, 0))[para]  # sign for lf
+        Rs = np.broadcast_to(rs, shape)[para]
+        Rf = np.broadcast_to(rf, shape)[para]
+        tp = np.zeros(Rs.shape)
+        out = INT_LINE_D2P_D(tp, ls[para], tp, 0, Rs, v[para], v[para] + sign * lf[para], d[para], 0, Rf)
+        INT[para] = np.abs(out)
 
-    par1 = cose > 1 - g0  # parallel lines 1
-    par2 = cose < g0 - 1  # parallel lines 2
+    # (6) check whether it is the integral for inductance or potential
+    if COEF_MOD == 2:  # inductance
+        INT = cose * INT
 
-    # 存在负号的形式
-    para = np.logical_or(par1, par2)
-    sign = np.where(par1, 1, 0) - np.where(par2, 1, 0)
-    sign = sign[para]  # sign for lf
+    return INT
 
-    u = np.array(ls * ((2 * lf2 * (R22 - R32 - ls2) + a2 * (R42 - R32 - lf2)) / DIS))
-    v = (lf * ((2 * ls2 * (R42 - R32 - lf2) + a2 * (R22 - R32 - ls2)) / DIS))
-    u[para] = 0
-    v[para] = -(R22[para] - R32[para] - ls2[para]) / (2 * ls[para])  # parallel lines
 
-    d2 = abs(R32 - u ** 2 - v ** 2 + 2 * u * v * cose)
-    d = (np.sqrt(d2))
+def _squared_distances(pa, pb):
+    """
+    【函数功能】计算两组(可广播的)点坐标之间的距离平方
+    【入参】
+    pa(numpy.ndarray: ...*3): 第一组点坐标
+    pb(numpy.ndarray: ...*3): 第二组点坐标
 
-    copn = d < d0  # co-plane
-    Itmp = para | copn  # both co-plane and parallel lines
-    id = ~Itmp  # lines other than Itmp
+    【出参】
+    R2(numpy.ndarray): 距离平方, 形状为pa与pb广播后去掉最后一维
+    """
+    dx = pa[..., 0] - pb[..., 0]
+    dy = pa[..., 1] - pb[..., 1]
+    dz = pa[..., 2] - pb[..., 2]
+    return dx ** 2 + dy ** 2 + dz ** 2
 
 
-    R1 = np.maximum(r0, R1)  # avoid zero distance
-    R2 = np.maximum(r0, R2)
-    R3 = np.maximum(r0, R3)
-    R4 = np.maximum(r0, R4)
+def INT_SLAN_2D(ps1, ps2, rs, pf1, pf2, rf, PROD_MOD, COEF_MOD, symmetric=None, tile_size=None,
+                memory_budget=None, out=None, workers=1, executor=None, far_ratio=None, far_tol=1e-6,
+                report=None):
+    """
+    【函数功能】计算线段集的电位系数/电感矩阵
+    【入参】
+    ps1(numpy.ndarray: n*3): n条线的起始点坐标矩阵
+    ps2(numpy.ndarray: n*3): n条线的终止点坐标矩阵
+    rs(numpy.ndarray: n*1): n条线的半径矩阵
+    PROD_MOD(int): 计算模式(1 for dot product, 2 for vector product)
+    COEF_MOD(int): 计算内容(1 for 电位系数potential (P), 2 for 电感inductance (L))
+    symmetric(bool/None/numpy.ndarray): 对称模式(源线段集与场线段集相同时只计算上三角并镜像), None表示自动检测;
+                                        为n个bool时表示矩阵对称, 但值为False的线段所在的行和列不满足对称性, 需另外计算
+                                        (如对地面的镜像线段, 贴近地面而调整过的镜像)
+    tile_size(int/tuple): 分块大小, int表示每块的线段对数量上限, (rows, cols)表示块的行列数
+    memory_budget(int): 每块计算的临时内存预算(bytes), 与tile_size同时给出时以tile_size为准
+    out(numpy.ndarray/numpy.memmap: n*n): 预先分配的输出矩阵, 结果按块直接写入
+    workers(int/None): 并行计算各块的线程数, 1为串行, None表示使用全部CPU核
+    executor(Executor): 共享的线程池, 给出时各块提交到该线程池(workers仍用于确定分块大小)
+    far_ratio(float/None): 远场近似的距离/长度比阈值(中点距离不小于far_ratio倍的较长线段长度), None表示全部精确计算
+    far_tol(float): 远场近似允许的相对误差, 按误差估计为每个线段对选取最低的Gauss积分阶数, 达不到时精确计算
+    report(dict): 给出时累加各计算路径(exact/midpoint/gauss2/gauss3/gauss4)的线段对数量
 
-    # (3) lines in different planes and non-parallel lines
-    OMG[id] = (np.arctan(np.real((d2[id] * cose[id] + (u[id] + ls[id]) * (v[id] + lf[id]) * sine2[id]) / (d[id] * R1[id] * sine[id])))
-                - np.arctan(np.real((d2[id] * cose[id] + (u[id] + ls[id]) * v[id] * sine2[id]) / (d[id] * R2[id] * sine[id])))
-                + np.arctan(np.real((d2[id] * cose[id] + (u[id] * v[id]) * sine2[id]) / (d[id] * R3[id] * sine[id])))
-                - np.arctan(np.real((d2[id] * cose[id] + u[id] * (v[id] + lf[id]) * sine2[id]) / (d[id] * R4[id] * sine[id]))))
+    【出参】
+    INT(numpy.ndarray: n*n): 电位系数矩阵((COEF_MOD == 1))/n条线段的电感矩阵(COEF_MOD == 2)
+    """
+    ps1 = np.asarray(ps1, dtype=float)
+    ps2 = np.asarray(ps2, dtype=float)
+    pf1 = np.asarray(pf1, dtype=float)
+    pf2 = np.asarray(pf2, dtype=float)
 
-    # (4) main item (end pt positioned on the another line)
-    INT = 0
-    tp0 = lf / (R1 + R2)
-    tp1 = (u + ls) * np.arctanh(tp0)
-    tp1[abs(tp0 - 1) < r0] = 0
-    INT = INT + tp1
+    # get the size of matrix
+    Ns = ps1.shape[0]
+    Nf = pf1.shape[0]
+    rs = np.asarray(rs, dtype=float).reshape(Ns, 1)
+    rf = np.asarray(rf, dtype=float).reshape(Nf, 1)
+    ls2 = np.sum((ps1 - ps2) * (ps1 - ps2), axis=1).reshape(Ns, 1)
+    lf2 = np.sum((pf1 - pf2) * (pf1 - pf2), axis=1).reshape(Nf, 1)
+    ls = np.sqrt(ls2)
+    lf = np.sqrt(lf2)
 
-    tp0 = ls / (R1 + R4)
-    tp1 = (v + lf) * np.arctanh(tp0)
-    tp1[abs(tp0 - 1) < r0] = 0
-    INT = INT + tp1
+    if PROD_MOD == 1:  # dot product, the ith source segment with the ith field segment
+        if Ns != Nf:
+            raise ValueError("PROD_MOD = 1 requires the same number of source and field segments")
+        INT = _int_slan_block(ps1[:, np.newaxis, :], ps2[:, np.newaxis, :], ls, ls2, rs,
+                              pf1[:, np.newaxis, :], pf2[:, np.newaxis, :], lf, lf2, rf, COEF_MOD)
+        if out is None:
+            return INT
+        out[...] = INT
+        return out
+    elif PROD_MOD != 2:  # vector product, every source segment with every field segment
+        raise ValueError("No such case in INT_SLAN_2D: PROD_MOD = {}".format(PROD_MOD))
+
+    asymmetric = None
+    if np.ndim(symmetric) == 1:
+        if len(symmetric) != Ns:
+            raise ValueError("symmetric mask must have one entry per segment")
+        asymmetric = np.flatnonzero(~np.asarray(symmetric, dtype=bool))
+        symmetric = True
+    if symmetric is None:
+        symmetric = _is_same_segments(ps1, ps2, rs, pf1, pf2, rf)
+    elif symmetric and Ns != Nf:
+        raise ValueError("symmetric mode requires the same source and field segments")
+
+    if out is None:
+        INT = np.empty((Nf, Ns))
+    elif out.shape != (Nf, Ns):
+        raise ValueError("out must have shape {}, but got {}".format((Nf, Ns), out.shape))
+    else:
+        INT = out
+
+    # 按(行, 列)分块计算, 每块的临时矩阵规模由tile_size/memory_budget限制;
+    # 对称模式下每个行块只计算对角线右侧的列, 并把结果镜像到下三角。
+    # 各块写入的区域互不重叠, 因此并行计算的结果与串行完全一致。
+    def compute_tile(i0, i1, c0, c1):
+        args = (ps1[np.newaxis, c0:c1, :], ps2[np.newaxis, c0:c1, :], ls.T[:, c0:c1], ls2.T[:, c0:c1],
+                rs.T[:, c0:c1], pf1[i0:i1, np.newaxis, :], pf2[i0:i1, np.newaxis, :], lf[i0:i1], lf2[i0:i1],
+                rf[i0:i1], COEF_MOD)
+        if far_ratio is None:
+            tile = _int_slan_block(*args)
+            counts = {'exact': tile.size}
+        else:
+            tile, counts = _int_slan_block_far(*args, far_ratio, far_tol)
+        INT[i0:i1, c0:c1] = tile
+        if symmetric:
+            m0 = max(c0, i1)
+            if m0 < c1:
+                INT[m0:c1, i0:i1] = tile[:, m0 - c0:].T
+            if c1 >= i1 > c0:
+                # 对角块已完整算出, 取上三角镜像
+                diag = INT[i0:i1, i0:i1]
+                INT[i0:i1, i0:i1] = np.triu(diag) + np.triu(diag, 1).T
+        return counts
+
+    workers = resolve_workers(workers)
+    tiles = _slan_tiles(Nf, Ns, symmetric, tile_size, memory_budget, workers)
+    tile_counts = run_tasks(compute_tile, tiles, workers, executor)
+    if report is not None:
+        with _report_lock:
+            for counts in tile_counts:
+                for path, count in counts.items():
+                    report[path] = report.get(path, 0) + count
+    if asymmetric is not None and asymmetric.size:
+        # 不满足对称性的行和列按非对称方式重新计算
+        options = dict(symmetric=False, tile_size=tile_size, memory_budget=memory_budget, workers=workers, executor=executor,
+                       far_ratio=far_ratio, far_tol=far_tol, report=report)
+        INT[asymmetric, :] = INT_SLAN_2D(ps1, ps2, rs, pf1[asymmetric], pf2[asymmetric], rf[asymmetric], PROD_MOD, COEF_MOD, **options)
+        INT[:, asymmetric] = INT_SLAN_2D(ps1[asymmetric], ps2[asymmetric], rs[asymmetric], pf1, pf2, rf, PROD_MOD, COEF_MOD, **options)
+    return INT
 
-    tp0 = lf / (R3 + R4)
-    tp1 = u * np.arctanh(tp0)
-    tp1[abs(tp0 - 1) < r0] = 0
-    INT = INT - tp1
 
-    tp0 = ls / (R2 + R3)
-    tp1 = v * np.arctanh(tp0)
-    tp1[abs(tp0 - 1) < r0] = 0
-    INT = INT - tp1
+def _int_slan_block_far(ps1, ps2, ls, ls2, rs, pf1, pf2, lf, lf2, rf, COEF_MOD, far_ratio, far_tol):
+    """
+    【函数功能】带远场近似的线段对积分核。
+    中点距离较远的线段对用n*n点Gauss-Legendre积分近似, 相对误差估计为
+    c_n * ((ls/R')^(2n) + (lf/R')^(2n)), 其中R'为中点距离减去两线段的半长;
+    选取满足far_tol的最低阶数, 其余线段对仍用精确公式计算。
 
-    tp0 = OMG * d / sine
-    tp0[abs(sine) < g0] = 0
-    INT = 2 * INT - tp0
-    INT = np.real(INT)  # 输出将只包含实数部分
+    【入参】
+    与_int_slan_block相同, 另有:
+    far_ratio(float): 远场近似的距离/长度比阈值
+    far_tol(float): 允许的相对误差
 
+    【出参】
+    INT(numpy.ndarray): 广播后形状的积分结果
+    counts(dict): 各计算路径的线段对数量
+    """
+    cs = 0.5 * (ps1 + ps2)
+    cf = 0.5 * (pf1 + pf2)
+    R = np.sqrt(_squared_distances(cf, cs))
+    shape = R.shape
+    ls = np.broadcast_to(ls, shape)
+    lf = np.broadcast_to(lf, shape)
+
+    # 按误差估计为每个远场线段对选取积分阶数, 0表示精确计算
+    order = np.zeros(shape, dtype=int)
+    Reff = R - 0.5 * (ls + lf)
+    far = (R >= far_ratio * np.maximum(ls, lf)) & (Reff > 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        qs = (ls / Reff) ** 2
+        qf = (lf / Reff) ** 2
+    for n in FAR_FIELD_ORDERS:
+        accept = far & (order == 0) & (FAR_FIELD_ERROR[n] * (qs ** n + qf ** n) <= far_tol)
+        order[accept] = n
+
+    def gather(a):
+        # 取出当前路径的线段对, 坐标为(k, 3), 其余为(k,)
+        if a.ndim > len(shape):
+            return np.broadcast_to(a, shape + a.shape[-1:])[pairs]
+        return np.broadcast_to(a, shape)[pairs]
+
+    # 中点公式直接在整块上计算: INT = ls * lf / R (电感再乘cose, 即 ds . df / R)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if COEF_MOD == 2:
+            ds = ps2 - ps1
+            df = pf2 - pf1
+            INT = (ds[..., 0] * df[..., 0] + ds[..., 1] * df[..., 1] + ds[..., 2] * df[..., 2]) / R
+        else:
+            INT = ls * lf / R
+    counts = {}
+    for n in (0,) + FAR_FIELD_ORDERS:
+        pairs = order == n
+        count = int(np.count_nonzero(pairs))
+        if count == 0:
+            continue
+        counts[FAR_FIELD_PATHS[n]] = count
+        if n == 1:
+            continue
+        if n == 0:
+            INT[pairs] = _int_slan_block(gather(ps1), gather(ps2), gather(ls), gather(ls2), gather(rs), gather(pf1),
+                                         gather(pf2), gather(lf), gather(lf2), gather(rf), COEF_MOD)
+            continue
+        # n*n点Gauss-Legendre积分: INT = ls * lf * <1/r>
+        ds = gather(ps2) - gather(ps1)
+        df = gather(pf2) - gather(pf1)
+        xs, ws = FAR_FIELD_RULES[n]
+        mean = 0
+        for x1, w1 in zip(xs, ws):
+            q1 = gather(cs) + 0.5 * x1 * ds
+            for x2, w2 in zip(xs, ws):
+                q2 = gather(cf) + 0.5 * x2 * df
+                mean = mean + 0.25 * w1 * w2 / np.sqrt(_squared_distances(q2, q1))
+        if COEF_MOD == 2:  # inductance: cose * ls * lf = ds . df
+            INT[pairs] = np.sum(ds * df, axis=-1) * mean
+        else:
+            INT[pairs] = gather(ls) * gather(lf) * mean
+    return INT, counts
 
-    # (5) update integral with parallel line results
 
-    if len(rf) == 1:  # rf是个数 取不了长度到时候可以再改改
-        Rf = np.tile(rf, (Nf, Ns))
-    else:
-        Rf = np.tile(rf, (1, Ns))
-    if len(rs) == 1:  #
-        Rs = np.tile(rs, (Nf, Ns))
+def _slan_tiles(Nf, Ns, symmetric, tile_size=None, memory_budget=None, workers=1):
+    """
+    【函数功能】生成积分核的分块范围
+    【入参】
+    Nf(int): 场线段数量(行数)
+    Ns(int): 源线段数量(列数)
+    symmetric(bool): 对称模式, 每个行块只从对角线开始生成列块
+    tile_size(int/tuple): 每块的线段对数量上限或(rows, cols)
+    memory_budget(int): 每块的临时内存预算(bytes)
+    workers(int): 并行线程数, 未指定tile_size时缩小分块, 使每个线程至少分到几个块
+
+    【出参】
+    生成器, 每次给出一个块的(i0, i1, c0, c1)
+    """
+    shape = None
+    if tile_size is None:
+        pairs = SLAN_BLOCK_PAIRS if memory_budget is None else memory_budget // SLAN_PAIR_BYTES
+    elif np.ndim(tile_size) == 0:
+        pairs = int(tile_size)
     else:
-        Rs = np.tile(np.transpose(rs), (Nf, 1))  #
+        shape = (max(1, int(tile_size[0])), max(1, int(tile_size[1])))
+    if shape is None:
+        if tile_size is None and workers > 1:
+            pairs = min(pairs, max(SLAN_MIN_PARALLEL_PAIRS, -(-Nf * Ns // (4 * workers))))
+        pairs = max(1, pairs)
+
+    i0 = 0
+    while i0 < Nf:
+        first = i0 if symmetric else 0
+        width = max(Ns - first, 1)
+        if shape is None:
+            cols = min(width, pairs)
+            rows = max(1, pairs // cols)
+            if symmetric:
+                # 对角块内下三角部分的计算是多余的, 限制行块高度使其不超过总量的1/SLAN_SYMMETRIC_STRIPS
+                rows = min(rows, max(1, -(-Nf // SLAN_SYMMETRIC_STRIPS)))
+        else:
+            rows, cols = shape
+        i1 = min(i0 + rows, Nf)
+        # 对称模式下对角块必须完整落在一个列块内, 才能在块内直接镜像
+        if symmetric:
+            cols = max(cols, i1 - i0)
+        for c0 in range(first, Ns, cols):
+            yield i0, i1, c0, min(c0 + cols, Ns)
+        i0 = i1
 
-    rows, cols = np.where(para)
 
-    out = INT_LINE_D2P_D(tp[rows, cols], ls[rows, cols], tp[rows, cols], 0, \
-                                Rs[rows, cols], v[rows, cols], v[rows, cols] + sign * lf[rows, cols], d[rows, cols], 0, Rf[rows, cols])
-    INT[rows, cols] = np.abs(out)
+def _is_same_segments(ps1, ps2, rs, pf1, pf2, rf):
+    """
+    【函数功能】判断源线段集与场线段集是否相同(用于自动启用对称模式)
+    【入参】
+    ps1, ps2, rs: 源线段的起点、终点坐标和半径
+    pf1, pf2, rf: 场线段的起点、终点坐标和半径
 
-    # (6) check whether it is the integral for inductance or potential
-    if COEF_MOD == 2:  # inductance
-        INT = cose * INT
+    【出参】
+    same(bool): 两组线段完全相同时为True
+    """
+    if ps1 is pf1 and ps2 is pf2 and rs is rf:
+        return True
+    return (np.array_equal(ps1, pf1) and np.array_equal(ps2, pf2)
+            and np.array_equal(np.ravel(rs), np.ravel(rf)))
 
-    # return result
-    return INT
+
+def _image_segments(start_points, end_points, radii):
+    """
+    【函数功能】计算线段关于地面(z=0)的镜像线段
+    【入参】
+    start_points, end_points(numpy.ndarray: n*3): 线段的起点、终点坐标
+    radii(numpy.ndarray: n*1): 线段半径
+
+    【出参】
+    pf1, pf2(numpy.ndarray: n*3): 镜像线段的起点、终点坐标
+    reflected(numpy.ndarray: n): 镜像为严格对称镜像的线段; 中点高度小于半径的线段, 镜像放在地面下2.2倍半径处
+    """
+    radii = np.ravel(radii)
+    pf1 = start_points.copy()
+    pf1[:, 2] = -pf1[:, 2]  # image for air segments
+    pf2 = end_points.copy()
+    pf2[:, 2] = -pf2[:, 2]  # image for gnd segments
+
+    # 贴近地面的线段, 镜像与线段间隔约2*rs
+    reflected = 0.5 * np.abs(pf1[:, 2] + pf2[:, 2]) >= radii
+    pf1[~reflected, 2] = -2.2 * radii[~reflected]
+    pf2[~reflected, 2] = -2.2 * radii[~reflected]
+    return pf1, pf2, reflected
 
 
-def calculate_wires_inductance_potential_with_ground(wires, ground, constants):
+def calculate_wires_inductance_potential_with_ground(wires, ground, constants, **options):
+    """
+    【函数功能】计算考虑大地影响的线段电感矩阵和节点电位系数矩阵
+    【入参】
+    wires(Wires): 线段集合
+    ground(Ground): 大地参数, 给出上层厚度thickness时地面线段之间的电位系数按双层土壤计算
+    constants(Constant): 常数
+    options: 传递给INT_SLAN_2D的计算选项(tile_size, memory_budget等)
+
+    【出参】
+    L0(numpy.ndarray: Nbran*Nbran): 电感矩阵
+    P0(numpy.ndarray: Nnode*Nnode): 电位系数矩阵
+    """
     # （0) Intial constants
     ep0, mu0, ke, km = constants.ep0, constants.mu0, constants.ke, constants.km
 
@@ -477,10 +675,31 @@ def calculate_wires_inductance_potential_with_ground(wires, ground, constants):
     x_consines, y_consines, z_consines = calculate_direction_cosines(start_points, end_points, lengths)
 
 
-    # WireL = ls      # output wire length (updated in 04/24)
-    # for gnd and air segments
-    Lout = calculate_inductance(start_points, end_points, radii, start_points, end_points, radii)
-    Pout = calculate_potential(start_points, end_points, lengths, radii, start_points, end_points, lengths, radii, At, Nn)
+    # (2b) with ground
+    # image segments for L and P matrices for aai,ggi
+    if ground.gnd_model != "No":
+        pf1, pf2, reflected = _image_segments(start_points, end_points, radii)
+
+    # 自由空间和镜像部分的计算相互独立: 并行时由调度线程同时发起, 各矩阵块在共享线程池中计算
+    workers = resolve_workers(options.pop('workers', 1))
+    with parallel_executor(workers) as executor:
+        options.update(workers=workers, executor=executor)
+        # WireL = ls      # output wire length (updated in 04/24)
+        # for gnd and air segments
+        tasks = [(calculate_inductance, (start_points, end_points, radii, start_points, end_points, radii), {}),
+                 (calculate_potential, (start_points, end_points, lengths, radii, start_points, end_points, lengths, radii, At, Nn), {})]
+        if ground.gnd_model != "No":
+            # L and P matrices for air and gnd segments
+            # 线段与镜像线段的积分矩阵对称(镜像关于地面对称), 只计算上三角; 镜像调整过的线段所在的行和列单独计算
+            for rb, Nnode in ((rb1, Nna), (rb2, Nng)):
+                image = {'symmetric': reflected[rb]}
+                tasks += [(calculate_inductance, (start_points[rb, :], end_points[rb, :], radii[rb, 0], pf1[rb, :], pf2[rb, :], radii[rb, 0]), image),
+                          (calculate_potential, (start_points[rb, :], end_points[rb, :], lengths[rb, 0], radii[rb, 0], pf1[rb, :], pf2[rb, :], lengths[rb, 0], radii[rb, 0], At[rb, :], Nnode), image)]
+        results = run_tasks(lambda func, args, kwargs: func(*args, **options, **kwargs), tasks, len(tasks) if executor else 1)
+
+    Lout, Pout = results[:2]
+    if ground.gnd_model != "No":
+        Lai, Pai, Lgi, Pgi = results[2:]
 
     # (2) Constructing L and P by considering the image effect
     # no ground (0), perfect ground (1), lossy ground model (2)
@@ -490,31 +709,6 @@ def calculate_wires_inductance_potential_with_ground(wires, ground, constants):
     # free-space potential
     P0 = Pout
 
-    # (2b) with ground
-    # L and P matrices for aai,ggi
-
-    if ground.gnd_model != "No":
-        pf1 = start_points.copy()
-        pf1[:, 2] = -pf1[:, 2]  # image for air segments
-        pf2 = end_points.copy()
-        pf2[:, 2] = -pf2[:, 2]  # image for gnd segments
-
-        # 计算tmp  
-        tmp = 0.5 * np.abs(pf1[:, 2] + pf2[:, 2])  # 注意MATLAB的索引从1开始，Python从0开始，所以这里是[:, 2]  
-        
-        # 遍历tmp和rs的索引  
-        for ik in range(len(tmp)):  
-            if tmp[ik] < radii[ik]:  
-                pf1[ik, 2] = -2.2 * radii[ik]  # 设置间隔为2*rs  
-                pf2[ik, 2] = -2.2 * radii[ik]  # 设置间隔为2*rs  
-
-        # L and P matrices for air and gnd segments
-        Lai = calculate_inductance(start_points[rb1, :], end_points[rb1, :], radii[rb1, 0], pf1[rb1, :], pf2[rb1, :], radii[rb1, 0])
-        Pai = calculate_potential(start_points[rb1, :], end_points[rb1, :], lengths[rb1, 0], radii[rb1, 0], pf1[rb1, :], pf2[rb1, :], lengths[rb1, 0], radii[rb1, 0], At[rb1, :], Nna)
-
-        Lgi = calculate_inductance(start_points[rb2, :], end_points[rb2, :], radii[rb2, 0], pf1[rb2, :], pf2[rb2, :], radii[rb2, 0])
-        Pgi = calculate_potential(start_points[rb2, :], end_points[rb2, :], lengths[rb2, 0], radii[rb2, 0], pf1[rb2, :], pf2[rb2, :], lengths[rb2, 0], radii[rb2, 0], At[rb2, :], Nng)
-
     # (2bi) perfect ground
     if ground.gnd_model == "Perfect":
         L0 = L0 - Lai * (x_consines * np.transpose(x_consines) + y_consines * np.transpose(y_consines) + z_consines * np.transpose(z_consines))
@@ -554,6 +748,10 @@ def calculate_wires_inductance_potential_with_ground(wires, ground, constants):
             L0[rb2[:, np.newaxis], rb2] = L0[rb2[:, np.newaxis], rb2] - Lgi * z_consinesG * np.transpose(
                 z_consinesG)  # vertical contribution
             P0[rn2[:, np.newaxis], rn2] = P0[rn2[:, np.newaxis], rn2] + Pgi
+            if is_layered(ground):
+                # 双层土壤: 地面线段之间再加上格林函数表给出的分层修正项
+                P0[rn2[:, np.newaxis], rn2] += calculate_layered_potential(two_layer_green_table(ground), start_points[rb2, :], end_points[rb2, :],
+                                                                           lengths[rb2, 0], At[rb2, :], Nng)
 
             # (iv) f. wire in air s. wire in gnd
             L0[rb1[:, np.newaxis], rb2] = L0[rb1[:, np.newaxis], rb2] - Lag * z_consinesA * np.transpose(
@@ -562,4 +760,278 @@ def calculate_wires_inductance_potential_with_ground(wires, ground, constants):
 
     L0 = km * L0
     P0 = ke * P0
-    return L0, P0
\ No newline at end of file
+    return L0, P0
+
+def _ground_image_weights(ground, Nng):
+    """
+    【函数功能】按行(场)、列(源)所属类别(0空气, 1地面, 2其他)给出与calculate_wires_inductance_potential_with_ground
+    相同的自由空间项和镜像项系数
+    【入参】
+    ground(Ground): 大地参数
+    Nng(int): 地面节点数量
+
+    【出参】
+    LA(numpy.ndarray: 3*3): 电感中自由空间项的垂直分量系数
+    LB, LC(numpy.ndarray: 3*3): 电感中镜像项的垂直分量、全方向余弦系数
+    PF, PB(numpy.ndarray: 3*3): 电位系数中自由空间项、镜像项的系数
+    """
+    LA, LB, LC, PB = np.zeros((4, 3, 3))
+    PF = np.ones((3, 3))
+    if ground.gnd_model == "Perfect":
+        LC[0, 0] = -1
+        PB[0, 0] = -1
+    if ground.gnd_model == "Lossy":
+        LB[0, 0] = 1
+        PB[0, 0] = -1
+        if Nng != 0:
+            LA[1, 0], LA[0, 1] = 1, -1
+            LB[1, 1] = -1
+            PF[1, 0], PF[0, 1] = 0, 2
+            PB[1, 1] = 1
+    return LA, LB, LC, PF, PB
+
+
+class _CoefficientEntries:
+    def __init__(self, wires, ground, constants, **options):
+        """
+        【函数功能】按需计算考虑大地影响的电感矩阵、电位系数矩阵的任意子块,
+        与calculate_wires_inductance_potential_with_ground的对应元素一致
+        【入参】
+        wires(Wires): 线段集合
+        ground(Ground): 大地参数
+        constants(Constant): 常数
+        options: 传递给INT_SLAN_2D的计算选项
+        """
+        self.ke, self.km = constants.ke, constants.km
+        self.options = options
+        Nba, Ngn = wires.count_airWires(), wires.count_gndWires()
+        Nna, Nng = wires.count_distinct_airPoints(), wires.count_distinct_gndPoints()
+
+        self.start_points = start_points = wires.get_start_points()
+        self.end_points = end_points = wires.get_end_points()
+        self.radii = radii = np.ravel(wires.get_radii())
+        self.lengths = lengths = np.ravel(wires.get_lengths())
+        self.At = At = np.asarray(wires.get_bran_index(), dtype=int).reshape(-1, 2)
+        self.Nbran = Nbran = len(start_points)
+        self.Nn = Nn = Nna + Nng
+        self.with_image = ground.gnd_model != "No"
+        if self.with_image:
+            self.image_start_points, self.image_end_points, _ = _image_segments(start_points, end_points, radii)
+        self.reflect = (1, 1, -1) if self.with_image else None
+        self.LA, self.LB, self.LC, self.PF, self.PB = _ground_image_weights(ground, Nng)
+
+        # 类别: 0空气, 1地面, 2其他(不计镜像)
+        self.bran_category = np.searchsorted([Nba, Nba + Ngn], np.arange(Nbran), side='right')
+        self.node_category = np.searchsorted([Nna, Nna + Nng], np.arange(Nn), side='right')
+        self.directions = np.column_stack(calculate_direction_cosines(start_points, end_points, lengths[:, np.newaxis]))
+
+        # 电位系数以节点为单元, 节点的积分单元为与之相连的半线段
+        self.half_start = np.concatenate((start_points, 0.5 * (start_points + end_points)))
+        self.half_end = np.concatenate((0.5 * (start_points + end_points), end_points))
+        self.half_radii = np.concatenate((radii, radii))
+        half_lengths = np.concatenate((lengths, lengths)) / 2
+        self.node_index = node_index = np.concatenate((At[:, 0], At[:, 1])) - (np.min(At) if Nbran else 0)
+        self.half_count = np.bincount(node_index, minlength=Nn)
+        self.half_order = np.argsort(node_index, kind='stable')
+        self.half_first = np.cumsum(self.half_count) - self.half_count
+        self.node_lengths = np.bincount(node_index, half_lengths, minlength=Nn)
+        if self.with_image:
+            self.image_half_start = np.concatenate((self.image_start_points, 0.5 * (self.image_start_points + self.image_end_points)))
+            self.image_half_end = np.concatenate((0.5 * (self.image_start_points + self.image_end_points), self.image_end_points))
+            # 镜像项只计入空气、地面线段, 并按这些半线段的总长度归一化
+            self.imaged = np.tile(self.bran_category < 2, 2)
+            self.image_node_lengths = np.bincount(node_index, half_lengths * self.imaged, minlength=Nn)
+        # 双层土壤: 地面节点之间的分层修正项
+        self.green_table = two_layer_green_table(ground) if is_layered(ground) and Nng != 0 else None
+
+    def inductance(self, rows, cols):
+        """
+        【函数功能】电感矩阵的子块L0[rows][:, cols]
+        """
+        directions, LA, LB, LC = self.directions, self.LA, self.LB, self.LC
+        cose = directions[rows] @ directions[cols].T
+        zz = np.outer(directions[rows, 2], directions[cols, 2])
+        ci, cj = self.bran_category[rows][:, np.newaxis], self.bran_category[cols]
+        weight = LB[ci, cj] * zz + LC[ci, cj] * cose
+        image = self.with_image and np.any(weight)
+        field_start, field_end, field_radii = self.start_points[rows], self.end_points[rows], self.radii[rows]
+        if image:
+            # 镜像线段与自由空间线段一起作为场线段计算
+            field_start = np.concatenate((field_start, self.image_start_points[rows]))
+            field_end = np.concatenate((field_end, self.image_end_points[rows]))
+            field_radii = np.concatenate((field_radii, field_radii))
+        INT = calculate_inductance(self.start_points[cols], self.end_points[cols], self.radii[cols], field_start, field_end, field_radii, **self.options)
+        L = INT[:len(rows)] * (cose + LA[ci, cj] * zz)
+        if image:
+            L = L + weight * INT[len(rows):]
+        return self.km * L
+
+    def _node_halves(self, nodes):
+        # 节点所连半线段的编号, 以及(节点数*半线段数)的关联矩阵
+        count = self.half_count[nodes]
+        offsets = np.repeat(self.half_first[nodes] - (np.cumsum(count) - count), count)
+        halves = self.half_order[offsets + np.arange(offsets.size)]
+        indptr = np.concatenate(([0], np.cumsum(count)))
+        return halves, sparse.csr_matrix((np.ones(len(halves)), np.arange(len(halves)), indptr), shape=(len(nodes), len(halves)))
+
+    def potential(self, rows, cols):
+        """
+        【函数功能】电位系数矩阵的子块P0[rows][:, cols]
+        """
+        ci, cj = self.node_category[rows][:, np.newaxis], self.node_category[cols]
+        weight = self.PB[ci, cj]
+        image = self.with_image and np.any(weight)
+        halves_rows, S_rows = self._node_halves(rows)
+        halves_cols, S_cols = self._node_halves(cols)
+        half_start, half_end, half_radii = self.half_start, self.half_end, self.half_radii
+        field_start, field_end, field_radii = half_start[halves_rows], half_end[halves_rows], half_radii[halves_rows]
+        if image:
+            # 镜像半线段与自由空间半线段一起作为场线段计算
+            field_start = np.concatenate((field_start, self.image_half_start[halves_rows]))
+            field_end = np.concatenate((field_end, self.image_half_end[halves_rows]))
+            field_radii = np.concatenate((field_radii, field_radii))
+        INT = INT_SLAN_2D(half_start[halves_cols], half_end[halves_cols], half_radii[halves_cols],
+                          field_start, field_end, field_radii, 2, 1, **self.options)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            P = (S_cols @ (S_rows @ INT[:len(halves_rows)]).T).T
+            P = self.PF[ci, cj] * P / np.outer(self.node_lengths[rows], self.node_lengths[cols])
+            if image:
+                imaged = self.imaged
+                Pi = (S_cols @ (S_rows @ (INT[len(halves_rows):] * imaged[halves_rows][:, np.newaxis] * imaged[halves_cols])).T).T
+                Pi = Pi / np.outer(self.image_node_lengths[rows], self.image_node_lengths[cols])
+                P = P + np.where(weight != 0, weight * Pi, 0)
+        if self.green_table is not None:
+            ground_rows, ground_cols = np.flatnonzero(ci[:, 0] == 1), np.flatnonzero(cj == 1)
+            if ground_rows.size and ground_cols.size:
+                rows, cols = np.asarray(rows)[ground_rows], np.asarray(cols)[ground_cols]
+                halves_rows, S_rows = self._node_halves(rows)
+                halves_cols, S_cols = self._node_halves(cols)
+                INT = calculate_layered_integrals(self.green_table, half_start[halves_cols], half_end[halves_cols],
+                                                  half_start[halves_rows], half_end[halves_rows])
+                Pl = (S_cols @ (S_rows @ INT).T).T
+                P[np.ix_(ground_rows, ground_cols)] += Pl / np.outer(self.node_lengths[rows], self.node_lengths[cols])
+        return self.ke * P
+
+    def node_geometry(self):
+        """
+        【函数功能】节点的代表点(相连半线段中点的平均)和支撑半径(到这些半线段端点的最大距离)
+        """
+        node_index, half_count = self.node_index, self.half_count
+        half_middle = 0.5 * (self.half_start + self.half_end)
+        node_points = np.column_stack([np.bincount(node_index, half_middle[:, k], minlength=self.Nn) for k in range(3)])
+        node_points = node_points / np.maximum(half_count, 1)[:, np.newaxis]
+        node_extents = np.zeros(self.Nn)
+        for ends in (self.half_start, self.half_end):
+            np.maximum.at(node_extents, node_index, np.linalg.norm(ends - node_points[node_index], axis=1) + self.half_radii)
+        return node_points, node_extents
+
+
+def calculate_wires_inductance_potential_hmatrix(wires, ground, constants, leaf_size=64, eta=2.0, tol=1e-6, max_rank=None, **options):
+    """
+    【函数功能】以分层矩阵(H-matrix)形式计算考虑大地影响的线段电感矩阵和节点电位系数矩阵,
+    结果与calculate_wires_inductance_potential_with_ground一致(在ACA误差tol以内), 存储量约为O(N log N)
+    【入参】
+    wires(Wires): 线段集合
+    ground(Ground): 大地参数
+    constants(Constant): 常数
+    leaf_size(int): 聚类树叶节点的最大单元数
+    eta(float): 容许性参数
+    tol(float): 远场块ACA压缩的相对误差
+    max_rank(int): 低秩块的最大秩
+    options: 传递给INT_SLAN_2D的计算选项, 默认far_ratio=HMATRIX_FAR_RATIO, far_tol=tol/10
+
+    【出参】
+    L0(HMatrix: Nbran*Nbran): 电感矩阵
+    P0(HMatrix: Nnode*Nnode): 电位系数矩阵
+    """
+    options.setdefault('far_ratio', HMATRIX_FAR_RATIO)
+    options.setdefault('far_tol', 0.1 * tol)
+    entries = _CoefficientEntries(wires, ground, constants, **options)
+
+    # (1) inductance: 以线段为单元
+    L0 = build_hmatrix(entries.inductance, 0.5 * (entries.start_points + entries.end_points), 0.5 * entries.lengths + entries.radii,
+                       leaf_size, eta, tol, max_rank, entries.reflect, entries.bran_category)
+
+    # (2) potential: 以节点为单元
+    node_points, node_extents = entries.node_geometry()
+    P0 = build_hmatrix(entries.potential, node_points, node_extents, leaf_size, eta, tol, max_rank, entries.reflect, entries.node_category)
+    return L0, P0
+
+
+def calculate_wires_inductance_potential_incremental(wires, ground, constants, cache=None, **options):
+    """
+    【函数功能】增量计算考虑大地影响的线段电感矩阵和节点电位系数矩阵, 用于重新划分网格后的计算:
+    几何(端点、半径、类别)与上次计算相同的线段沿用上次的电感矩阵元素, 所连线段全部沿用的节点沿用上次的电位系数矩阵元素,
+    只计算其余线段(节点)所在的行和列。无缓存时与calculate_wires_inductance_potential_with_ground相同。
+    【入参】
+    wires(Wires): 线段集合
+    ground(Ground): 大地参数
+    constants(Constant): 常数
+    cache(dict): 上次计算返回的缓存, None时全部重新计算
+    options: 传递给INT_SLAN_2D的计算选项
+
+    【出参】
+    L0(numpy.ndarray: Nbran*Nbran): 电感矩阵
+    P0(numpy.ndarray: Nnode*Nnode): 电位系数矩阵
+    cache(dict): 供下次计算使用的缓存, 其中reused_branches、reused_nodes为本次沿用的线段、节点数量
+    """
+    entries = _CoefficientEntries(wires, ground, constants, **options)
+    Nbran, Nn = entries.Nbran, entries.Nn
+    bran_keys = np.column_stack((entries.start_points, entries.end_points, entries.radii, entries.bran_category))
+    weights = np.stack(_ground_image_weights(ground, wires.count_distinct_gndPoints()))
+    layers = (ground.sig, ground.sig2, ground.thickness) if is_layered(ground) else None
+    usable = (cache is not None and cache['gnd_model'] == ground.gnd_model and np.array_equal(cache['weights'], weights)
+              and (cache['ke'], cache['km']) == (constants.ke, constants.km) and cache.get('layers') == layers)
+
+    if not usable:
+        L0, P0 = calculate_wires_inductance_potential_with_ground(wires, ground, constants, **options)
+        bran_map, node_map = np.full(Nbran, -1), np.full(Nn, -1)
+    else:
+        # (1) 按几何匹配上次的线段: 相同的行在两组线段的合并去重中得到相同的编号
+        old_keys = cache['bran_keys']
+        Nold = len(old_keys)
+        _, inverse = np.unique(np.concatenate((old_keys, bran_keys)), axis=0, return_inverse=True)
+        inverse = np.ravel(inverse)
+        first_old = np.full(len(inverse), -1)
+        first_old[inverse[:Nold][::-1]] = np.arange(Nold)[::-1]
+        bran_map = first_old[inverse[Nold:]]
+
+        # (2) 节点的各半线段都沿用时, 由上次的半线段给出的节点须唯一, 且上次该节点所连的半线段数量相同
+        halves = np.arange(2 * Nbran)
+        old_bran = bran_map[halves % Nbran] if Nbran else halves
+        candidate = np.where(old_bran >= 0, cache['node_index'][old_bran + (halves // max(Nbran, 1)) * Nold], -1)
+        lowest = np.full(Nn, np.iinfo(int).max)
+        highest = np.full(Nn, -1)
+        np.minimum.at(lowest, entries.node_index, candidate)
+        np.maximum.at(highest, entries.node_index, candidate)
+        node_map = np.where(lowest == highest, highest, -1)
+        matched = node_map >= 0
+        matched[matched] = (cache['half_count'][node_map[matched]] == entries.half_count[matched]) & \
+                           (cache['node_category'][node_map[matched]] == entries.node_category[matched])
+        node_map = np.where(matched, node_map, -1)
+
+        # (3) 沿用的行列直接复制, 其余行列按需计算
+        L0 = _incremental_block(cache['L'], bran_map, entries.inductance)
+        P0 = _incremental_block(cache['P'], node_map, entries.potential)
+
+    cache = {'gnd_model': ground.gnd_model, 'weights': weights, 'ke': constants.ke, 'km': constants.km, 'layers': layers,
+             'bran_keys': bran_keys, 'node_index': entries.node_index, 'half_count': entries.half_count,
+             'node_category': entries.node_category, 'L': L0, 'P': P0,
+             'reused_branches': int(np.count_nonzero(bran_map >= 0)), 'reused_nodes': int(np.count_nonzero(node_map >= 0))}
+    return L0, P0, cache
+
+
+def _incremental_block(previous, mapping, entries):
+    """
+    【函数功能】按编号映射沿用上次的矩阵元素, 未映射(编号为-1)的行和列由entries(rows, cols)计算
+    """
+    n = len(mapping)
+    kept = np.flatnonzero(mapping >= 0)
+    changed = np.flatnonzero(mapping < 0)
+    matrix = np.empty((n, n))
+    matrix[np.ix_(kept, kept)] = previous[np.ix_(mapping[kept], mapping[kept])]
+    if changed.size:
+        matrix[changed] = entries(changed, np.arange(n))
+        if kept.size:
+            matrix[np.ix_(kept, changed)] = entries(kept, changed)
+    return matrix
@@ -0,0 +1,150 @@
+import sys
+
+sys.path.append('../..')
+from collections import OrderedDict
+import numpy as np
+from Function.Calculators.Inductance import INT_SLAN_2D
+
+# 土壤电离的临界场强(V/m), 按Ground.ionisation_intensity取值; 也可直接给出数值
+IONISATION_FIELDS = {'weak': 1000e3, 'medium': 400e3, 'strong': 200e3}
+# 各接地线段独立电离(不计相邻线段电离区的相互影响)的电离模型
+ISOLATED_MODELS = ('isolational', 'isolated')
+# 缓存的电离电阻表数量(按接地线段几何和土壤参数区分)
+IONISATION_TABLE_CACHE_SIZE = 8
+_ionisation_table_cache = OrderedDict()
+
+
+def critical_field(ground):
+    """
+    【函数功能】土壤电离的临界场强
+    【入参】
+    ground(Ground): 大地参数
+
+    【出参】
+    E0(float): 临界场强(V/m), 不考虑电离时为inf
+    """
+    intensity = ground.ionisation_intensity
+    if intensity is None or intensity == 'No':
+        return np.inf
+    if isinstance(intensity, str):
+        if intensity not in IONISATION_FIELDS:
+            raise ValueError("Unknown ionisation intensity: {}".format(intensity))
+        return IONISATION_FIELDS[intensity]
+    return float(intensity)
+
+
+def calculate_electrode_resistance(start_points, end_points, radii, resistivity):
+    """
+    【函数功能】按均匀泄流计算接地线段的自接地电阻(含地面的镜像): R = ρ/(4π l²) (∫∫1/R + ∫∫1/R')
+    【入参】
+    start_points, end_points(numpy.ndarray: n*3): 线段的起点、终点坐标(地面下)
+    radii(numpy.ndarray: n 或 n*k): 线段半径, 每行可给出多个半径, 一次算出各半径下的电阻
+    resistivity(float): 土壤电阻率(Ω·m)
+
+    【出参】
+    R(numpy.ndarray: 与radii相同的形状): 接地电阻(Ω)
+    """
+    radii = np.asarray(radii, dtype=float)
+    shape = radii.shape
+    radii = radii.reshape(len(start_points), -1)
+    k = radii.shape[1]
+    ps1 = np.repeat(np.asarray(start_points, dtype=float), k, axis=0)
+    ps2 = np.repeat(np.asarray(end_points, dtype=float), k, axis=0)
+    rs = radii.reshape(-1, 1)
+    pf1, pf2 = ps1.copy(), ps2.copy()
+    pf1[:, 2], pf2[:, 2] = -pf1[:, 2], -pf2[:, 2]
+    # 逐行配对: 每条线段与自身、与自身的镜像
+    INT = INT_SLAN_2D(ps1, ps2, rs, ps1, ps2, rs, 1, 1) + INT_SLAN_2D(ps1, ps2, rs, pf1, pf2, rs, 1, 1)
+    lengths2 = np.sum((ps2 - ps1) ** 2, axis=1).reshape(-1, 1)
+    return (resistivity / (4 * np.pi * lengths2) * INT).reshape(shape)
+
+
+class IonisationTable:
+    def __init__(self, start_points, end_points, radii, resistivity, E0, samples=64, max_radius=None):
+        """
+        【函数功能】接地线段的电离电阻表: 泄流电流使线段周围场强超过临界场强时, 电离区内土壤视为导体,
+        线段的等效半径增大为 a = ρ I / (2π l E0)。各线段的电阻随等效半径的变化预先在对数等距的半径网格上算出,
+        时域计算中每步只需按电流查表插值(O(1)), 不再重新计算几何积分。
+        【入参】
+        start_points, end_points(numpy.ndarray: n*3): 接地线段的起点、终点坐标
+        radii(numpy.ndarray: n*1): 线段半径
+        resistivity(float): 土壤电阻率(Ω·m)
+        E0(float): 临界场强(V/m)
+        samples(int): 每条线段的半径网格点数
+        max_radius(numpy.ndarray: n): 等效半径的上限, 默认为线段长度的一半(更大的电离区已不再是圆柱形)
+        """
+        start_points = np.asarray(start_points, dtype=float)
+        end_points = np.asarray(end_points, dtype=float)
+        self.radii = np.ravel(radii).astype(float)
+        self.lengths = np.linalg.norm(end_points - start_points, axis=1)
+        self.resistivity = resistivity
+        self.E0 = E0
+        max_radius = 0.5 * self.lengths if max_radius is None else np.ravel(max_radius)
+        self.max_radius = np.maximum(max_radius, self.radii)
+        self.samples = max(2, int(samples))
+
+        # 对数等距的半径网格: log a = log r0 + k * step
+        self.log_radii = np.log(self.radii)
+        self.step = (np.log(self.max_radius) - self.log_radii) / (self.samples - 1)
+        grid = np.exp(self.log_radii[:, np.newaxis] + self.step[:, np.newaxis] * np.arange(self.samples))
+        self.table = calculate_electrode_resistance(start_points, end_points, grid, resistivity)
+
+    def __len__(self):
+        return len(self.radii)
+
+    def effective_radius(self, currents):
+        """
+        【函数功能】各线段在泄流电流下的等效半径
+        【入参】
+        currents(numpy.ndarray: n): 各线段的泄流电流(A)
+
+        【出参】
+        a(numpy.ndarray: n): 等效半径
+        """
+        ionised = self.resistivity * np.abs(currents) / (2 * np.pi * self.lengths * self.E0)
+        return np.clip(ionised, self.radii, self.max_radius)
+
+    def resistance(self, currents):
+        """
+        【函数功能】各线段在泄流电流下的接地电阻(查表线性插值)
+        【入参】
+        currents(numpy.ndarray: n): 各线段的泄流电流(A)
+
+        【出参】
+        R(numpy.ndarray: n): 接地电阻(Ω)
+        """
+        with np.errstate(divide='ignore', invalid='ignore'):
+            position = (np.log(self.effective_radius(currents)) - self.log_radii) / self.step
+        position = np.clip(np.nan_to_num(position), 0, self.samples - 1)
+        index = np.minimum(position.astype(int), self.samples - 2)
+        fraction = position - index
+        rows = np.arange(len(self.radii))
+        return self.table[rows, index] * (1 - fraction) + self.table[rows, index + 1] * fraction
+
+
+def ionisation_table(wires, ground, samples=64, max_radius=None):
+    """
+    【函数功能】地面线段的电离电阻表, 相同几何和土壤参数的表从缓存中取出
+    【入参】
+    wires(Wires): 线段集合
+    ground(Ground): 大地参数
+    samples(int), max_radius(numpy.ndarray): 见IonisationTable
+
+    【出参】
+    table(IonisationTable): 电离电阻表, 电离模型不是独立线段模型时为None
+    """
+    if ground.ionisation_model not in ISOLATED_MODELS:
+        return None
+    gnd = wires.arrays.ranges['ground']
+    start_points, end_points, radii = wires.get_start_points()[gnd], wires.get_end_points()[gnd], wires.get_radii()[gnd]
+    resistivity, E0 = 1 / ground.sig, critical_field(ground)
+    key = (start_points.tobytes(), end_points.tobytes(), radii.tobytes(), resistivity, E0, samples,
+           None if max_radius is None else np.asarray(max_radius, dtype=float).tobytes())
+    if key in _ionisation_table_cache:
+        _ionisation_table_cache.move_to_end(key)
+        return _ionisation_table_cache[key]
+    table = IonisationTable(start_points, end_points, radii, resistivity, E0, samples, max_radius)
+    _ionisation_table_cache[key] = table
+    if len(_ionisation_table_cache) > IONISATION_TABLE_CACHE_SIZE:
+        _ionisation_table_cache.popitem(last=False)
+    return table
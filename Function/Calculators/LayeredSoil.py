@@ -0,0 +1,308 @@
+import sys
+
+sys.path.append('../..')
+import hashlib
+import os
+from collections import OrderedDict
+import numpy as np
+from scipy import sparse
+
+# 双层土壤格林函数表的磁盘缓存目录
+GREEN_TABLE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'layered_soil')
+# 格林函数表的网格: 水平距离ρ = h sinh(t), t在[0, asinh(ρmax/h)]上等距; 深度和(差)s在[0, 2h]上等距
+GREEN_TABLE_RHO_RATIO = 1e4
+GREEN_TABLE_T_SAMPLES = 401
+GREEN_TABLE_S_SAMPLES = 65
+# 镜像级数的截断误差和最大项数
+GREEN_TABLE_TOL = 1e-10
+GREEN_TABLE_MAX_TERMS = 100000
+# 线段间修正项积分: 近距离线段对的Gauss-Legendre积分阶数, 使用中点公式、2*2点积分的距离比, 每块的积分点对数量
+LAYERED_ORDER = 4
+LAYERED_FAR_RATIO = 30.0
+LAYERED_NEAR_RATIO = 3.0
+LAYERED_BLOCK_SIZE = 1 << 16
+# 内存中缓存的格林函数表数量
+GREEN_TABLE_CACHE_SIZE = 4
+_green_table_cache = OrderedDict()
+
+
+def is_layered(ground):
+    """
+    【函数功能】大地是否按双层土壤计算(有损大地且给出了上层厚度)
+    """
+    return ground.gnd_model == "Lossy" and getattr(ground, 'thickness', None) is not None
+
+
+def two_layer_reflection(ground):
+    """
+    【函数功能】双层土壤的反射系数 K = (ρ2 - ρ1) / (ρ2 + ρ1) = (σ1 - σ2) / (σ1 + σ2)
+    【入参】
+    ground(Ground): 大地参数, sig为上层电导率, sig2为下层电导率
+
+    【出参】
+    K(float): 反射系数, |K| < 1
+    """
+    K = (ground.sig - ground.sig2) / (ground.sig + ground.sig2)
+    if not abs(K) < 1:
+        raise ValueError("Two-layer soil needs finite, non-zero conductivities, got sig={}, sig2={}".format(ground.sig, ground.sig2))
+    return K
+
+
+class TwoLayerGreenTable:
+    def __init__(self, K, thickness, rho_ratio=GREEN_TABLE_RHO_RATIO, t_samples=GREEN_TABLE_T_SAMPLES,
+                 s_samples=GREEN_TABLE_S_SAMPLES, tol=GREEN_TABLE_TOL, max_terms=GREEN_TABLE_MAX_TERMS, H=None):
+        """
+        【函数功能】双层土壤中上层两点之间格林函数相对均匀大地的修正项表。
+        点源在上层深度d处, 场点在上层深度z处, 水平距离为ρ时, 上层电位的Sommerfeld积分展开为镜像级数:
+        G = 1/R(z-d) + 1/R(z+d) + F(ρ, z-d) + F(ρ, z+d),
+        F(ρ, s) = Σ_{n>=1} K^n [1/√(ρ² + (s-2nh)²) + 1/√(ρ² + (s+2nh)²)]
+        前两项与均匀大地相同(自由空间项和地面镜像项), 修正项F只与土壤参数有关, 一次算出后在(t, s)网格上双线性插值。
+        F中n=1的(s-2h)项在ρ=0, s=2h处(两点都在分界面上)奇异, 单独解析计算; 其余部分在上层内光滑,
+        表中存放 H = (F - K/√(ρ² + (2h-s)²)) · √(ρ² + h²), 远处H趋于常数。
+        【入参】
+        K(float): 反射系数
+        thickness(float): 上层厚度h(m)
+        rho_ratio(float): 表覆盖的最大水平距离与h之比, 更远处按H不变外推
+        t_samples, s_samples(int): 网格点数
+        tol(float): 级数截断误差
+        max_terms(int): 级数的最大项数
+        H(numpy.ndarray: t_samples*s_samples): 已算好的表(从磁盘缓存读入时), None时计算
+        """
+        self.K, self.thickness = float(K), float(thickness)
+        self.t_max = np.arcsinh(rho_ratio)
+        self.t_samples, self.s_samples = int(t_samples), int(s_samples)
+        self.t_step = self.t_max / (self.t_samples - 1)
+        self.s_step = 2 * self.thickness / (self.s_samples - 1)
+        self.H = self._tabulate(tol, max_terms) if H is None else np.asarray(H, dtype=float)
+        # 双线性插值的系数: 每个网格单元的H00, H10-H00, H01-H00, H11-H10-H01+H00, 按单元编号展平
+        H00, H10, H01, H11 = self.H[:-1, :-1], self.H[1:, :-1], self.H[:-1, 1:], self.H[1:, 1:]
+        self._cells = [np.ascontiguousarray(c).ravel() for c in (H00, H10 - H00, H01 - H00, H11 - H10 - H01 + H00)]
+
+    def _tabulate(self, tol, max_terms):
+        h, K = self.thickness, self.K
+        rho = h * np.sinh(np.linspace(0, self.t_max, self.t_samples))[:, np.newaxis]
+        s = np.linspace(0, 2 * h, self.s_samples)
+        if K == 0:
+            return np.zeros((self.t_samples, self.s_samples))
+        terms = int(min(max_terms, max(1, np.ceil(np.log(tol) / np.log(abs(K))))))
+        # 不含n=1的(s-2h)项
+        H = K / np.sqrt(rho ** 2 + (s + 2 * h) ** 2)
+        for first in range(2, terms + 1, 256):
+            n = np.arange(first, min(first + 256, terms + 1))[:, np.newaxis, np.newaxis]
+            H = H + np.sum(K ** n * (1 / np.sqrt(rho ** 2 + (s - 2 * n * h) ** 2) + 1 / np.sqrt(rho ** 2 + (s + 2 * n * h) ** 2)), axis=0)
+        return H * np.sqrt(rho ** 2 + h ** 2)
+
+    def _horizontal(self, rho):
+        # 水平方向的网格单元行号(已乘每行的单元数)和单元内坐标
+        t = np.minimum(np.arcsinh(rho / self.thickness) / self.t_step, self.t_samples - 1)
+        i = np.minimum(t.astype(int), self.t_samples - 2)
+        return i * (self.s_samples - 1), t - i
+
+    def _evaluate(self, rho2, row, a, s):
+        # 单独计算的奇异项K/√(ρ² + (2h-s)²)和表中插值得到的H
+        h = self.thickness
+        s = np.minimum(np.abs(s), 2 * h)
+        u = s / self.s_step
+        j = np.minimum(u.astype(int), self.s_samples - 2)
+        b = u - j
+        cell = row + j
+        c0, c1, c2, c3 = (np.take(c, cell) for c in self._cells)
+        with np.errstate(divide='ignore'):
+            return self.K / np.sqrt(rho2 + (2 * h - s) ** 2), c0 + a * c1 + b * (c2 + a * c3)
+
+    def __call__(self, rho, s):
+        """
+        【函数功能】插值计算修正项F(ρ, s)
+        【入参】
+        rho(numpy.ndarray): 水平距离
+        s(numpy.ndarray): 深度差或深度和, |s| <= 2h
+
+        【出参】
+        F(numpy.ndarray): 与rho, s广播后的形状相同
+        """
+        rho, s = np.broadcast_arrays(np.asarray(rho, dtype=float), np.asarray(s, dtype=float))
+        row, a = self._horizontal(rho)
+        rho2 = rho ** 2
+        singular, value = self._evaluate(rho2, row, a, s)
+        return singular + value / np.sqrt(rho2 + self.thickness ** 2)
+
+    def pair(self, rho, s1, s2):
+        """
+        【函数功能】F(ρ, s1) + F(ρ, s2), 两项共用水平方向的插值位置
+        """
+        rho, s1, s2 = np.broadcast_arrays(np.asarray(rho, dtype=float), np.asarray(s1, dtype=float), np.asarray(s2, dtype=float))
+        row, a = self._horizontal(rho)
+        rho2 = rho ** 2
+        singular1, value1 = self._evaluate(rho2, row, a, s1)
+        singular2, value2 = self._evaluate(rho2, row, a, s2)
+        return singular1 + singular2 + (value1 + value2) / np.sqrt(rho2 + self.thickness ** 2)
+
+    def save(self, path):
+        """
+        【函数功能】把表写入npz文件(先写临时文件再替换, 多个进程同时写入时不会读到不完整的文件)
+        """
+        temporary = '{}.{}.tmp.npz'.format(path, os.getpid())
+        np.savez(temporary, K=self.K, thickness=self.thickness, t_max=self.t_max, H=self.H)
+        os.replace(temporary, path)
+
+    @classmethod
+    def load(cls, path):
+        """
+        【函数功能】从npz文件读入表
+        """
+        with np.load(path) as data:
+            H = data['H']
+            return cls(float(data['K']), float(data['thickness']), rho_ratio=np.sinh(float(data['t_max'])),
+                       t_samples=H.shape[0], s_samples=H.shape[1], H=H)
+
+
+def two_layer_green_table(ground, cache_dir=None, **grid):
+    """
+    【函数功能】按土壤参数取得双层土壤的格林函数修正项表: 先查内存缓存, 再查磁盘缓存, 都没有时计算并写入磁盘
+    【入参】
+    ground(Ground): 大地参数
+    cache_dir(str): 磁盘缓存目录, 默认为GREEN_TABLE_DIR
+    grid: TwoLayerGreenTable的网格参数(rho_ratio, t_samples, s_samples, tol, max_terms)
+
+    【出参】
+    table(TwoLayerGreenTable): 格林函数修正项表
+    """
+    K, thickness = two_layer_reflection(ground), float(ground.thickness)
+    parameters = dict(rho_ratio=GREEN_TABLE_RHO_RATIO, t_samples=GREEN_TABLE_T_SAMPLES, s_samples=GREEN_TABLE_S_SAMPLES,
+                      tol=GREEN_TABLE_TOL, max_terms=GREEN_TABLE_MAX_TERMS)
+    parameters.update(grid)
+    key = repr((K, thickness, sorted(parameters.items())))
+    if key in _green_table_cache:
+        _green_table_cache.move_to_end(key)
+        return _green_table_cache[key]
+
+    cache_dir = GREEN_TABLE_DIR if cache_dir is None else cache_dir
+    path = os.path.join(cache_dir, 'two_layer_{}.npz'.format(hashlib.sha1(key.encode()).hexdigest()[:16]))
+    table = None
+    if os.path.exists(path):
+        try:
+            table = TwoLayerGreenTable.load(path)
+        except (OSError, ValueError, KeyError):
+            table = None
+        if table is not None and (table.K, table.thickness) != (K, thickness):
+            table = None
+    if table is None:
+        table = TwoLayerGreenTable(K, thickness, **parameters)
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            table.save(path)
+        except OSError:
+            # 缓存目录不可写时只使用内存缓存
+            pass
+
+    _green_table_cache[key] = table
+    if len(_green_table_cache) > GREEN_TABLE_CACHE_SIZE:
+        _green_table_cache.popitem(last=False)
+    return table
+
+
+def _gauss_points(start_points, end_points, order):
+    # 各线段上的Gauss-Legendre积分点(n*order*3)和权重(n*order, 已乘线段长度)
+    x, w = np.polynomial.legendre.leggauss(order)
+    x, w = 0.5 * (x + 1), 0.5 * w
+    points = start_points[:, np.newaxis, :] + x[:, np.newaxis] * (end_points - start_points)[:, np.newaxis, :]
+    weights = np.linalg.norm(end_points - start_points, axis=1)[:, np.newaxis] * w
+    return points, weights
+
+
+def calculate_layered_integrals(table, ps1, ps2, pf1, pf2, order=LAYERED_ORDER, far_ratio=LAYERED_FAR_RATIO, near_ratio=LAYERED_NEAR_RATIO,
+                                block_size=LAYERED_BLOCK_SIZE, symmetric=False):
+    """
+    【函数功能】线段间双层土壤修正项的二重积分 ∫∫ [F(ρ, z-d) + F(ρ, z+d)] dl dl', 与INT_SLAN_2D(PROD_MOD=2, COEF_MOD=1)
+    的积分结果对应。修正项在上层内光滑, 且其奇异点(镜像)到场点的距离不小于两点间的距离, 因此按中点距离与两线段半长之和的比值
+    选择积分公式: 不小于far_ratio时用中点公式, 不小于near_ratio时用2*2点Gauss-Legendre积分, 其余用order*order点
+    【入参】
+    table(TwoLayerGreenTable): 格林函数修正项表
+    ps1, ps2(numpy.ndarray: m*3): 源线段的起点、终点坐标
+    pf1, pf2(numpy.ndarray: n*3): 场线段的起点、终点坐标
+    order(int): 近距离线段对每条线段的积分点数
+    far_ratio(float): 使用中点公式的距离比
+    near_ratio(float): 使用2*2点积分的距离比
+    block_size(int): 每块计算的积分点对数量上限(控制临时数组的大小)
+    symmetric(bool): 源线段与场线段相同时为True, 只对上三角的线段对积分, 下三角取其转置
+
+    【出参】
+    INT(numpy.ndarray: n*m): 积分矩阵
+    """
+    ps1, ps2, pf1, pf2 = (np.asarray(points, dtype=float) for points in (ps1, ps2, pf1, pf2))
+    for points in (ps1, ps2, pf1, pf2):
+        depth = -points[:, 2]
+        if np.any(depth < 0) or np.any(depth >= table.thickness):
+            raise ValueError("Grounding segments must lie inside the top soil layer (0 <= depth < {})".format(table.thickness))
+    m, n = len(ps1), len(pf1)
+    if m == 0 or n == 0:
+        return np.zeros((n, m))
+    source_middle, field_middle = 0.5 * (ps1 + ps2), 0.5 * (pf1 + pf2)
+    source_lengths, field_lengths = np.linalg.norm(ps2 - ps1, axis=1), np.linalg.norm(pf2 - pf1, axis=1)
+
+    # (1) 中点公式, 同时按距离比把其余线段对分为用2点、order点Gauss-Legendre积分的两组
+    INT = np.empty((n, m))
+    rows = max(1, block_size // max(m, 1))
+    groups = {2: ([], []), order: ([], [])}
+    for first in range(0, n, rows):
+        middle = field_middle[first:first + rows, np.newaxis, :]
+        delta = middle - source_middle
+        rho = np.sqrt(delta[..., 0] ** 2 + delta[..., 1] ** 2)
+        INT[first:first + rows] = table.pair(rho, delta[..., 2], middle[..., 2] + source_middle[:, 2])
+        INT[first:first + rows] *= np.outer(field_lengths[first:first + rows], source_lengths)
+        ratio = np.sqrt(rho ** 2 + delta[..., 2] ** 2) / (0.5 * (field_lengths[first:first + rows, np.newaxis] + source_lengths))
+        for rule, near in ((2, (ratio < far_ratio) & (ratio >= near_ratio)), (order, ratio < near_ratio)):
+            i, j = np.nonzero(near)
+            if symmetric:
+                i, j = i[i + first <= j], j[i + first <= j]
+            groups[rule][0].append(i + first)
+            groups[rule][1].append(j)
+
+    # (2) 其余线段对用Gauss-Legendre积分
+    for rule, (near_rows, near_cols) in groups.items():
+        near_rows, near_cols = np.concatenate(near_rows), np.concatenate(near_cols)
+        source_points, source_weights = _gauss_points(ps1, ps2, rule)
+        field_points, field_weights = _gauss_points(pf1, pf2, rule)
+        pairs = max(1, block_size // (rule * rule))
+        for first in range(0, len(near_rows), pairs):
+            i, j = near_rows[first:first + pairs], near_cols[first:first + pairs]
+            field, source = field_points[i][:, :, np.newaxis, :], source_points[j][:, np.newaxis, :, :]
+            delta = field - source
+            rho = np.sqrt(delta[..., 0] ** 2 + delta[..., 1] ** 2)
+            G = table.pair(rho, delta[..., 2], field[..., 2] + source[..., 2])
+            INT[i, j] = np.einsum('kab,ka,kb->k', G, field_weights[i], source_weights[j])
+            if symmetric:
+                INT[j, i] = INT[i, j]
+    return INT
+
+
+def calculate_layered_potential(table, ps1, ps2, ls, At, Nnode, **options):
+    """
+    【函数功能】地面线段节点的电位系数矩阵中双层土壤的修正项(以每个节点相连的半线段为积分单元, 与calculate_potential的归一化相同)
+    【入参】
+    table(TwoLayerGreenTable): 格林函数修正项表
+    ps1, ps2(numpy.ndarray: n*3): 线段的起点、终点坐标
+    ls(numpy.ndarray: n*1): 线段的长度
+    At(numpy.ndarray: n*2): 线段起点、终点的节点编号
+    Nnode(int): 节点数量
+    options: 传递给calculate_layered_integrals的计算选项(order, far_ratio, block_size)
+
+    【出参】
+    P(numpy.ndarray: Nnode*Nnode): 电位系数矩阵的修正项(未乘ke)
+    """
+    Nbran = len(ps1)
+    if Nbran == 0:
+        return np.zeros((Nnode, Nnode))
+    ps0 = 0.5 * (ps1 + ps2)
+    nps1 = np.concatenate((ps1, ps0))
+    nps2 = np.concatenate((ps0, ps2))
+    nls = np.concatenate((np.ravel(ls), np.ravel(ls))) / 2
+
+    At = np.asarray(At, dtype=int)
+    node_index = np.concatenate((At[:, 0], At[:, 1])) - np.min(At)
+    S = sparse.csr_matrix((np.ones(2 * Nbran), (node_index, np.arange(2 * Nbran))), shape=(Nnode, 2 * Nbran))
+
+    INT = calculate_layered_integrals(table, nps1, nps2, nps1, nps2, symmetric=True, **options)
+    nln = S @ nls
+    P = (S @ (S @ INT).T).T
+    return P / np.outer(nln, nln)
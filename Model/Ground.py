@@ -1,16 +1,20 @@
 class Ground:
-    def __init__(self, sig, mur, epr, gnd_model, ionisation_intensity, ionisation_model):
+    def __init__(self, sig, mur, epr, gnd_model, ionisation_intensity, ionisation_model, sig2=None, thickness=None):
         """
-        sig(float):电导率
+        sig(float):电导率(双层土壤时为上层电导率)
         mur(float):相对磁导率
         epr(float):相对介电常数
         gnd_model(str):接地模型("No", "Perfect", "Lossy")
         ionisation_intensity(str):电离强度
         ionisation_model(str):电离模型
+        sig2(float):双层土壤的下层电导率
+        thickness(float):双层土壤的上层厚度(m), None时为均匀大地
         """
         self.sig = sig
         self.mur = mur
         self.epr = epr
         self.gnd_model = gnd_model
         self.ionisation_intensity = ionisation_intensity
-        self.ionisation_model = ionisation_model
\ No newline at end of file
+        self.ionisation_model = ionisation_model
+        self.sig2 = sig2
+        self.thickness = thickness
@@ -1,6 +1,9 @@
 #!/usr/bin/python
 # -*- coding: UTF-8 -*-
+import itertools
+import math
 import re
+import numpy as np
 
 
 class Node:
@@ -20,7 +23,6 @@ class Node:
         self.z = z
         self.id = int(re.findall(r'\d+', self.name)[-1])
 
-
     def __repr__(self):
         """
         返回节点对象的字符串表示形式。
@@ -44,4 +46,197 @@ class MeasurementNode(Node):
         """
         返回测量节点对象的字符串表示形式。
         """
-        return f"Node(name='{self.name}', x={self.x}, y={self.y}, z={self.z}, type={self.type})"
\ No newline at end of file
+        return f"Node(name='{self.name}', x={self.x}, y={self.y}, z={self.z}, type={self.type})"
+
+class NodeRegistry:
+    def __init__(self, tol=None):
+        """
+        初始化节点注册表: 按名字和坐标索引节点, 并按注册顺序给出稳定的整数编号。
+        Wires按这一编号确定节点在矩阵中的顺序(见Wires.node_ordering)。
+        切分产生的中间节点可只预留编号(reserve), 节点对象在访问时(node)才创建。
+
+        参数:
+        tol (float, optional): 坐标合并容差, 给出时与已注册节点距离不超过tol的新节点合并为该已注册节点;
+                               默认为None, 只按名字合并(管状线段的芯线与表皮端点坐标重合, 但为不同节点)
+        """
+        self.tol = tol
+        # 编号 -> 节点对象, 预留而尚未创建的节点为None
+        self.nodes = []
+        self._names = []
+        # 预留节点的坐标: 逐个预留的为 编号 -> (x, y, z), 批量预留的连续编号为 (首个编号, n*3数组)
+        self._pending = {}
+        self._pending_blocks = []
+        self._by_name = {}
+        self._by_cell = {}
+        self._index = {}
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def __iter__(self):
+        return (self.node(index) for index in range(len(self.nodes)))
+
+    def __contains__(self, name):
+        return name in self._by_name
+
+    def _cell(self, x, y, z):
+        # 以容差为边长的网格单元作为坐标的哈希键
+        return (math.floor(x / self.tol), math.floor(y / self.tol), math.floor(z / self.tol))
+
+    def _find(self, x, y, z):
+        # 与给定坐标距离不超过容差的已注册节点的编号
+        if self.tol is None:
+            return None
+        cx, cy, cz = self._cell(x, y, z)
+        for cell in itertools.product((cx - 1, cx, cx + 1), (cy - 1, cy, cy + 1), (cz - 1, cz, cz + 1)):
+            for index in self._by_cell.get(cell, ()):
+                nx, ny, nz = self.coordinates(index)
+                if (nx - x) ** 2 + (ny - y) ** 2 + (nz - z) ** 2 <= self.tol ** 2:
+                    return index
+        return None
+
+    def _append(self, name, x, y, z, node):
+        # 注册一个新编号, node为None时只预留编号和坐标
+        index = len(self.nodes)
+        self.nodes.append(node)
+        self._names.append(name)
+        self._by_name.setdefault(name, index)
+        if node is None:
+            self._pending[index] = (x, y, z)
+        else:
+            self._index[node] = index
+        if self.tol is not None:
+            self._by_cell.setdefault(self._cell(x, y, z), []).append(index)
+        return index
+
+    def find(self, x, y, z):
+        """
+        查找与给定坐标距离不超过容差的已注册节点, 只检查相邻的27个网格单元。
+
+        返回:
+        node (Node/None): 找到的节点, 未设置容差或未找到时为None
+        """
+        index = self._find(x, y, z)
+        return None if index is None else self.node(index)
+
+    def add(self, node):
+        """
+        注册节点。同名或(设置容差时)坐标重合的节点已存在时返回已注册的节点, 否则注册并返回该节点。
+
+        参数:
+        node (Node): 待注册的节点
+
+        返回:
+        node (Node): 注册表中的节点
+        """
+        index = self._by_name.get(node.name)
+        if index is None:
+            index = self._find(node.x, node.y, node.z)
+        if index is not None:
+            return self.node(index)
+        self._append(node.name, node.x, node.y, node.z, node)
+        return node
+
+    def reserve(self, names, coordinates):
+        """
+        按名字和坐标批量注册节点, 与add相同地合并同名或坐标重合的节点, 但不创建节点对象。
+
+        参数:
+        names (list): 节点名字
+        coordinates (numpy.ndarray, n*3): 节点坐标
+
+        返回:
+        indices (numpy.ndarray, n): 各节点的编号
+        """
+        coordinates = np.array(coordinates, dtype=float).reshape(-1, 3)
+        by_name = self._by_name
+        if self.tol is None and len(set(names)) == len(names) and not any(name in by_name for name in names):
+            # 不按坐标合并且名字均未注册时, 一次预留连续的编号, 坐标按数组保存
+            first = len(self.nodes)
+            indices = np.arange(first, first + len(names))
+            self.nodes.extend([None] * len(names))
+            self._names.extend(names)
+            by_name.update(zip(names, indices.tolist()))
+            self._pending_blocks.append((first, coordinates))
+            return indices
+        indices = np.empty(len(names), dtype=int)
+        for k, (name, (x, y, z)) in enumerate(zip(names, coordinates.tolist())):
+            index = by_name.get(name)
+            if index is None:
+                index = self._find(x, y, z)
+            if index is None:
+                index = self._append(name, x, y, z, None)
+            indices[k] = index
+        return indices
+
+    def get(self, name, default=None):
+        """
+        按名字查找节点。
+        """
+        index = self._by_name.get(name)
+        return default if index is None else self.node(index)
+
+    def node(self, index):
+        """
+        返回编号为index的节点, 预留的节点在此时创建。
+        """
+        node = self.nodes[index]
+        if node is None:
+            x, y, z = self.coordinates(index)
+            self._pending.pop(index, None)
+            node = self.nodes[index] = Node(self._names[index], x, y, z)
+            self._index[node] = index
+        return node
+
+    def coordinates(self, index):
+        """
+        返回编号为index的节点坐标(x, y, z), 不创建预留的节点。
+        """
+        node = self.nodes[index]
+        if node is not None:
+            return (node.x, node.y, node.z)
+        if index in self._pending:
+            return self._pending[index]
+        for first, block in reversed(self._pending_blocks):
+            if index >= first:
+                return tuple(block[index - first].tolist())
+
+    def get_names(self, indices):
+        """
+        返回各编号的节点名字列表, 不创建预留的节点。
+        """
+        names = self._names
+        return [names[index] for index in np.asarray(indices, dtype=int).tolist()]
+
+    def index(self, node):
+        """
+        返回节点的编号(从0开始, 按注册顺序)。
+        """
+        return self._index[node]
+
+    def identify(self, node):
+        """
+        返回节点的编号。未注册的节点(如直接构造线段时新建的节点)按对象注册, 不与同名或坐标重合的节点合并。
+        """
+        index = self._index.get(node)
+        if index is None:
+            index = self._append(node.name, node.x, node.y, node.z, node)
+        return index
+
+    def truncate(self, count):
+        """
+        注销第count个之后注册的节点(如重新切分前注销上次切分产生的中间节点), 保留前count个节点及其编号。
+        """
+        for index in range(count, len(self.nodes)):
+            name, node = self._names[index], self.nodes[index]
+            if self.tol is not None:
+                self._by_cell[self._cell(*self.coordinates(index))].remove(index)
+            if self._by_name.get(name) == index:
+                del self._by_name[name]
+            if node is None:
+                self._pending.pop(index, None)
+            else:
+                del self._index[node]
+        del self.nodes[count:]
+        del self._names[count:]
+        self._pending_blocks = [(first, block[:count - first]) for first, block in self._pending_blocks if first < count]
@@ -10,8 +10,10 @@ from Ground import Ground
 from Device import Device
 from Node import MeasurementNode
 import numpy as np
+from scipy import sparse
 from scipy.linalg import block_diag
-from Utils.Matrix import expand_matrix, copy_and_expand_matrix, update_matrix, update_and_sum_matrix
+from Utils.Matrix import expand_matrix_all, copy_and_expand_matrix, update_and_sum_matrix, sparse_incidence_matrix, scatter_blocks, sparse_blocks
+from Utils.HMatrix import ExpandedHMatrix
 
 
 class Tower:
@@ -32,11 +34,15 @@ class Tower:
         无需传入的参数：
         nodesList (list): 杆塔节点名字列表
         nodesPositions (list): 杆塔节点坐标对列表
-        incidence_matrix (numpy.ndarray, Num(wires) * Num(points)): 邻接矩阵
-        resistance_matrix (numpy.ndarray, Num(wires) * Num(wires)): 阻抗矩阵
-        inductance_matrix (numpy.ndarray, Num(wires) * Num(wires)): 电感矩阵
-        potential_matrix (numpy.ndarray, Num(points) * Num(points)): 电位矩阵
-        capacitance_matrix (numpy.ndarray, Num(points) * Num(points)): 电容矩阵
+        incidence_matrix (scipy.sparse.csr_matrix, Num(wires) * Num(points)): 邻接矩阵
+        resistance_matrix (numpy.ndarray, Num(wires) * Num(wires)): 阻抗矩阵(按分层矩阵建模时为scipy.sparse.csr_matrix)
+        inductance_matrix (numpy.ndarray, Num(wires) * Num(wires)): 电感矩阵(按分层矩阵建模时为ExpandedHMatrix)
+        potential_matrix (numpy.ndarray, Num(points) * Num(points)): 电位矩阵(按分层矩阵建模时为HMatrix)
+        capacitance_matrix (numpy.ndarray, Num(points) * Num(points)): 电容矩阵(按分层矩阵建模时为scipy.sparse.csr_matrix)
+        inductance_hmatrix (HMatrix, Num(wires) * Num(wires)): 分层矩阵形式的线段电感矩阵(不含芯线, 仅在按分层矩阵建模时给出)
+        potential_hmatrix (HMatrix, Num(points) * Num(points)): 分层矩阵形式的节点电位矩阵(仅在按分层矩阵建模时给出)
+        coefficient_cache (dict): 上次计算的电感、电位系数矩阵及其线段、节点几何, 重新划分网格后用于增量计算
+        sheath_self_inductance (numpy.ndarray, k): 各段表皮的自感, 用于按其他频率的管状线段参数重新给出L矩阵中的子矩阵
         """
         self.info = Info
         self.wires = Wires
@@ -45,12 +51,20 @@ class Tower:
         self.ground = Ground
         self.device = Device
         self.measurementNode = MeasurementNode
-        self.nodesList = Wires.get_node_names()
-        self.nodesPositions = Wires.get_node_coordinates()
-        self.bransList = Wires.get_bran_coordinates()
+        self.coefficient_cache = None
+        self.initialize_parameters()
+
+
+    def initialize_parameters(self):
+        """
+        按当前的线段划分初始化节点、支路列表和参数矩阵。
+        """
+        self.nodesList = self.wires.get_node_names()
+        self.nodesPositions = self.wires.get_node_coordinates()
+        self.bransList = self.wires.get_bran_coordinates()
         # 以下是参数矩阵，是Tower建模最终输出的参数
         # 邻接矩阵
-        self.incidence_matrix = np.zeros((self.wires.count(), self.wires.count_distinct_points()))
+        self.incidence_matrix = sparse.csr_matrix((self.wires.count(), self.wires.count_distinct_points()))
         # 阻抗矩阵
         self.resistance_matrix = np.zeros((self.wires.count_airWires() + self.wires.count_gndWires(),
                                            self.wires.count_airWires() + self.wires.count_gndWires()))
@@ -62,6 +76,26 @@ class Tower:
                                           self.wires.count_distinct_airPoints() + self.wires.count_distinct_gndPoints()))
         # 电容矩阵
         self.capacitance_matrix = np.zeros((self.wires.count_distinct_points(), self.wires.count_distinct_points()))
+        # 分层矩阵形式的电感、电位矩阵, 提供matvec和solve
+        self.inductance_hmatrix = None
+        self.potential_hmatrix = None
+        # 各段表皮的自感(不含管状线段内部电感), 建立L矩阵时给出
+        self.sheath_self_inductance = None
+
+
+    def remesh(self, max_length):
+        """
+        按新的最大长度重新划分杆塔线段, 并重新初始化参数矩阵。
+        coefficient_cache保留, 再次建模时只重新计算网格变化的线段和节点所在的行和列。
+
+        参数:
+        max_length (float): 线段的最大长度
+        """
+        self.wires.remesh(max_length)
+        # 与初始化时相同, 表皮线段添加到空气线段集合中
+        for tubeWire in self.wires.tube_wires:
+            self.wires.add_air_wire(tubeWire.sheath)
+        self.initialize_parameters()
 
 
     def initialize_incidence_matrix(self):
@@ -72,23 +106,15 @@ class Tower:
                 column represents the node
                 element represents if this node is start point(-1) or end point(+1) for this wire.(neither is 0)
         """
-        wire_index = 0
-        all_nodes = self.wires.get_all_nodes()
-        node_to_index = {node: i for i, node in enumerate(all_nodes)}
-        for wire_list in [self.wires.air_wires, self.wires.ground_wires]:
-            for wire in wire_list:
-                start_node_index = node_to_index[wire.start_node]
-                end_node_index = node_to_index[wire.end_node]
-                self.incidence_matrix[wire_index][start_node_index] = -1
-                self.incidence_matrix[wire_index][end_node_index] = 1
-                wire_index += 1
-        for tube_wire in self.wires.tube_wires:
-            for core_wire in tube_wire.core_wires:
-                start_node_index = node_to_index[core_wire.start_node]
-                end_node_index = node_to_index[core_wire.end_node]
-                self.incidence_matrix[wire_index][start_node_index] = -1
-                self.incidence_matrix[wire_index][end_node_index] = 1
-                wire_index += 1
+        # 每行只有起点(-1)和终点(+1)两个非零元素, 以稀疏矩阵存储; 节点编号取自Wires缓存的节点顺序
+        ordering = self.wires.node_ordering
+        count = len(self.wires.air_wires) + len(self.wires.ground_wires)
+        # 各段管状线段的芯线(表皮之后的各列)
+        core_start = [starts[1:] for starts in ordering.tube_start]
+        core_end = [ends[1:] for ends in ordering.tube_end]
+        bran_index = np.stack((np.concatenate([ordering.start[:count]] + core_start),
+                               np.concatenate([ordering.end[:count]] + core_end)), axis=1)
+        self.incidence_matrix = sparse_incidence_matrix(bran_index, self.incidence_matrix.shape)
 
     def initialize_resistance_matrix(self):
         """
@@ -121,13 +147,49 @@ class Tower:
     def add_potential_matrix(self, P):
         self.potential_matrix += P
 
+    def initialize_inductance_hmatrix(self, L, Lin, Lx):
+        """
+        由分层矩阵形式的线段电感矩阵L建立电感矩阵(ExpandedHMatrix), 不展开为稠密矩阵, 结果与依次调用initialize_inductance_matrix、
+        add_inductance_matrix、expand_inductance_matrix、update_inductance_matrix_by_coreWires、update_inductance_matrix_by_tubeWires相同:
+        芯线的行列按编号映射取所在表皮的行列, 线段自身的电感(对角元)和各段管状线段的子矩阵作为稀疏修正。
+
+        参数:
+        L (HMatrix, Nb*Nb): air、ground线段的电感矩阵
+        Lin, Lx (numpy.ndarray, m*m): 管状线段内部的电感矩阵
+        """
+        self.inductance_hmatrix = L
+        index = self.get_branch_sources()
+        indices = self.get_tubeWires_indices()
+        diagonal = np.zeros(len(index))
+        diagonal[:L.shape[0]] = (self.wires.get_inductance() * self.wires.get_lengths()).flatten()
+        self.sheath_self_inductance = (diagonal + L.diagonal()[index])[indices[:, 0]]
+        # 先在修正中预留各子矩阵的位置, 再按子矩阵写入(减去分层矩阵在该位置的值)
+        correction = sparse_blocks((len(index), len(index)), indices, 0.0, diagonal)
+        self.inductance_matrix = ExpandedHMatrix(L, index, correction).scatter_blocks(indices, self.get_tubeWires_inductance_blocks(Lin, Lx))
+
+    def get_branch_sources(self):
+        """
+        返回R、L矩阵各支路在air、ground线段中对应的编号: 芯线对应所在段的表皮(与expand_inductance_matrix复制的行列相同), 其余为自身。
+
+        返回:
+        index (numpy.ndarray, Num(wires))
+        """
+        end_index = len(self.wires.air_wires) + len(self.wires.ground_wires)
+        index = np.arange(self.wires.count())
+        if self.wires.tube_wires:
+            sheath_index = np.arange(len(self.wires.tube_wires)) + len(self.wires.air_wires) - len(self.wires.tube_wires)
+            index[end_index:] = np.repeat(sheath_index, self.wires.tube_wires[0].inner_num)
+        return index
+
     def expand_inductance_matrix(self):
         # 通过TubeWire的表皮与其他线段的互感，扩展复制代替为芯线与其他线段的互感，因为芯线和表皮实际上在一个位置
-        for i in range(len(self.wires.tube_wires)):
-            inner_num = self.wires.tube_wires[i].inner_num
-            sheath_index = i + len(self.wires.air_wires) - len(self.wires.tube_wires)
-            end_index = len(self.wires.air_wires) + len(self.wires.ground_wires)
-            self.inductance_matrix = expand_matrix(self.inductance_matrix, sheath_index, end_index, inner_num)
+        # 所有管状线段一次扩充, 第i段表皮的行列复制为第i段芯线的行列
+        if not self.wires.tube_wires:
+            return
+        inner_num = self.wires.tube_wires[0].inner_num
+        sheath_index = np.arange(len(self.wires.tube_wires)) + len(self.wires.air_wires) - len(self.wires.tube_wires)
+        end_index = len(self.wires.air_wires) + len(self.wires.ground_wires)
+        self.inductance_matrix = expand_matrix_all(self.inductance_matrix, sheath_index, end_index, inner_num)
 
     def update_inductance_matrix_by_coreWires(self):
         # 获取内部芯线的数量
@@ -144,21 +206,53 @@ class Tower:
         return sheath_inductance_matrix
 
     def update_inductance_matrix_by_tubeWires(self, sheath_inductance_matrix, Lin, Lx):
-        # 获取第一个管状线段的表皮和芯线在矩阵中的索引
-        index = self.wires.get_tubeWires_start_index()
-        # 获取索引增量，保证下面循环过程中，index+increment就是下一条管状线段的表皮和芯线的索引
-        increment = self.wires.get_tubeWires_index_increment()
+        indices = self.get_tubeWires_indices()
 
         L0 = Lin.copy()
         L0[0, 0] = 0
-        for i in range(len(self.wires.tube_wires)):
-            Lss = Lin[0, 0] + sheath_inductance_matrix[i, i]
-            # L0+Lx+Lss的最终结果 更新到表皮和芯线的自感和互感位置上去
-            self.inductance_matrix = update_matrix(self.inductance_matrix, index, L0 + Lx + Lss)
-            index = [x + y for x, y in zip(index, increment)] # index+increment就是下一条管状线段的表皮和芯线的索引
+        # sheath_inductance_matrix是电感矩阵的视图, 须在写入前取出各段表皮的自感
+        self.sheath_self_inductance = np.diagonal(sheath_inductance_matrix)[:len(indices)].copy()
+        # L0+Lx+Lss的最终结果 一次更新到各段表皮和芯线的自感和互感位置上去
+        scatter_blocks(self.inductance_matrix, indices, self.get_tubeWires_inductance_blocks(Lin, Lx))
 
         return L0
+
+    def get_tubeWires_inductance_blocks(self, Lin, Lx):
+        """
+        返回各段管状线段的表皮和芯线在L矩阵中的子矩阵(L0+Lx+Lss), 须在update_inductance_matrix_by_tubeWires之后调用。
+
+        参数:
+        Lin, Lx (numpy.ndarray, (Nf*)m*m): 管状线段内部的电感矩阵, 可带前导的频率维
+
+        返回:
+        blocks (numpy.ndarray, (Nf*)k*m*m): 第i个子矩阵写入第i段管状线段的索引位置
+        """
+        L0 = Lin.copy()
+        L0[..., 0, 0] = 0
+        Lss = Lin[..., 0, 0, np.newaxis] + self.sheath_self_inductance
+        return (L0 + Lx)[..., np.newaxis, :, :] + Lss[..., np.newaxis, np.newaxis]
     
+    def get_tubeWires_indices(self):
+        """
+        返回各段管状线段的表皮和芯线在R、L矩阵中的索引。
+
+        返回:
+        indices (numpy.ndarray, k*(1+inner_num)): 第i行为第i段管状线段的表皮和芯线的索引
+        """
+        # 第一个管状线段的索引, 加上i倍的索引增量即为第i段管状线段的索引
+        index = np.array(self.wires.get_tubeWires_start_index())
+        increment = np.array(self.wires.get_tubeWires_index_increment())
+        return index + np.arange(len(self.wires.tube_wires))[:, np.newaxis] * increment
+
+    def initialize_sparse_resistance_matrix(self, Rin, Rx):
+        """
+        以稀疏矩阵建立电阻矩阵, 结果与依次调用initialize_resistance_matrix、expand_resistance_matrix、update_resistance_matrix_by_tubeWires相同。
+        """
+        diagonal = np.zeros(self.wires.count())
+        count = len(self.wires.air_wires) + len(self.wires.ground_wires)
+        diagonal[:count] = (self.wires.get_resistance() * self.wires.get_lengths()).flatten()
+        self.resistance_matrix = sparse_blocks((len(diagonal), len(diagonal)), self.get_tubeWires_indices(), self.get_tubeWires_resistance_blocks(Rin, Rx), diagonal)
+
     def expand_resistance_matrix(self):
         # 扩展电阻矩阵
         coreWires_resistance_matrix = np.zeros((len(self.wires.tube_wires) * (self.wires.tube_wires[0].inner_num), len(self.wires.tube_wires) * (self.wires.tube_wires[0].inner_num)))
@@ -166,20 +260,42 @@ class Tower:
 
     def update_resistance_matrix_by_tubeWires(self, Rin, Rx):
         # 与电感矩阵更新逻辑相同
-        index = self.wires.get_tubeWires_start_index()
-        increment = self.wires.get_tubeWires_index_increment()
+        indices = self.get_tubeWires_indices()
+        scatter_blocks(self.resistance_matrix, indices, self.get_tubeWires_resistance_blocks(Rin, Rx))
 
+    def get_tubeWires_resistance_blocks(self, Rin, Rx):
+        """
+        返回管状线段的表皮和芯线在R矩阵中的子矩阵(R0+Rx+Rss, 各段相同)。
+
+        参数:
+        Rin, Rx (numpy.ndarray, (Nf*)m*m): 管状线段内部的电阻矩阵, 可带前导的频率维
+
+        返回:
+        block (numpy.ndarray, (Nf*)m*m): 写入各段管状线段的索引位置的子矩阵
+        """
         R0 = Rin.copy()
-        R0[0, 0] = 0
-        Rss = Rin[0, 0] # 此处与电感矩阵更新过程不同，此处不需要表皮的单位电阻
-        for i in range(len(self.wires.tube_wires)):
-            self.resistance_matrix = update_matrix(self.resistance_matrix, index, R0 + Rx + Rss)
-            index = [x + y for x, y in zip(index, increment)]
+        R0[..., 0, 0] = 0
+        Rss = Rin[..., 0, 0, np.newaxis, np.newaxis] # 此处与电感矩阵更新过程不同，此处不需要表皮的单位电阻
+        return R0 + Rx + Rss
 
     def update_capacitance_matrix_by_tubeWires(self, Cin):
         # 更新电容矩阵
-        C0 = update_and_sum_matrix(Cin)
         indices = self.wires.get_tubeWires_points_index()
-        for i in range(len(indices)):
-            # 将C矩阵相应位置的点 更新为C0相应位置的数据
-            self.capacitance_matrix = update_matrix(self.capacitance_matrix, indices[i], 0.5*C0 if i==0 or i==len(indices)-1 else C0)#与外界相连接的部分，需要折半
\ No newline at end of file
+        if len(indices) == 0:
+            return
+        scatter_blocks(self.capacitance_matrix, indices, self.get_tubeWires_capacitance_blocks(Cin, len(indices)))
+
+    def initialize_sparse_capacitance_matrix(self, Cin):
+        """
+        以稀疏矩阵建立电容矩阵, 结果与在零矩阵上调用update_capacitance_matrix_by_tubeWires相同。
+        """
+        indices = self.wires.get_tubeWires_points_index()
+        blocks = self.get_tubeWires_capacitance_blocks(Cin, len(indices)) if len(indices) else 0.0
+        self.capacitance_matrix = sparse_blocks(self.capacitance_matrix.shape, indices, blocks)
+
+    def get_tubeWires_capacitance_blocks(self, Cin, count):
+        # 将C矩阵相应位置的点 更新为C0相应位置的数据, 与外界相连接的部分(首、末两组点)需要折半
+        C0 = update_and_sum_matrix(Cin)
+        blocks = np.repeat(C0[np.newaxis], count, axis=0)
+        blocks[[0, -1]] = 0.5 * C0
+        return blocks
\ No newline at end of file
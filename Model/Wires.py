@@ -7,9 +7,10 @@ import math
 import numpy as np
 curPath = os.path.abspath(os.path.dirname(__file__))
 sys.path.append(curPath)
-from Node import Node
+from Node import Node, NodeRegistry
 # from Lump import Component
 import collections
+import collections.abc
 
 class Wire:
     def __init__(self, name: str, start_node: Node, end_node: Node, offset: float, r: float, R: float, L: float, sig: float, mur: float, epr: float, VF):
@@ -44,7 +45,6 @@ class Wire:
         self.inner_num = 1
         self.height = (end_node.z + start_node.z)/2
 
-
     def length(self):
         dx = self.end_node.x - self.start_node.x
         dy = self.end_node.y - self.start_node.y
@@ -248,8 +248,229 @@ class LumpWire(Wire):
         self.components.append(component)
 
 
+def _wire_columns(wires):
+    """
+    逐个线段读取参数, 返回起点、终点坐标(n*3)和参数(n*8: offset, r, R, L, sig, mur, epr, height)。
+    """
+    n = len(wires)
+    start = np.array([(wire.start_node.x, wire.start_node.y, wire.start_node.z) for wire in wires], dtype=float).reshape(n, 3)
+    end = np.array([(wire.end_node.x, wire.end_node.y, wire.end_node.z) for wire in wires], dtype=float).reshape(n, 3)
+    parameters = np.array([(wire.offset, wire.r, wire.R, wire.L, wire.sig, wire.mur, wire.epr, wire.height) for wire in wires], dtype=float).reshape(n, 8)
+    return start, end, parameters
+
+
+class SplitWireList(collections.abc.MutableSequence):
+    def __init__(self, wires, counts, nodes):
+        """
+        切分后的线段列表: 所有子线段的端点坐标和端点的节点编号按数组一次算出, 子线段的Wire对象和中间节点在访问时才创建。
+        未切分的线段保留原对象。子线段和中间节点的命名与逐段切分相同('名字_Splited_i'、'名字_MiddleNode_i')。
+
+        参数:
+        wires (list): 原线段列表
+        counts (numpy.ndarray, n): 每条原线段切分的段数
+        nodes (NodeRegistry): 节点注册表, 中间节点在切分时预留编号, 访问时才创建节点对象
+        """
+        self._wires = list(wires)
+        self._nodes = nodes
+        self._counts = np.asarray(counts, dtype=int)
+        start, end, self._parameters = _wire_columns(self._wires)
+
+        # 子线段 -> 原线段编号, 以及在原线段中的段号(从1开始)
+        self._source = np.repeat(np.arange(len(self._wires)), self._counts)
+        first = np.cumsum(self._counts) - self._counts
+        self._segment = np.arange(len(self._source)) - first[self._source] + 1
+        step = (end - start) / self._counts[:, np.newaxis]
+        self._start = start[self._source] + (self._segment - 1)[:, np.newaxis] * step[self._source]
+        self._end = start[self._source] + self._segment[:, np.newaxis] * step[self._source]
+        last = first + self._counts - 1
+        self._end[last] = end
+
+        # 子线段端点的节点编号: 原线段的端点取其注册编号, 子线段j的起始中间节点(即子线段j-1的终止节点)按名字和坐标预留编号
+        start_ids = np.array([nodes.identify(wire.start_node) for wire in self._wires], dtype=int)
+        end_ids = np.array([nodes.identify(wire.end_node) for wire in self._wires], dtype=int)
+        middle = np.flatnonzero(self._segment > 1)
+        names = [f"{self._wires[i].name}_MiddleNode_{k - 1}" for i, k in zip(self._source[middle].tolist(), self._segment[middle].tolist())]
+        registered = len(nodes)
+        self._start_id = start_ids[self._source]
+        self._start_id[middle] = nodes.reserve(names, self._start[middle])
+        self._end_id = np.empty_like(self._start_id)
+        self._end_id[:-1] = self._start_id[1:]
+        self._end_id[last] = end_ids
+        # 与已注册节点或前面的中间节点合并的中间节点, 端点坐标取被合并节点的坐标
+        middle_ids = self._start_id[middle]
+        merged = middle_ids < registered
+        merged[np.setdiff1d(np.arange(len(middle)), np.unique(middle_ids, return_index=True)[1])] = True
+        for j in middle[merged]:
+            self._start[j] = self._end[j - 1] = nodes.coordinates(self._start_id[j])
+
+        # 每个位置为已创建的线段对象, 或尚未创建的子线段编号
+        self._slots = list(range(len(self._source)))
+        for i in np.flatnonzero(self._counts == 1):
+            self._slots[first[i]] = self._wires[i]
+
+    def _materialize(self, j):
+        wire = self._wires[self._source[j]]
+        segment = int(self._segment[j])
+        start_node = wire.start_node if segment == 1 else self._nodes.node(self._start_id[j])
+        end_node = wire.end_node if segment == self._counts[self._source[j]] else self._nodes.node(self._end_id[j])
+        return Wire(f"{wire.name}_Splited_{segment}", start_node, end_node, wire.offset, wire.r, wire.R, wire.L, wire.sig, wire.mur, wire.epr, wire.VF)
+
+    def _get(self, i):
+        slot = self._slots[i]
+        if type(slot) is int:
+            slot = self._slots[i] = self._materialize(slot)
+        return slot
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self._get(k) for k in range(*i.indices(len(self._slots)))]
+        return self._get(i)
+
+    def __setitem__(self, i, wire):
+        self._slots[i] = wire
+
+    def __delitem__(self, i):
+        del self._slots[i]
+
+    def __len__(self):
+        return len(self._slots)
+
+    def insert(self, i, wire):
+        self._slots.insert(i, wire)
+
+    def __add__(self, other):
+        return list(self) + list(other)
+
+    def __radd__(self, other):
+        return list(other) + list(self)
+
+    def __repr__(self):
+        return repr(list(self))
+
+    def _slot_index(self):
+        # 各位置尚未创建的子线段编号, 已创建的线段对象为-1
+        return np.array([slot if type(slot) is int else -1 for slot in self._slots], dtype=int)
+
+    def node_ids(self):
+        """
+        返回各线段起点、终点的节点注册表编号, 尚未创建的子线段直接取自数组, 不创建Wire和Node对象。
+        """
+        index = self._slot_index()
+        lazy = index >= 0
+        start_ids, end_ids = np.empty(len(index), dtype=int), np.empty(len(index), dtype=int)
+        start_ids[lazy], end_ids[lazy] = self._start_id[index[lazy]], self._end_id[index[lazy]]
+        for i in np.flatnonzero(~lazy):
+            start_ids[i] = self._nodes.identify(self._slots[i].start_node)
+            end_ids[i] = self._nodes.identify(self._slots[i].end_node)
+        return start_ids, end_ids
+
+    def names(self):
+        """
+        返回各线段的名字, 尚未创建的子线段按切分的命名规则给出, 不创建Wire对象。
+        """
+        wire_names = [wire.name for wire in self._wires]
+        source, segment = self._source.tolist(), self._segment.tolist()
+        return [f"{wire_names[source[slot]]}_Splited_{segment[slot]}" if type(slot) is int else slot.name for slot in self._slots]
+
+    def columns(self):
+        """
+        返回与_wire_columns相同格式的参数, 尚未创建的子线段直接取自数组, 不创建Wire对象。
+        """
+        index = self._slot_index()
+        created = np.flatnonzero(index < 0)
+        index = index[index >= 0]
+        n = len(self._slots)
+        start, end, parameters = np.empty((n, 3)), np.empty((n, 3)), np.empty((n, 8))
+        lazy = np.ones(n, dtype=bool)
+        lazy[created] = False
+        start[lazy], end[lazy] = self._start[index], self._end[index]
+        parameters[lazy] = self._parameters[self._source[index]]
+        parameters[lazy, 7] = (end[lazy, 2] + start[lazy, 2]) / 2
+        start[created], end[created], parameters[created] = _wire_columns([self._slots[i] for i in created])
+        return start, end, parameters
+
+
+class WireArrays:
+    # 列式存储的类别顺序, 与各get_*方法的拼接顺序一致
+    CATEGORIES = ('air', 'ground', 'a2g', 'short')
+
+    def __init__(self, wire_lists):
+        """
+        线段参数的列式存储: 每个参数为一个连续的只读numpy数组, 按air、ground、a2g、short的顺序拼接。
+
+        参数:
+        wire_lists (list): 按CATEGORIES顺序给出的各类线段列表
+
+        属性:
+        start, end (numpy.ndarray, n*3): 起点、终点坐标
+        offset, r, R, L, sig, mur, epr, height, length (numpy.ndarray, n): 线段参数
+        ranges (dict): 类别 -> 该类线段在数组中的切片
+        """
+        self.ranges = {}
+        first = 0
+        for category, wire_list in zip(self.CATEGORIES, wire_lists):
+            self.ranges[category] = slice(first, first + len(wire_list))
+            first += len(wire_list)
+
+        # 切分后的线段列表直接给出数组, 不逐个创建线段对象
+        columns = [wire_list.columns() if isinstance(wire_list, SplitWireList) else _wire_columns(wire_list) for wire_list in wire_lists]
+        self.start, self.end, parameters = (np.concatenate(column) for column in zip(*columns))
+        self.offset, self.r, self.R, self.L, self.sig, self.mur, self.epr, self.height = np.ascontiguousarray(parameters.T)
+        delta = self.end - self.start
+        # 与Wire.length()相同的运算顺序
+        self.length = np.sqrt(delta[:, 0] ** 2 + delta[:, 1] ** 2 + delta[:, 2] ** 2)
+        for column in (self.start, self.end, self.offset, self.r, self.R, self.L, self.sig, self.mur, self.epr, self.height, self.length):
+            column.flags.writeable = False
+
+    def __len__(self):
+        return len(self.start)
+
+
+class NodeOrdering:
+    def __init__(self, start_ids, end_ids, air_count, gnd_count, tube_ids):
+        """
+        节点在矩阵中的编号: 按air、ground、a2g、short、tube的顺序, 以节点注册表编号首次出现的先后编号。
+        邻接矩阵、电位矩阵、电容矩阵和支路节点编号共用这一编号。
+
+        参数:
+        start_ids, end_ids (numpy.ndarray, n): air、ground、a2g、short线段起点、终点的注册表编号(与WireArrays的顺序一致)
+        air_count, gnd_count (int): air、ground线段的数量
+        tube_ids (list): 各管状线段的(起点编号, 终点编号), 每项依次为表皮和各芯线
+
+        属性:
+        ids (numpy.ndarray, N): 矩阵编号 -> 注册表编号
+        start, end (numpy.ndarray, n): air、ground、a2g、short线段起点、终点的矩阵编号
+        tube_start, tube_end (list): 各管状线段表皮和芯线起点、终点的矩阵编号
+        air_points, gnd_points (int): air、ground线段的不重复节点数
+        """
+        # 每条线段依次给出起点和终点, 管状线段依次给出表皮和各芯线的起点和终点
+        sequence = np.concatenate([np.stack((start_ids, end_ids), axis=1).ravel()] +
+                                  [np.stack((starts, ends), axis=1).ravel() for starts, ends in tube_ids]).astype(int)
+        ids, first, inverse = np.unique(sequence, return_index=True, return_inverse=True)
+        order = np.argsort(first, kind='stable')
+        rank = np.empty_like(order)
+        rank[order] = np.arange(len(order))
+        self.ids = ids[order]
+        matrix_index = rank[inverse]
+
+        n = len(start_ids)
+        self.start, self.end = matrix_index[0:2 * n:2], matrix_index[1:2 * n:2]
+        self.tube_start, self.tube_end = [], []
+        first = 2 * n
+        for starts, _ in tube_ids:
+            tube_index = matrix_index[first:first + 2 * len(starts)]
+            self.tube_start.append(tube_index[0::2])
+            self.tube_end.append(tube_index[1::2])
+            first += 2 * len(starts)
+        self.air_points = len(np.unique(sequence[:2 * air_count]))
+        self.gnd_points = len(np.unique(sequence[2 * air_count:2 * (air_count + gnd_count)]))
+
+    def __len__(self):
+        return len(self.ids)
+
+
 class Wires:
-    def __init__(self, air_wires=None, ground_wires=None, a2g_wires=None, short_wires=None, tube_wires=None):
+    def __init__(self, air_wires=None, ground_wires=None, a2g_wires=None, short_wires=None, tube_wires=None, nodes=None):
         """
         初始化Wires对象
 
@@ -259,12 +480,22 @@ class Wires:
         a2g_wires (Wire类型的list, optional): 空气到地线段列表,默认为空列表。
         short_wires (Wire类型的list, optional): 短路线段列表,默认为空列表。
         tube_wires (TubeWire类型的list, optional): 管状线段列表,默认为空列表。
+        nodes (NodeRegistry, optional): 节点注册表, 与初始化共用, 切分产生的中间节点也注册于此,默认为空的注册表。
         """
         self.air_wires = air_wires or []
         self.ground_wires = ground_wires or []
         self.a2g_wires = a2g_wires or []
         self.short_wires = short_wires or []
         self.tube_wires = tube_wires or []
+        self.nodes = nodes if nodes is not None else NodeRegistry()
+        # 修改计数: 通过Wires的方法增删、切分线段或调用invalidate()时加一
+        self._version = 0
+        self._arrays = None
+        self._arrays_key = None
+        self._node_ordering = None
+        self._node_ordering_key = None
+        # 首次切分前的原线段列表和节点注册表大小, 用于重新切分
+        self._unsplit = None
 
 
     def display(self):
@@ -294,20 +525,85 @@ class Wires:
             wire.display()
 
 
+    @property
+    def arrays(self):
+        """
+        返回air、ground、a2g、short线段的列式存储(WireArrays)。
+        线段列表被替换、长度变化或通过Wires的方法修改后自动重建;
+        在列表中原位替换线段、原地修改线段参数或移动节点后需调用invalidate()。
+        """
+        if not self._is_current(self._arrays_key):
+            self._arrays = WireArrays((self.air_wires, self.ground_wires, self.a2g_wires, self.short_wires))
+            self._arrays_key = self._current_key()
+        return self._arrays
+
+    @property
+    def node_ordering(self):
+        """
+        返回节点在矩阵中的编号(NodeOrdering), 按节点注册表的编号算出, 与arrays相同的条件下自动重建。
+        """
+        if not self._is_current(self._node_ordering_key):
+            starts, ends = [], []
+            for wire_list in (self.air_wires, self.ground_wires, self.a2g_wires, self.short_wires):
+                start_ids, end_ids = self._node_ids(wire_list)
+                starts.append(start_ids)
+                ends.append(end_ids)
+            tube_ids = [self._node_ids([tubewire.sheath] + tubewire.core_wires) for tubewire in self.tube_wires]
+            self._node_ordering = NodeOrdering(np.concatenate(starts), np.concatenate(ends), len(self.air_wires), len(self.ground_wires), tube_ids)
+            self._node_ordering_key = self._current_key()
+        return self._node_ordering
+
+    def _node_ids(self, wire_list):
+        # 线段起点、终点的节点注册表编号, 切分后的线段列表直接给出数组
+        if isinstance(wire_list, SplitWireList):
+            return wire_list.node_ids()
+        identify = self.nodes.identify
+        start_ids = np.array([identify(wire.start_node) for wire in wire_list], dtype=int)
+        end_ids = np.array([identify(wire.end_node) for wire in wire_list], dtype=int)
+        return start_ids, end_ids
+
+    def _current_key(self):
+        # 保存列表对象本身(而非id), 避免列表被回收后id被复用
+        wire_lists = (self.air_wires, self.ground_wires, self.a2g_wires, self.short_wires, self.tube_wires)
+        return wire_lists, tuple(len(wire_list) for wire_list in wire_lists), self._version
+
+    def _is_current(self, key):
+        # 缓存建立后线段列表未被替换、长度未变, 且修改计数未变
+        if key is None:
+            return False
+        wire_lists, sizes, version = self._current_key()
+        return key[1:] == (sizes, version) and all(old is new for old, new in zip(key[0], wire_lists))
+
+    def invalidate(self):
+        """
+        丢弃列式存储和节点编号, 下次访问时按线段对象重建。
+        在线段列表中原位替换线段、原地修改线段参数或芯线、移动节点后调用。
+        """
+        self._version += 1
+        self._arrays = None
+        self._arrays_key = None
+        self._node_ordering = None
+        self._node_ordering_key = None
+
     def add_air_wire(self, wire):
         self.air_wires.append(wire)
+        self.invalidate()
 
     def add_ground_wire(self, wire):
         self.ground_wires.append(wire)
+        self.invalidate()
 
     def add_a2g_wire(self, wire):
         self.a2g_wires.append(wire)
+        self.invalidate()
 
     def add_short_wire(self, wire):
         self.short_wires.append(wire)
+        self.invalidate()
 
     def add_tube_wire(self, wire):
         self.tube_wires.append(wire)
+        self.invalidate()
 
     def count(self):
         """
@@ -327,33 +623,8 @@ class Wires:
         返回:
         node_names (list): 结点名字列表
         """
-        node_names = []
-
-        # 要求按照特定顺序进行拼接，因此分别进行for循环。
-
-        # 处理空气线段
-        for wire in self.air_wires:
-            node_names.extend([wire.start_node.name, wire.end_node.name])
-
-        # 处理地线段
-        for wire in self.ground_wires:
-            node_names.extend([wire.start_node.name, wire.end_node.name])
-
-        # 处理管状线段
-        for wire in self.tube_wires:
-            node_names.extend([wire.sheath.start_node.name, wire.sheath.end_node.name])
-            for core_wire in wire.core_wires:
-                node_names.extend([core_wire.start_node.name, core_wire.end_node.name])
-
-        # 处理空气到地线段
-        for wire in self.a2g_wires:
-            node_names.extend([wire.start_node.name, wire.end_node.name])
-
-        # 处理短路线段
-        for wire in self.short_wires:
-            node_names.extend([wire.start_node.name, wire.end_node.name])
-
-        return node_names
+        # 名字由节点注册表按编号给出, 不创建切分产生的线段和节点对象
+        return self.nodes.get_names(self.node_ordering.ids[self._listed_node_index().ravel()])
 
     def get_node_coordinates(self):
         """
@@ -362,39 +633,29 @@ class Wires:
         返回:
         coordinates (list): 结点坐标列表,每个元素为(x, y, z)
         """
-        coordinates = []
-
-        # 要求按照特定顺序进行拼接，因此分别进行for循环。
-
-        # 处理空气线段
-        for wire in self.air_wires:
-            coordinates.extend([(wire.start_node.x, wire.start_node.y, wire.start_node.z),
-                                (wire.end_node.x, wire.end_node.y, wire.end_node.z)])
-
-        # 处理地线段
-        for wire in self.ground_wires:
-            coordinates.extend([(wire.start_node.x, wire.start_node.y, wire.start_node.z),
-                                (wire.end_node.x, wire.end_node.y, wire.end_node.z)])
-
-        # 处理管状线段
-        for tubewire in self.tube_wires:
-            coordinates.extend([(tubewire.sheath.start_node.x, tubewire.sheath.start_node.y, tubewire.sheath.start_node.z),
-                                (tubewire.sheath.end_node.x, tubewire.sheath.end_node.y, tubewire.sheath.end_node.z)])
-            for core_wire in tubewire.core_wires:
-                coordinates.extend([(core_wire.start_node.x, core_wire.start_node.y, core_wire.start_node.z),
-                                    (core_wire.end_node.x, core_wire.end_node.y, core_wire.end_node.z)])
-
-        # 处理空气到地线段
-        for wire in self.a2g_wires:
-            coordinates.extend([(wire.start_node.x, wire.start_node.y, wire.start_node.z),
-                                (wire.end_node.x, wire.end_node.y, wire.end_node.z)])
+        # air、ground、a2g、short线段的端点取自列式存储
+        arrays = self.arrays
+        count = len(self.air_wires) + len(self.ground_wires)
+        points = np.stack((arrays.start, arrays.end), axis=1)
+        tube_points = [np.array([[(wire.start_node.x, wire.start_node.y, wire.start_node.z), (wire.end_node.x, wire.end_node.y, wire.end_node.z)]
+                                 for wire in [tubewire.sheath] + tubewire.core_wires], dtype=float).reshape(-1, 2, 3)
+                       for tubewire in self.tube_wires]
+        coordinates = np.concatenate([points[:count]] + tube_points + [points[count:]]).reshape(-1, 3)
+        return list(zip(*coordinates.T.tolist()))
 
-        # 处理短路线段
-        for wire in self.short_wires:
-            coordinates.extend([(wire.start_node.x, wire.start_node.y, wire.start_node.z),
-                                (wire.end_node.x, wire.end_node.y, wire.end_node.z)])
+    def _listed_node_index(self):
+        """
+        按air、ground、tube、a2g、short的顺序(结点名字、坐标和支路信息列表的顺序), 返回各线段起点、终点的矩阵编号(n*2)。
+        """
+        ordering = self.node_ordering
+        count = len(self.air_wires) + len(self.ground_wires)
+        pairs = np.stack((ordering.start, ordering.end), axis=1)
+        tube_pairs = [np.stack((starts, ends), axis=1) for starts, ends in zip(ordering.tube_start, ordering.tube_end)]
+        return np.concatenate([pairs[:count]] + tube_pairs + [pairs[count:]]).reshape(-1, 2)
 
-        return coordinates
+    def _wire_names(self, wire_list):
+        # 线段名字, 切分后的线段列表不创建子线段对象
+        return wire_list.names() if isinstance(wire_list, SplitWireList) else [wire.name for wire in wire_list]
 
 
     def count_distinct_airPoints(self):
@@ -407,14 +668,7 @@ class Wires:
         返回:
         int: 所有不重复点的总个数
         """
-        all_points = set()
-
-        # 统计 air_wires 中的点
-        for wire in self.air_wires:
-            all_points.add(wire.start_node)
-            all_points.add(wire.end_node)
-
-        return len(all_points)
+        return self.node_ordering.air_points
 
 
     def count_distinct_gndPoints(self) -> int:
@@ -427,14 +681,7 @@ class Wires:
         返回:
         int: 所有不重复点的总个数
         """
-        all_points = set()
-
-        # 统计 ground_wires 中的点
-        for wire in self.ground_wires:
-            all_points.add(wire.start_node)
-            all_points.add(wire.end_node)
-
-        return len(all_points)
+        return self.node_ordering.gnd_points
 
 
     def count_distinct_points(self) -> int:
@@ -447,9 +694,20 @@ class Wires:
         返回:
         int: 所有不重复点的总个数
         """
-        return len(self.get_all_nodes())
+        return len(self.node_ordering)
 
     
+    def get_node_index(self):
+        """
+        返回 Wires 对象中所有不重复节点在矩阵中的编号, 按照air、ground、a2g、short、tube的顺序首次出现的先后编号。
+        编号取自缓存的node_ordering; 建模过程直接使用node_ordering, 不构造此字典。
+
+        返回:
+        node_index(dict): 节点 -> 编号(从0开始)
+        """
+        return {node: index for index, node in enumerate(self.get_all_nodes())}
+
+
     def get_all_nodes(self):
         """
         返回 Wires 对象中所有线段的所有点的集合。
@@ -458,23 +716,10 @@ class Wires:
         wires (Wires): Wires 对象
 
         返回:
-        all_nodes(OrderedDict): 所有不重复点的有序集合
+        all_nodes(list): 所有不重复点的有序集合
         """
         # 获取所有不重复的节点(包含管状线段内部线段的起始点和终止点)
-        all_nodes = collections.OrderedDict()
-        for wire_list in [self.air_wires, self.ground_wires, self.a2g_wires, self.short_wires]:
-            for wire in wire_list:
-                all_nodes[wire.start_node] = True
-                all_nodes[wire.end_node] = True
-
-        for tubewire in self.tube_wires:
-            all_nodes[tubewire.sheath.start_node] = True
-            all_nodes[tubewire.sheath.end_node] = True
-            for core_wire in tubewire.core_wires:
-                all_nodes[core_wire.start_node] = True
-                all_nodes[core_wire.end_node] = True
-
-        return list(all_nodes)
+        return [self.nodes.node(i) for i in self.node_ordering.ids]
     
 
     def get_tubeWires_points_index(self):
@@ -485,23 +730,13 @@ class Wires:
         wires (Wires): Wires 对象
 
         返回:
-        indices(list): 二维矩阵, 按照切分的批, 分别表示一批表皮和芯线的点的索引集合
+        indices(list): 二维矩阵, 按照切分的批, 分别表示一批表皮和芯线的点的索引集合, 没有管状线段时为空
         """
-        all_nodes = self.get_all_nodes()
-        node_to_index = {node: i for i, node in enumerate(all_nodes)}
-        indices = []
-        for tubewire in self.tube_wires:
-            index = []
-            index.append(node_to_index[tubewire.sheath.start_node])
-
-            for core_wire in tubewire.core_wires:
-                index.append(node_to_index[core_wire.start_node])
-            indices.append(index)
-        index = []
-        index.append(node_to_index[self.tube_wires[len(self.tube_wires)-1].sheath.end_node])
-        for core_wire in self.tube_wires[len(self.tube_wires)-1].core_wires:
-                index.append(node_to_index[core_wire.end_node])
-        indices.append(index)
+        ordering = self.node_ordering
+        if not ordering.tube_start:
+            return []
+        indices = [starts.tolist() for starts in ordering.tube_start]
+        indices.append(ordering.tube_end[-1].tolist())
         return indices
 
 
@@ -528,10 +763,7 @@ class Wires:
         返回:
         start_points (numpy.narray, n*3): n条线段的起始点结点坐标矩阵,每行为(x, y, z)
         """
-        start_points = np.zeros((len(self.air_wires + self.ground_wires + self.a2g_wires + self.short_wires), 3))
-        for i, wire in enumerate(self.air_wires + self.ground_wires + self.a2g_wires + self.short_wires):
-            start_points[i] = [wire.start_node.x, wire.start_node.y, wire.start_node.z]
-        return start_points
+        return self.arrays.start
 
 
     def get_end_points(self):
@@ -541,10 +773,7 @@ class Wires:
         返回:
         end_points (numpy.narray, n*3): n条线段的终止点结点坐标矩阵,每行为(x, y, z)
         """
-        end_points = np.zeros((len(self.air_wires + self.ground_wires + self.a2g_wires + self.short_wires), 3))
-        for i, wire in enumerate(self.air_wires + self.ground_wires + self.a2g_wires + self.short_wires):
-            end_points[i] = [wire.end_node.x, wire.end_node.y, wire.end_node.z]
-        return end_points
+        return self.arrays.end
 
 
     def get_radii(self):
@@ -554,10 +783,7 @@ class Wires:
         返回:
         radii (numpy.narray, n*1): n条线段的内径矩阵,每行为某一条线段的内径
         """
-        radii = np.zeros((len(self.air_wires + self.ground_wires + self.a2g_wires + self.short_wires), 1))
-        for i, wire in enumerate(self.air_wires + self.ground_wires + self.a2g_wires + self.short_wires):
-            radii[i] = wire.r
-        return radii
+        return self.arrays.r[:, np.newaxis]
 
 
     def get_heights(self):
@@ -567,10 +793,7 @@ class Wires:
         返回:
         heights (numpy.narray, n*1): n条线段的高度
         """
-        heights = np.zeros((len(self.air_wires + self.ground_wires + self.a2g_wires + self.short_wires), 1))
-        for i, wire in enumerate(self.air_wires + self.ground_wires + self.a2g_wires + self.short_wires):
-            heights[i] = wire.height
-        return heights
+        return self.arrays.height[:, np.newaxis]
 
 
     def get_offsets(self):
@@ -580,10 +803,7 @@ class Wires:
         返回:
         offsets (numpy.narray, n*1): n条线段的偏置
         """
-        offsets = np.zeros((len(self.air_wires + self.ground_wires + self.a2g_wires + self.short_wires), 1))
-        for i, wire in enumerate(self.air_wires + self.ground_wires + self.a2g_wires + self.short_wires):
-            offsets[i] = wire.offset
-        return offsets
+        return self.arrays.offset[:, np.newaxis]
 
 
     def get_lengths(self):
@@ -593,10 +813,7 @@ class Wires:
         返回:
         lengths (numpy.narray, n*1): n条线段的长度
         """
-        lengths = np.zeros((len(self.air_wires + self.ground_wires + self.a2g_wires + self.short_wires), 1))
-        for i, wire in enumerate(self.air_wires + self.ground_wires + self.a2g_wires + self.short_wires):
-            lengths[i] = wire.length()
-        return lengths
+        return self.arrays.length[:, np.newaxis]
 
 
     def get_resistance(self):
@@ -606,10 +823,7 @@ class Wires:
         返回:
         impendence (numpy.narray, n*1): n条线段的电阻
         """
-        resistance = np.zeros((len(self.air_wires + self.ground_wires + self.a2g_wires + self.short_wires), 1))
-        for i, wire in enumerate(self.air_wires + self.ground_wires + self.a2g_wires + self.short_wires):
-            resistance[i] = wire.R
-        return resistance
+        return self.arrays.R[:, np.newaxis]
     
     def get_inductance(self):
         """
@@ -618,10 +832,7 @@ class Wires:
         返回:
         inductance (numpy.narray, n*1): n条线段的电感
         """
-        inductance = np.zeros((len(self.air_wires + self.ground_wires + self.a2g_wires + self.short_wires), 1))
-        for i, wire in enumerate(self.air_wires + self.ground_wires + self.a2g_wires + self.short_wires):
-            inductance[i] = wire.L
-        return inductance
+        return self.arrays.L[:, np.newaxis]
 
 
 
@@ -632,33 +843,12 @@ class Wires:
         返回:
         coordinates (list): 信息汇总列表,每个元素为("Y01", "X01", "X02")
         """
-        coordinates = []
-
-        # 要求按照特定顺序进行拼接，因此分别进行for循环。
-
-        # 处理空气线段
-        for wire in self.air_wires:
-            coordinates.extend([(wire.name, wire.start_node.name, wire.end_node.name)])
-
-        # 处理地线段
-        for wire in self.ground_wires:
-            coordinates.extend([(wire.name, wire.start_node.name, wire.end_node.name)])
-
-        # 处理管状线段
+        wire_names = self._wire_names(self.air_wires) + self._wire_names(self.ground_wires)
         for tubewire in self.tube_wires:
-            coordinates.extend([(tubewire.sheath.name, tubewire.sheath.start_node.name, tubewire.sheath.end_node.name)])
-            for corewire in tubewire.core_wires:
-                coordinates.extend([(corewire.name, corewire.start_node.name, corewire.end_node.name)])
-
-        # 处理空气到地线段
-        for wire in self.a2g_wires:
-            coordinates.extend([(wire.name, wire.start_node.name, wire.end_node.name)])
-
-        # 处理短路线段
-        for wire in self.short_wires:
-            coordinates.extend([(wire.name, wire.start_node.name, wire.end_node.name)])
-
-        return coordinates
+            wire_names.extend([tubewire.sheath.name] + [corewire.name for corewire in tubewire.core_wires])
+        wire_names += self._wire_names(self.a2g_wires) + self._wire_names(self.short_wires)
+        node_names = self.get_node_names()
+        return list(zip(wire_names, node_names[0::2], node_names[1::2]))
 
 
     def get_bran_index(self):
@@ -672,30 +862,10 @@ class Wires:
         返回:
         wire_matrix (numpy.ndarray): N*2 的矩阵,其中 N 为 wire 的数量。
         """
-        # 使用有序字典存储所有的节点及其编号
-        node_to_index = collections.OrderedDict()
-        next_index = 1
-
-        # 遍历所有的 wire,构建节点编号字典和wire矩阵
-        wire_matrix = []
-        for wire in self.air_wires + self.ground_wires:
-            start_node = wire.start_node
-            end_node = wire.end_node
-
-            # 如果起始节点不在字典中,添加到字典并分配编号
-            if start_node not in node_to_index:
-                node_to_index[start_node] = next_index
-                next_index += 1
-
-            # 如果终止节点不在字典中,添加到字典并分配编号
-            if end_node not in node_to_index:
-                node_to_index[end_node] = next_index
-                next_index += 1
-
-            # 将当前 wire 的起始点和终止点编号加入矩阵
-            wire_matrix.append([node_to_index[start_node], node_to_index[end_node]])
-
-        return np.array(wire_matrix)
+        # air、ground的节点在全局编号中排在最前, 其编号与只遍历air、ground时一致
+        ordering = self.node_ordering
+        count = len(self.air_wires) + len(self.ground_wires)
+        return np.stack((ordering.start[:count], ordering.end[:count]), axis=1) + 1
     
 
     def get_tubeWires_start_index(self):
@@ -714,34 +884,25 @@ class Wires:
         return increment
 
     def split_long_wires(self, wires, max_length):
-        new_wires = []
-        # 对所有的线段做长度检查
-        for wire in wires:
-            wire_length = wire.length()
-            # 如果长度符合要求，则跳过，否则，做线段切分
-            if wire_length <= max_length:
-                new_wires.append(wire)
-            else:
-                # 计算要均匀切分为多少段
-                num_segments = math.ceil(wire_length / max_length)
-                # 计算每个子分段的坐标分量
-                dx = (wire.end_node.x - wire.start_node.x) / num_segments
-                dy = (wire.end_node.y - wire.start_node.y) / num_segments
-                dz = (wire.end_node.z - wire.start_node.z) / num_segments
-                # 获取当前即将被分割线段的起始节点
-                start_node = wire.start_node
-                # 迭代切割线段，并分为小线段添加到线段列表中
-                for i in range(num_segments):
-                    # 如果是最后一个分段，则将终止节点设为线段的终止节点
-                    if i == num_segments-1:
-                        end_node = wire.end_node
-                    else:
-                        end_node = Node(f"{wire.name}_MiddleNode_{i+1}", start_node.x + dx, start_node.y + dy, start_node.z + dz)
-                    new_wire = Wire(f"{wire.name}_Splited_{i+1}", start_node, end_node, wire.offset, wire.r, wire.R, wire.L, wire.sig, wire.mur, wire.epr, wire.VF)
-                    new_wires.append(new_wire)
-                    start_node = end_node
-
-        return new_wires
+        """
+        将线段列表切分为长度不超过 max_length 的子线段。
+        所有子线段的端点按数组一次算出; 有线段被切分时返回 SplitWireList, 子线段对象在访问时才创建。
+
+        参数:
+        wires (List[Wire]): 需要切分的线段列表
+        max_length (float): 子线段的最大长度
+
+        返回:
+        List[Wire]: 切分后的线段列表
+        """
+        start, end, _ = _wire_columns(wires)
+        delta = end - start
+        lengths = np.sqrt(delta[:, 0] ** 2 + delta[:, 1] ** 2 + delta[:, 2] ** 2)
+        # 长度符合要求的线段不切分, 否则均匀切分为 ceil(长度 / max_length) 段
+        counts = np.where(lengths <= max_length, 1, np.ceil(lengths / max_length)).astype(int)
+        if np.all(counts == 1):
+            return list(wires)
+        return SplitWireList(wires, counts, self.nodes)
     
 
     def split_tubewires(self, tubewires, max_length):
@@ -778,9 +939,9 @@ class Wires:
                 core_wires_middle_nodes = collections.deque()
                 for i in range(num_segments):
                     middle_node = Node(name=f"{sheath.name}_MiddleNode_{i+1}",
-                                       x = sheath_start_point.x + (i+1)*dx,
-                                       y = sheath_start_point.y + (i+1)*dy,
-                                       z = sheath_start_point.z + (i+1)*dz)
+                                       x = sheath_start_node.x + (i+1)*dx,
+                                       y = sheath_start_node.y + (i+1)*dy,
+                                       z = sheath_start_node.z + (i+1)*dz)
 
                     new_sheath = Wire(
                         name=f"{sheath.name}_Splited_{i+1}",
@@ -795,6 +956,9 @@ class Wires:
                         epr=sheath.epr,
                         VF=sheath.VF
                     )
+                    if i < num_segments-1:
+                        middle_node = self.nodes.add(middle_node)
+                        new_sheath.end_node = middle_node
                     sheath_start_point = middle_node
 
                     # 切分 core_wires
@@ -805,10 +969,10 @@ class Wires:
                         new_core_wire = CoreWire(
                             name=f"{core_wire.name}_Splited_{i+1}",
                             start_node=start_point if i == 0 else core_wires_middle_nodes.popleft(),
-                            end_node=end_point if i == num_segments-1 else Node(name=f"{core_wire.name}_MiddleNode_{i+1}",
-                                                                                x = start_point.x+ (i+1)*dx,
-                                                                                y = start_point.y+ (i+1)*dy,
-                                                                                z = start_point.z+ (i+1)*dz),
+                            end_node=end_point if i == num_segments-1 else self.nodes.add(Node(name=f"{core_wire.name}_MiddleNode_{i+1}",
+                                                                                                               x = start_point.x+ (i+1)*dx,
+                                                                                                               y = start_point.y+ (i+1)*dy,
+                                                                                                               z = start_point.z+ (i+1)*dz)),
                             offset=core_wire.offset,
                             r=core_wire.r,
                             R=core_wire.R,
@@ -836,12 +1000,34 @@ class Wires:
 
 
     def split_long_wires_all(self, max_length):
+        if self._unsplit is None:
+            self._unsplit = (list(self.air_wires), list(self.ground_wires), list(self.a2g_wires), list(self.short_wires),
+                             list(self.tube_wires), len(self.nodes))
         self.air_wires = self.split_long_wires(self.air_wires, max_length)
         self.ground_wires = self.split_long_wires(self.ground_wires, max_length)
         self.a2g_wires = self.split_long_wires(self.a2g_wires, max_length)
         self.short_wires = self.split_long_wires(self.short_wires, max_length)
         self.tube_wires = self.split_tubewires(self.tube_wires, max_length)
+        self.invalidate()
+
+
+    def remesh(self, max_length):
+        """
+        以首次切分前的原线段按新的最大长度重新切分, 并注销上次切分产生的中间节点。
+        段数不变的线段切分后的端点与上次完全相同。
+
+        参数:
+        max_length (float): 子线段的最大长度
+        """
+        if self._unsplit is not None:
+            air_wires, ground_wires, a2g_wires, short_wires, tube_wires, node_count = self._unsplit
+            self.nodes.truncate(node_count)
+            self.air_wires, self.ground_wires = list(air_wires), list(ground_wires)
+            self.a2g_wires, self.short_wires, self.tube_wires = list(a2g_wires), list(short_wires), list(tube_wires)
+        # 注销的节点编号会被重新分配, 须丢弃按旧编号建立的节点顺序
+        self.invalidate()
+        self.split_long_wires_all(max_length)
 
 
     def __repr__(self):
-        return f"Wires(\nair_wires={self.air_wires},\n ground_wires={self.ground_wires},\n a2g_wires={self.a2g_wires},\n short_wires={self.short_wires},\n tube_wires={self.tube_wires}\n)"
\ No newline at end of file
+        return f"Wires(\nair_wires={self.air_wires},\n ground_wires={self.ground_wires},\n a2g_wires={self.a2g_wires},\n short_wires={self.short_wires},\n tube_wires={self.tube_wires}\n)"
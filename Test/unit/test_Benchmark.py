@@ -0,0 +1,46 @@
+import sys
+
+sys.path.append('../..')
+
+import unittest
+import numpy as np
+from Benchmark.benchmark import compare
+from Benchmark.generators import CASES, generate_case, generate_tower
+from Driver.initialization.initialization import initialize_tower_from_dict
+from Driver.modeling.tower_modeling import tower_building
+
+
+class TestBenchmark(unittest.TestCase):
+    def test_generators(self):
+        for name in CASES:
+            case = generate_case(name, 1)
+            wires = case['Tower']['Wire']
+            brans = [wire['bran'] for wire in wires if wire['type'] != 'tube']
+            self.assertEqual(len(brans), len(set(brans)))
+            self.assertEqual(sum(wire['type'] == 'tube' for wire in wires), 1)
+
+            tower = initialize_tower_from_dict(case, 20)
+            tower_building(tower, 2e4, 20)
+            self.assertTrue(np.isfinite(tower.inductance_matrix).all())
+            self.assertTrue(np.isfinite(tower.potential_matrix).all())
+
+        # 规模参数
+        case = generate_tower(levels=3, circuits=2, spans=1, grid=2, cores=5)
+        wires = case['Tower']['Wire']
+        self.assertEqual(len(wires[-1]['core']), 5)
+        self.assertEqual(sum(wire['type'] == 'ground' for wire in wires), 12)
+        self.assertEqual(sum(wire['type'] == 'air' for wire in wires), 3 * 12 + 2 * 3 * 3 + 3 + 1)
+
+    def test_compare(self):
+        baseline = {'cases': {'tower': {'1': {'stages': {'L/P coefficients': {'elapsed': 0.1, 'traced_peak': 1 << 24},
+                                                           'A matrix': {'elapsed': 0.001}}}}}}
+        results = {'cases': {'tower': {'1': {'stages': {'L/P coefficients': {'elapsed': 0.2, 'traced_peak': 1 << 24},
+                                                          'A matrix': {'elapsed': 0.01}}},
+                                       '2': {'stages': {'A matrix': {'elapsed': 1.0}}}}}}
+        # 基准耗时过短的阶段和基准中没有的规模不比较
+        self.assertEqual(compare(results, baseline), [('tower', '1', 'L/P coefficients', 'elapsed', 0.1, 0.2)])
+        self.assertEqual(compare(results, baseline, tolerance=3), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
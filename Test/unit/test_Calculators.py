@@ -2,12 +2,22 @@ import sys
 
 sys.path.append('../..')
 
+import os
+import tempfile
 import unittest
 import numpy as np
-from Function.Calculators.Inductance import INT_SLAN_2D, calculate_potential
+import Function.Calculators.Impedance as Impedance
+import Function.Calculators.Inductance as Inductance
+from Function.Calculators.Inductance import INT_SLAN_2D, calculate_potential, calculate_wires_inductance_potential_with_ground, \
+    calculate_wires_inductance_potential_hmatrix, calculate_wires_inductance_potential_incremental
+from Function.Calculators.Impedance import calculate_coreWires_impedance, calculate_sheath_impedance, calculate_multual_impedance, \
+    calculate_ground_impedance, calculate_segments_ground_impedance, ground_reflection_coefficient, ground_propagation_constant
+from Function.Calculators.Ionisation import calculate_electrode_resistance, ionisation_table
+import Function.Calculators.LayeredSoil as LayeredSoil
 from Model.Wires import Wire, Wires
 from Model.Node import Node
 from Model.Ground import Ground
+from Model.Contant import Constant
 
 
 class TestCalculator(unittest.TestCase):
@@ -82,4 +92,412 @@ class TestCalculator(unittest.TestCase):
                                        [0.02462586, 0.00276947, 0.02363902, 0.00276859, 0.02640761, 0.00277059, 0.04482433, 0.00277257],  
                                        [0.00276947, 0.02462586, 0.00276859, 0.02363902, 0.00277059, 0.02640761, 0.00277257, 0.04482433]])
         self.assertTrue(np.allclose(L, expected_inductance))
-        self.assertTrue(np.allclose(P, expected_potential))
\ No newline at end of file
+        self.assertTrue(np.allclose(P, expected_potential))
+
+
+    def test_INT_SLAN_2D_blocks_and_special_cases(self):
+        # 包含平行、重合、共线的线段
+        ps1 = np.array([[0, 0, 10], [0, 0.5, 10], [0, 0, 10], [1, 0, 10], [3, 2, 0]], dtype=float)
+        ps2 = np.array([[1, 0, 10], [1, 0.5, 10], [1, 0, 10], [2, 0, 10], [4, 5, 1]], dtype=float)
+        rs = np.full((5, 1), 0.005)
+
+        for COEF_MOD in (1, 2):
+            full = INT_SLAN_2D(ps1, ps2, rs, ps1, ps2, rs, 2, COEF_MOD)
+            self.assertFalse(np.isnan(full).any())
+            # 重合线段的积分与自身积分相同
+            self.assertEqual(full[0, 0], full[2, 0])
+            # 逐行配对(dot product)的结果与完整矩阵的对角线一致
+            dot = INT_SLAN_2D(ps1, ps2, rs, ps1, ps2, rs, 1, COEF_MOD)
+            np.testing.assert_allclose(dot[:, 0], np.diag(full))
+
+            # 分块计算与整体计算结果逐位一致
+            block_pairs = Inductance.SLAN_BLOCK_PAIRS
+            Inductance.SLAN_BLOCK_PAIRS = 7
+            try:
+                blocked = INT_SLAN_2D(ps1, ps2, rs, ps1, ps2, rs, 2, COEF_MOD)
+            finally:
+                Inductance.SLAN_BLOCK_PAIRS = block_pairs
+            self.assertTrue(np.array_equal(full, blocked))
+
+
+    def test_INT_SLAN_2D_symmetric(self):
+        rng = np.random.default_rng(0)
+        ps1 = rng.uniform(-5, 5, (12, 3))
+        ps2 = ps1 + rng.uniform(-1, 1, (12, 3))
+        rs = np.full((12, 1), 0.005)
+
+        block_pairs = Inductance.SLAN_BLOCK_PAIRS
+        Inductance.SLAN_BLOCK_PAIRS = 20
+        try:
+            full = INT_SLAN_2D(ps1, ps2, rs, ps1, ps2, rs, 2, 2, symmetric=False)
+            half = INT_SLAN_2D(ps1, ps2, rs, ps1.copy(), ps2.copy(), rs.copy(), 2, 2)
+        finally:
+            Inductance.SLAN_BLOCK_PAIRS = block_pairs
+
+        # 自动检测到相同线段集, 上三角逐位一致, 下三角为镜像
+        iu = np.triu_indices(12)
+        self.assertTrue(np.array_equal(half[iu], full[iu]))
+        self.assertTrue(np.array_equal(half, half.T))
+        np.testing.assert_allclose(half, full, rtol=1e-9)
+
+        with self.assertRaises(ValueError):
+            INT_SLAN_2D(ps1, ps2, rs, ps1[:5], ps2[:5], rs[:5], 2, 2, symmetric=True)
+
+    def test_image_segments_symmetric(self):
+        rng = np.random.default_rng(2)
+        ps1 = rng.uniform(0, 10, (20, 3))
+        ps2 = ps1 + rng.uniform(-3, 3, (20, 3))
+        rs = np.full((20, 1), 0.01)
+        # 贴近地面的线段, 镜像放在地面下2.2倍半径处
+        ps1[:3, 2] = ps2[:3, 2] = 0.004
+        pf1, pf2, reflected = Inductance._image_segments(ps1, ps2, rs)
+        self.assertTrue(np.array_equal(np.flatnonzero(~reflected), [0, 1, 2]))
+        np.testing.assert_allclose(pf1[:3, 2], -0.022)
+        self.assertTrue(np.array_equal(pf2[3:, 2], -ps2[3:, 2]))
+
+        # 对称掩码: 只算上三角, 镜像调整过的行和列单独计算
+        full = INT_SLAN_2D(ps1, ps2, rs, pf1, pf2, rs, 2, 2, symmetric=False)
+        half = INT_SLAN_2D(ps1, ps2, rs, pf1, pf2, rs, 2, 2, symmetric=reflected)
+        np.testing.assert_allclose(half, full, rtol=1e-9, atol=1e-12 * np.abs(full).max())
+        lengths = np.linalg.norm(ps2 - ps1, axis=1)
+        At = np.arange(40).reshape(20, 2) + 1
+        args = (ps1, ps2, lengths, rs, pf1, pf2, lengths, rs, At, 40)
+        np.testing.assert_allclose(calculate_potential(*args, symmetric=reflected), calculate_potential(*args, symmetric=False), rtol=1e-9)
+
+
+    def test_INT_SLAN_2D_tiles(self):
+        rng = np.random.default_rng(1)
+        ps1 = rng.uniform(-5, 5, (15, 3))
+        ps2 = ps1 + rng.uniform(-1, 1, (15, 3))
+        rs = np.full((15, 1), 0.005)
+        pf1, pf2, rf = ps1[:11] + 0.5, ps2[:11] + 0.5, rs[:11]
+
+        for symmetric in (True, False):
+            expected = INT_SLAN_2D(ps1, ps2, rs, ps1, ps2, rs, 2, 1, symmetric=symmetric)
+            for tile_size in (1, 4, 40, (2, 3), (7, 2)):
+                tiled = INT_SLAN_2D(ps1, ps2, rs, ps1, ps2, rs, 2, 1, symmetric=symmetric, tile_size=tile_size)
+                self.assertTrue(np.array_equal(tiled, expected))
+            tiled = INT_SLAN_2D(ps1, ps2, rs, ps1, ps2, rs, 2, 1, symmetric=symmetric, memory_budget=8000)
+            self.assertTrue(np.array_equal(tiled, expected))
+
+        # 结果按块直接写入磁盘映射矩阵
+        expected = INT_SLAN_2D(ps1, ps2, rs, pf1, pf2, rf, 2, 2)
+        with tempfile.TemporaryDirectory() as tmp:
+            out = np.memmap(os.path.join(tmp, 'L.dat'), dtype=float, mode='w+', shape=(11, 15))
+            result = INT_SLAN_2D(ps1, ps2, rs, pf1, pf2, rf, 2, 2, tile_size=(3, 4), out=out)
+            self.assertIs(result, out)
+            self.assertTrue(np.array_equal(np.asarray(out), expected))
+            del result, out
+
+        with self.assertRaises(ValueError):
+            INT_SLAN_2D(ps1, ps2, rs, pf1, pf2, rf, 2, 2, out=np.empty((15, 11)))
+
+
+    def test_parallel_assembly(self):
+        rng = np.random.default_rng(2)
+        ps1 = rng.uniform(-5, 5, (40, 3))
+        ps2 = ps1 + rng.uniform(-1, 1, (40, 3))
+        rs = np.full((40, 1), 0.005)
+
+        # 多线程分块计算与串行计算逐位一致
+        for symmetric in (True, False):
+            serial = INT_SLAN_2D(ps1, ps2, rs, ps1, ps2, rs, 2, 2, symmetric=symmetric)
+            parallel = INT_SLAN_2D(ps1, ps2, rs, ps1, ps2, rs, 2, 2, symmetric=symmetric, workers=3, tile_size=50)
+            self.assertTrue(np.array_equal(serial, parallel))
+
+        # 线段集合: 两条空气线段(共用一个节点)和两条地面线段
+        nodes = [Node('X01', 0, 0, 10), Node('X02', 5, 0, 10), Node('X03', 10, 0, 8),
+                 Node('X04', 0, 0, -1), Node('X05', 0, 3, -1), Node('X06', 0, 6, -1)]
+        wires = Wires()
+        wires.add_air_wire(Wire('Y01', nodes[0], nodes[1], 0, 0.005, 0, 0, 58000000, 1, 1, None))
+        wires.add_air_wire(Wire('Y02', nodes[1], nodes[2], 0, 0.005, 0, 0, 58000000, 1, 1, None))
+        wires.add_ground_wire(Wire('Y03', nodes[3], nodes[4], 0, 0.005, 0, 0, 58000000, 1, 1, None))
+        wires.add_ground_wire(Wire('Y04', nodes[4], nodes[5], 0, 0.005, 0, 0, 58000000, 1, 1, None))
+        ground = Ground(1e-3, 1, 4, 'Lossy', 'weak', 'isolational')
+
+        L, P = calculate_wires_inductance_potential_with_ground(wires, ground, Constant())
+        L_parallel, P_parallel = calculate_wires_inductance_potential_with_ground(wires, ground, Constant(), workers=4, tile_size=3)
+        self.assertTrue(np.array_equal(L, L_parallel))
+        self.assertTrue(np.array_equal(P, P_parallel))
+
+
+    def test_wires_hmatrix(self):
+        # 两条平行的空气导线(各120段)和一条地面导线(30段)
+        wires = Wires()
+        for k, (y, z, count) in enumerate([(0, 10, 120), (0.5, 12, 120), (1, -1, 30)]):
+            nodes = [Node('X{}_{}'.format(k, i), i, y, z) for i in range(count + 1)]
+            for i in range(count):
+                wire = Wire('Y{}_{}'.format(k, i), nodes[i], nodes[i + 1], 0, 0.005, 0, 0, 58000000, 1, 1, None)
+                wires.add_ground_wire(wire) if z < 0 else wires.add_air_wire(wire)
+        ground = Ground(1e-3, 1, 4, 'Lossy', 'weak', 'isolational')
+
+        options = dict(far_ratio=1.5, far_tol=1e-9)
+        L, P = calculate_wires_inductance_potential_with_ground(wires, ground, Constant(), **options)
+        HL, HP = calculate_wires_inductance_potential_hmatrix(wires, ground, Constant(), leaf_size=16, tol=1e-7, **options)
+        for dense, H in ((L, HL), (P, HP)):
+            self.assertLess(H.compression, 0.8)
+            self.assertLess(np.linalg.norm(H.to_dense() - dense) / np.linalg.norm(dense), 1e-6)
+            x = np.linspace(-1, 1, dense.shape[0])
+            np.testing.assert_allclose(H.solve(dense @ x), x, atol=1e-5)
+
+
+    def test_wires_incremental_remesh(self):
+        # 空气导线长10m、7.5m(相连)、6m, 地面导线长3m
+        nodes = [Node('X0{}'.format(i), x, y, z) for i, (x, y, z) in enumerate([(0, 0, 10), (10, 0, 10), (10, 7.5, 10), (0, 1, 12), (6, 1, 12), (0, 2, -1), (3, 2, -1)])]
+        wires = Wires()
+        for k, (i, j) in enumerate([(0, 1), (1, 2), (3, 4)]):
+            wires.add_air_wire(Wire('Y0{}'.format(k), nodes[i], nodes[j], 0, 0.005, 0, 0, 58000000, 1, 1, None))
+        wires.add_ground_wire(Wire('Y03', nodes[5], nodes[6], 0, 0.005, 0, 0, 58000000, 1, 1, None))
+        ground = Ground(1e-3, 1, 4, 'Lossy', 'weak', 'isolational')
+
+        wires.split_long_wires_all(4)
+        L, P, cache = calculate_wires_inductance_potential_incremental(wires, ground, Constant())
+        self.assertEqual((cache['reused_branches'], cache['reused_nodes']), (0, 0))
+
+        # 最大长度改为3.5m后只有7.5m的导线由2段变为3段: 其3段及两端的节点重新计算
+        wires.remesh(3.5)
+        self.assertEqual(len(wires.air_wires), 8)
+        L, P, cache = calculate_wires_inductance_potential_incremental(wires, ground, Constant(), cache)
+        self.assertEqual((cache['reused_branches'], cache['reused_nodes']), (6, 8))
+        dense_L, dense_P = calculate_wires_inductance_potential_with_ground(wires, ground, Constant())
+        np.testing.assert_allclose(L, dense_L, rtol=1e-8, atol=1e-10 * np.abs(dense_L).max())
+        np.testing.assert_allclose(P, dense_P, rtol=1e-8, atol=1e-10 * np.abs(dense_P).max())
+
+        # 网格不变时全部沿用
+        wires.remesh(3.5)
+        L2, P2, cache = calculate_wires_inductance_potential_incremental(wires, ground, Constant(), cache)
+        self.assertEqual((cache['reused_branches'], cache['reused_nodes']), (9, 12))
+        self.assertTrue(np.array_equal(L2, L) and np.array_equal(P2, P))
+
+
+    def test_ground_impedance(self):
+        ground = Ground(1e-3, 1, 10, "Lossy", None, None)
+        frq = np.array([1e3, 1e5, 1e6])
+        Zg = calculate_ground_impedance(1, 10, 1e-3, np.array([[10.0, 12.0, 15.0]]), np.full(3, 0.01), np.array([0.0, 3.0, 7.0]), frq)
+        self.assertEqual(Zg.shape, (3, 3, 3))
+        np.testing.assert_allclose(Zg, Zg.transpose(1, 0, 2))
+        single = calculate_ground_impedance(1, 10, 1e-3, np.array([[12.0]]), 0.01, np.array([3.0]), frq)
+        np.testing.assert_allclose(Zg[1, 1], single[0, 0])
+
+        # 两条4km的平行导线切分为20m的线段, 中部线段与另一条导线的互阻抗之和接近单位长度公式
+        m = 200
+        x = np.linspace(-2000, 2000, m + 1)
+        start_points, end_points = np.zeros((2 * m, 3)), np.zeros((2 * m, 3))
+        start_points[:, 0], end_points[:, 0] = np.tile(x[:-1], 2), np.tile(x[1:], 2)
+        start_points[m:, 1] = end_points[m:, 1] = 3.0
+        start_points[:m, 2] = end_points[:m, 2] = 10.0
+        start_points[m:, 2] = end_points[m:, 2] = 12.0
+        radii = np.full((2 * m, 1), 0.01)
+        Zs = calculate_segments_ground_impedance(start_points, end_points, radii, ground, frq)
+        np.testing.assert_allclose(Zs[:, m // 2, m:].sum(axis=1) / 20, Zg[0, 1], rtol=0.05)
+        np.testing.assert_allclose(Zs, Zs.transpose(0, 2, 1))
+        # 按内存预算分批计算频率, 结果不变
+        self.assertTrue(np.array_equal(calculate_segments_ground_impedance(start_points, end_points, radii, ground, frq, memory_budget=1), Zs))
+        self.assertFalse(calculate_segments_ground_impedance(start_points, end_points, radii, Ground(1e-3, 1, 10, "Perfect", None, None), frq).any())
+
+        # 低矮导线和从地面竖起的导线, 复镜像的核函数在线段上变化剧烈, 与解析积分比较
+        # 平行线段 ∫∫1/R = F(l, D), F(l, D) = 2(l asinh(l/D) - √(l²+D²) + D); 竖直线段与其镜像 ∫∫1/(z+z'+D) = G(2l+D) - 2G(l+D) + G(D)
+        F = lambda l, D: 2 * (l * np.arcsinh(l / D) - np.sqrt(l * l + D * D) + D)
+        G = lambda x: x * np.log(x) - x
+        for frequency, h in [(1e5, 0.05), (1e7, 0.5)]:
+            ground = Ground(1e-3 if frequency < 1e7 else 0.1, 1, 10, "Lossy", None, None)
+            p, omega = ground_propagation_constant(ground, np.array([frequency]))[1][0], 2 * np.pi * frequency
+            Zs = calculate_segments_ground_impedance(np.array([[0, 0, h]]), np.array([[5.0, 0, h]]), np.array([[1e-3]]), ground, np.array([frequency]))
+            np.testing.assert_allclose(Zs[0, 0, 0], 1j * omega * 1e-7 * (F(5.0, 2 * h) - F(5.0, 2 * h + 2 * p)), rtol=1e-4)
+        ground = Ground(1e-3, 1, 10, "Lossy", None, None)
+        p, omega = ground_propagation_constant(ground, np.array([1e3]))[1][0], 2 * np.pi * 1e3
+        Zs = calculate_segments_ground_impedance(np.array([[0, 0, 0.0]]), np.array([[0, 0, 5.0]]), np.array([[1e-3]]), ground, np.array([1e3]))
+        np.testing.assert_allclose(Zs[0, 0, 0], -1j * omega * 1e-7 * (10 * np.log(2) - (G(10 + 2 * p) - 2 * G(5 + 2 * p) + G(2 * p))), rtol=1e-3)
+
+        K = ground_reflection_coefficient(ground, np.array([1.0, 1e9]))
+        np.testing.assert_allclose(K, [1, 9 / 11], rtol=1e-3)
+
+    def test_ionisation_table(self):
+        # 埋深0.8m、长20m的水平接地线, 电阻接近Sunde公式 R = ρ/(πl) (ln(2l/√(2ad)) - 1)
+        R = calculate_electrode_resistance(np.array([[0, 0, -0.8]]), np.array([[20, 0, -0.8]]), np.array([[0.01]]), 100)
+        np.testing.assert_allclose(R, 100 / (20 * np.pi) * (np.log(40 / np.sqrt(0.016)) - 1), rtol=0.02)
+
+        nodes = [Node('X01', 0, 0, 10), Node('X02', 0, 0, 0), Node('X03', 20, 0, -0.8), Node('X04', 40, 0, -0.8)]
+        wires = Wires()
+        wires.add_air_wire(Wire('Y01', nodes[0], nodes[1], 0, 0.005, 0, 0, 58000000, 1, 1, None))
+        wires.add_ground_wire(Wire('Y02', nodes[1], nodes[2], 0, 0.01, 0, 0, 58000000, 1, 1, None))
+        wires.add_ground_wire(Wire('Y03', nodes[2], nodes[3], 0, 0.01, 0, 0, 58000000, 1, 1, None))
+        ground = Ground(0.01, 1, 10, 'Lossy', 'medium', 'isolational')
+        table = ionisation_table(wires, ground)
+        self.assertEqual(len(table), 2)
+        self.assertIs(ionisation_table(wires, ground), table)
+        self.assertIsNone(ionisation_table(wires, Ground(0.01, 1, 10, 'Lossy', 'medium', None)))
+
+        # 小电流时不电离; 电流增大时等效半径增大、电阻减小, 查表结果与直接计算一致
+        gnd = wires.arrays.ranges['ground']
+        start_points, end_points = wires.get_start_points()[gnd], wires.get_end_points()[gnd]
+        np.testing.assert_allclose(table.resistance(np.zeros(2)), table.table[:, 0])
+        currents = np.array([2e4, 5e4])
+        radius = table.effective_radius(currents)
+        np.testing.assert_allclose(radius, np.clip(100 * currents / (2 * np.pi * table.lengths * 400e3), 0.01, table.max_radius))
+        resistance = table.resistance(currents)
+        np.testing.assert_allclose(resistance, calculate_electrode_resistance(start_points, end_points, radius, 100), rtol=1e-3)
+        self.assertTrue(np.all(resistance < table.table[:, 0]))
+        self.assertTrue(np.all(np.diff(table.table, axis=1) < 0))
+
+    def test_two_layer_soil(self):
+        h, K = 2.0, 0.5
+        table = LayeredSoil.TwoLayerGreenTable(K, h)
+        # 插值结果与镜像级数一致
+        rng = np.random.default_rng(3)
+        rho, s = np.exp(rng.uniform(np.log(1e-3), np.log(1e5), 500)), rng.uniform(0, 1.99 * h, 500)
+        n = np.arange(1, 200)[:, np.newaxis]
+        F = np.sum(K ** n * (1 / np.sqrt(rho ** 2 + (s - 2 * n * h) ** 2) + 1 / np.sqrt(rho ** 2 + (s + 2 * n * h) ** 2)), axis=0)
+        np.testing.assert_allclose(table(rho, s), F, rtol=1e-3)
+
+        # 线段积分与逐个镜像线段的解析积分之和一致
+        ps1 = np.column_stack([rng.uniform(-5, 5, (6, 2)), -rng.uniform(0.3, 1.5, 6)])
+        ps2 = np.column_stack([ps1[:, :2] + rng.uniform(-3, 3, (6, 2)), -rng.uniform(0.3, 1.5, 6)])
+        rs = np.full((6, 1), 0.01)
+        expected = np.zeros((6, 6))
+        for k in range(1, 40):
+            for sign, shift in ((1, 2 * k * h), (1, -2 * k * h), (-1, 2 * k * h), (-1, -2 * k * h)):
+                image1, image2 = ps1.copy(), ps2.copy()
+                image1[:, 2], image2[:, 2] = sign * ps1[:, 2] - shift, sign * ps2[:, 2] - shift
+                expected += K ** k * INT_SLAN_2D(image1, image2, rs, ps1, ps2, rs, 2, 1)
+        INT = LayeredSoil.calculate_layered_integrals(table, ps1, ps2, ps1, ps2, symmetric=True)
+        np.testing.assert_allclose(INT, expected, rtol=1e-3)
+        with self.assertRaises(ValueError):
+            LayeredSoil.calculate_layered_integrals(table, ps1 - [0, 0, 2], ps2, ps1, ps2)
+
+        nodes = [Node('X01', 0, 0, 10), Node('X02', 0, 0, 1), Node('X03', 0, 0, -0.2), Node('X04', 0, 0, -0.8),
+                 Node('X05', 10, 0, -0.8), Node('X06', 10, 10, -0.8)]
+        wires = Wires()
+        wires.add_air_wire(Wire('Y01', nodes[0], nodes[1], 0, 0.005, 0, 0, 58000000, 1, 1, None))
+        for k in range(3, 6):
+            wires.add_ground_wire(Wire('Y0{}'.format(k), nodes[k - 1], nodes[k], 0, 0.005, 0, 0, 58000000, 1, 1, None))
+        wires.remesh(2.5)
+        homogeneous = Ground(0.01, 1, 10, 'Lossy', None, None)
+        layered = Ground(0.01, 1, 10, 'Lossy', None, None, 0.001, h)
+        cache_dir = LayeredSoil.GREEN_TABLE_DIR
+        with tempfile.TemporaryDirectory() as tmp:
+            LayeredSoil.GREEN_TABLE_DIR = tmp
+            try:
+                L0, P0 = calculate_wires_inductance_potential_with_ground(wires, homogeneous, Constant())
+                L, P = calculate_wires_inductance_potential_with_ground(wires, layered, Constant())
+                # 格林函数表写入磁盘缓存, 清空内存缓存后从磁盘读入
+                self.assertEqual(len(os.listdir(tmp)), 1)
+                LayeredSoil._green_table_cache.clear()
+                self.assertTrue(np.array_equal(LayeredSoil.two_layer_green_table(layered).H, LayeredSoil.two_layer_green_table(layered, tmp, t_samples=401).H))
+                _, P_incremental, _ = calculate_wires_inductance_potential_incremental(wires, layered, Constant())
+                _, P_hmatrix = calculate_wires_inductance_potential_hmatrix(wires, layered, Constant(), leaf_size=4)
+            finally:
+                LayeredSoil.GREEN_TABLE_DIR = cache_dir
+                LayeredSoil._green_table_cache.clear()
+        # 下层电阻率更高时地面节点的电位系数增大, 电感和空气节点的电位系数不变
+        self.assertTrue(np.array_equal(L, L0))
+        Nna = wires.count_distinct_airPoints()
+        self.assertTrue(np.array_equal(P[:Nna, :Nna], P0[:Nna, :Nna]))
+        self.assertTrue(np.all(P[Nna:, Nna:] > P0[Nna:, Nna:]))
+        np.testing.assert_allclose(P[Nna:, Nna:], P[Nna:, Nna:].T, rtol=1e-12)
+        np.testing.assert_allclose(P_incremental, P, rtol=1e-12)
+        np.testing.assert_allclose(P_hmatrix.to_dense(), P, rtol=1e-5)
+
+    def test_tube_impedance_frequency_batch(self):
+        # 按频率数组一次计算的结果与逐个频率计算的结果一致
+        r = np.array([[0.005], [0.004], [0.006]])
+        offset = np.array([[0.02], [0.02], [0.015]])
+        angle = np.array([[0], [120], [240]])
+        mur = np.ones((3, 1))
+        sig = np.full((3, 1), 5.8e7)
+        frequencies = np.logspace(0, 9, 12)
+
+        Zc = calculate_coreWires_impedance(r, offset, angle, mur, sig, 100, 5e6, 0.05, frequencies)
+        Zs = calculate_sheath_impedance(100, 5e6, 0.05, 0.06, frequencies)
+        Zcs, Zsc = calculate_multual_impedance(r, 100, 5e6, 0.05, 0.06, frequencies)
+        self.assertEqual(Zc.shape, (3, 3, 12))
+        self.assertEqual(Zs.shape, (1, 1, 12))
+        self.assertEqual((Zcs.shape, Zsc.shape), ((3, 1, 12), (1, 3, 12)))
+        for k, f in enumerate(frequencies):
+            np.testing.assert_allclose(Zc[:, :, k], calculate_coreWires_impedance(r, offset, angle, mur, sig, 100, 5e6, 0.05, float(f)), rtol=1e-12)
+            np.testing.assert_allclose(Zs[0, 0, k], calculate_sheath_impedance(100, 5e6, 0.05, 0.06, float(f)), rtol=1e-12)
+            np.testing.assert_allclose(Zcs[:, :, k], calculate_multual_impedance(r, 100, 5e6, 0.05, 0.06, float(f))[0], rtol=1e-12)
+
+
+    def test_coreWires_impedance_adaptive(self):
+        # 自适应截断的误差不超过tol, 缓存的Bessel比值不改变结果
+        r = np.array([[0.005], [0.004], [0.006]])
+        offset = np.array([[0.03], [0.03], [0.025]])
+        angle = np.array([[0], [120], [240]])
+        mur = np.ones((3, 1))
+        sig = np.full((3, 1), 5.8e7)
+        frequencies = np.logspace(0, 9, 50)
+        args = (r, offset, angle, mur, sig, 1, 1e7, 0.05, frequencies)
+
+        Impedance._bessel_ratio_cache.clear()
+        Zc = calculate_coreWires_impedance(*args)
+        self.assertTrue(np.array_equal(Zc, calculate_coreWires_impedance(*args)))
+        for tol in (1e-6, 1e-10):
+            Zt = calculate_coreWires_impedance(*args, tol=tol)
+            error = np.abs(Zt - Zc).max(axis=(0, 1)) / np.abs(Zc).max(axis=(0, 1))
+            self.assertTrue(np.all(error < 10 * tol))
+
+
+    def test_calculate_potential_common_nodes(self):
+        # 节点2连接三条线段, 其余节点只连接一条线段
+        ps1 = np.array([[0, 0, 10], [1, 0, 10], [1, 0, 10]], dtype=float)
+        ps2 = np.array([[1, 0, 10], [2, 0, 10], [1, 0, 11]], dtype=float)
+        lengths = np.ones((3, 1))
+        radii = np.full((3, 1), 0.005)
+        At = np.array([[1, 2], [2, 3], [2, 4]])
+
+        P = calculate_potential(ps1, ps2, lengths, radii, ps1, ps2, lengths, radii, At, 4)
+
+        # 直接按节点累加半线段之间的积分
+        mid = 0.5 * (ps1 + ps2)
+        halves = {1: [(ps1[0], mid[0])], 2: [(mid[0], ps2[0]), (ps1[1], mid[1]), (ps1[2], mid[2])],
+                  3: [(mid[1], ps2[1])], 4: [(mid[2], ps2[2])]}
+        expected = np.zeros((4, 4))
+        for i in range(4):
+            for j in range(4):
+                for a1, a2 in halves[i + 1]:
+                    for b1, b2 in halves[j + 1]:
+                        expected[i, j] += INT_SLAN_2D(b1[None], b2[None], radii[:1], a1[None], a2[None], radii[:1], 2, 1)[0, 0]
+                expected[i, j] /= 0.5 * len(halves[i + 1]) * 0.5 * len(halves[j + 1])
+        np.testing.assert_allclose(P, expected, rtol=1e-9)
+
+
+    def test_INT_SLAN_2D_far_field(self):
+        # 一条沿x方向的线路(1m一段)及其上方的一组斜线段
+        x = np.arange(40, dtype=float)
+        ps1 = np.concatenate((np.c_[x, 0 * x, 10 + 0 * x], np.c_[x, 0 * x + 2, 12 + 0 * x]))
+        ps2 = np.concatenate((np.c_[x + 1, 0 * x, 10 + 0 * x], np.c_[x + 0.5, 0 * x + 2.5, 12.5 + 0 * x]))
+        rs = np.full((80, 1), 0.005)
+
+        # 参考值: 12*12点Gauss-Legendre积分
+        xg, wg = np.polynomial.legendre.leggauss(12)
+        center, direction = 0.5 * (ps1 + ps2), ps2 - ps1
+        mean = np.zeros((80, 80))
+        with np.errstate(divide='ignore'):
+            for a, wa in zip(xg, wg):
+                for b, wb in zip(xg, wg):
+                    qa = center + 0.5 * a * direction
+                    qb = center + 0.5 * b * direction
+                    mean += 0.25 * wa * wb / np.linalg.norm(qb[:, None] - qa[None], axis=2)
+        lengths = np.linalg.norm(direction, axis=1)
+        far = np.linalg.norm(center[:, None] - center[None], axis=2) >= 3 * np.maximum(lengths[:, None], lengths[None])
+
+        for COEF_MOD, scale in ((1, lengths[:, None] * lengths[None]), (2, direction @ direction.T)):
+            exact = INT_SLAN_2D(ps1, ps2, rs, ps1, ps2, rs, 2, COEF_MOD)
+            expected = np.where(far, mean * scale, exact)
+            for tol in (1e-3, 1e-6):
+                report = {}
+                approx = INT_SLAN_2D(ps1, ps2, rs, ps1, ps2, rs, 2, COEF_MOD, far_ratio=3, far_tol=tol, report=report)
+                # 近场线段对仍精确计算
+                np.testing.assert_array_equal(approx[~far], exact[~far])
+                nonzero = far & (np.abs(expected) > 1e-12)
+                error = np.abs(approx - expected)[nonzero] / np.abs(expected)[nonzero]
+                self.assertLessEqual(error.max(), tol)
+                # 对称模式只计算上三角(含对角线)及少量对角块内的线段对
+                self.assertGreaterEqual(sum(report.values()), 80 * 81 // 2)
+                self.assertLess(sum(report.values()), 80 * 81 // 2 * 1.1)
+                self.assertGreater(report.get('midpoint', 0) + report.get('gauss2', 0), 0)
+
+        report = {}
+        INT_SLAN_2D(ps1, ps2, rs, ps1[:10], ps2[:10], rs[:10], 2, 1, report=report)
+        self.assertEqual(report, {'exact': 800})
@@ -0,0 +1,82 @@
+import sys
+
+sys.path.append('../..')
+
+import unittest
+import numpy as np
+from Utils.HMatrix import aca, build_cluster_tree, build_hmatrix, ExpandedHMatrix
+from Utils.Matrix import scatter_blocks, sparse_blocks
+
+
+class TestHMatrix(unittest.TestCase):
+    def setUp(self):
+        # 沿x方向的一条长线上的点, 核函数为1/(r+1)
+        rng = np.random.default_rng(0)
+        self.points = np.column_stack((np.sort(rng.uniform(0, 200, 600)), rng.uniform(0, 1, 600), rng.uniform(0, 1, 600)))
+        distance = np.linalg.norm(self.points[:, np.newaxis] - self.points, axis=-1)
+        self.matrix = 1 / (distance + 1) + 5 * np.eye(600)
+
+    def entries(self, rows, cols):
+        return self.matrix[np.ix_(rows, cols)]
+
+    def test_cluster_tree(self):
+        root = build_cluster_tree(self.points, leaf_size=50, groups=np.arange(600) % 2)
+        self.assertEqual(len(root.children), 2)
+
+        def leaves(cluster):
+            return [cluster] if cluster.is_leaf() else sum((leaves(child) for child in cluster.children), [])
+
+        indices = np.concatenate([leaf.indices for leaf in leaves(root)])
+        self.assertTrue(np.array_equal(np.sort(indices), np.arange(600)))
+        for leaf in leaves(root):
+            self.assertLessEqual(leaf.size, 50)
+            self.assertEqual(len(np.unique(leaf.indices % 2)), 1)
+
+    def test_aca(self):
+        rows, cols = np.arange(0, 100), np.arange(400, 600)
+        block = self.entries(rows, cols)
+        U, V = aca(lambda i: block[i], lambda j: block[:, j], 100, 200, 1e-8, 50)
+        self.assertLess(U.shape[1], 20)
+        self.assertLess(np.linalg.norm(U @ V - block) / np.linalg.norm(block), 1e-7)
+
+        # 满秩矩阵块超过最大秩时不压缩
+        self.assertIsNone(aca(lambda i: np.eye(100)[i], lambda j: np.eye(100)[:, j], 100, 100, 1e-8, 10))
+
+    def test_hmatrix(self):
+        H = build_hmatrix(self.entries, self.points, leaf_size=32, tol=1e-8)
+        self.assertLess(H.compression, 0.5)
+        self.assertLess(np.linalg.norm(H.to_dense() - self.matrix) / np.linalg.norm(self.matrix), 1e-7)
+
+        x = np.random.default_rng(1).normal(size=(600, 2))
+        np.testing.assert_allclose(H @ x, self.matrix @ x, rtol=1e-6, atol=1e-6 * np.abs(self.matrix @ x).max())
+        np.testing.assert_allclose(H.solve(self.matrix @ x[:, 0]), x[:, 0], atol=1e-6)
+
+    def test_expanded_hmatrix(self):
+        # 后20行(列)复制前面20个单元的行(列), 单元与其复制构成的2*2子矩阵由稀疏修正给出, 与在稠密矩阵上扩展的结果一致
+        H = build_hmatrix(self.entries, self.points, leaf_size=32, tol=1e-10)
+        np.testing.assert_allclose(H.diagonal(), np.diagonal(self.matrix))
+        copies = np.arange(20) * 7
+        index = np.concatenate((np.arange(600), copies))
+        indices = np.column_stack((copies, 600 + np.arange(20)))
+        blocks = np.array([[6.0, 1.0], [1.0, 7.0]])
+        dense = scatter_blocks(self.matrix[np.ix_(index, index)], indices, blocks)
+        A = ExpandedHMatrix(H, index, sparse_blocks((620, 620), indices, 0.0)).scatter_blocks(indices, blocks)
+        self.assertLess(A.nbytes - H.nbytes, 0.01 * dense.nbytes)
+        self.assertLess(np.abs(A.to_dense() - dense).max(), 1e-9)
+
+        x = np.random.default_rng(2).normal(size=(620, 2))
+        np.testing.assert_allclose(A @ x, dense @ x, rtol=1e-8, atol=1e-8 * np.abs(dense @ x).max())
+        np.testing.assert_allclose(A.solve(dense @ x), x, atol=1e-6)
+
+        # 复制时只复制稀疏修正, 替换子矩阵不影响原矩阵
+        B = A.copy().scatter_blocks(indices, 2 * blocks)
+        self.assertIs(B.hmatrix, H)
+        self.assertLess(np.abs(B.to_dense() - scatter_blocks(dense.copy(), indices, 2 * blocks)).max(), 1e-9)
+        self.assertLess(np.abs(A.to_dense() - dense).max(), 1e-9)
+        # 子矩阵的行列须映射到分层矩阵的同一行
+        with self.assertRaises(ValueError):
+            A.scatter_blocks([[0, 1]], np.eye(2))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,7 +3,9 @@ import sys
 sys.path.append('../..')
 import unittest
 import numpy as np
-from Utils.Math import calculate_distances, calculate_direction_cosines
+from scipy.special import iv, ive, kv, kve
+from Utils.Math import calculate_distances, calculate_direction_cosines, Bessel_I_ratio, Bessel_IK_product, Bessel_K_ratio, BesselTable, \
+    BESSEL_TABLE_TOL
 
 
 class TestMath(unittest.TestCase):
@@ -40,5 +42,31 @@ class TestMath(unittest.TestCase):
         np.testing.assert_allclose(distances, expected_distances)
 
 
+    def test_bessel_tables(self):
+        # 表内(含虚轴附近)的相对误差不超过表的精度, 表外精确计算
+        rng = np.random.default_rng(0)
+        z = np.exp(rng.uniform(np.log(1e-3), np.log(300), 2000)) * np.exp(1j * rng.uniform(-1.5, 1.5, 2000))
+        z = np.concatenate((z, [1e5 + 1e5j, -2 + 1j]))
+        for n in (0, 1, 7):
+            np.testing.assert_allclose(Bessel_K_ratio(z, n, n + 1), kve(n, z) / kve(n + 1, z), rtol=1e-10)
+            np.testing.assert_allclose(Bessel_I_ratio(z[:-2], n, n + 1), iv(n, z[:-2]) / iv(n + 1, z[:-2]), rtol=1e-10)
+        np.testing.assert_allclose(Bessel_K_ratio(z, 0, 2), kve(0, z) / kve(2, z), rtol=1e-10)
+        z1, z2 = z[:200], 1.2 * z[:200]
+        np.testing.assert_allclose(Bessel_IK_product(z1, 1, z2, 0), iv(1, z1) * kv(0, z2), rtol=1e-10)
+
+        # 网格在首次用到时才计算
+        table = BesselTable(lambda z: np.log(kv(0, z)))
+        self.assertFalse(table.state.any())
+        np.testing.assert_allclose(np.exp(table(np.array([1 + 1j, 2 + 1j]))), kv(0, [1 + 1j, 2 + 1j]), rtol=1e-10)
+        self.assertLessEqual(np.count_nonzero(table.state), 2)
+
+        # 误差的最大值在网格边界上, 四角之外的边界点也要检查: 虚轴附近四角误差小于tol而边中点超过tol的网格改为精确计算
+        z = np.array([24.70 - 475.13j])
+        for n in (0, 2, 5):
+            np.testing.assert_allclose(Bessel_I_ratio(z, n, n + 1), ive(n, z) / ive(n + 1, z), rtol=BESSEL_TABLE_TOL)
+        table = BesselTable(lambda z: np.log(ive(0, z) / ive(1, z)))
+        w = np.log(z[0]) + 0.025 * np.linspace(-1, 1, 21)[:, np.newaxis] + 0.025j * np.linspace(-1, 1, 21)
+        np.testing.assert_allclose(np.exp(table(np.exp(w))), ive(0, np.exp(w)) / ive(1, np.exp(w)), rtol=BESSEL_TABLE_TOL)
+
 if __name__ == '__main__':
     unittest.main()
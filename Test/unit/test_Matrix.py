@@ -4,7 +4,8 @@ sys.path.append('../..')
 
 import unittest
 import numpy as np
-from Utils.Matrix import copy_and_expand_matrix, update_matrix, update_and_sum_matrix
+from Utils.Matrix import expand_matrix, expand_matrix_all, copy_and_expand_matrix, update_matrix, update_and_sum_matrix, sparse_incidence_matrix, scatter_blocks, \
+    sparse_blocks
 
 
 class TestMatrix(unittest.TestCase):
@@ -65,4 +66,62 @@ class TestMatrix(unittest.TestCase):
                                     [-4, 1, 1, 1, 1],
                                     [-4, 1, 1, 1, 1],
                                     [-4, 1, 1, 1, 1]])
-        self.assertTrue(np.allclose(result, expected_result))
\ No newline at end of file
+        self.assertTrue(np.allclose(result, expected_result))
+
+
+    def test_sparse_incidence_matrix(self):
+        # 3条支路, 4个节点, 多出的第4行为零
+        A = sparse_incidence_matrix(np.array([[0, 1], [1, 2], [3, 1]]), (4, 4))
+        expected_matrix = np.array([[-1, 1, 0, 0],
+                                    [0, -1, 1, 0],
+                                    [0, 1, 0, -1],
+                                    [0, 0, 0, 0]])
+        self.assertEqual(A.format, 'csr')
+        self.assertEqual(A.nnz, 6)
+        self.assertTrue(np.array_equal(A.toarray(), expected_matrix))
+
+        # 起点与终点相同的支路与逐个赋值一致, 为+1
+        A = sparse_incidence_matrix(np.array([[0, 1], [2, 2], [1, 0]]), (4, 3))
+        expected_matrix = np.array([[-1, 1, 0],
+                                    [0, 0, 1],
+                                    [1, -1, 0],
+                                    [0, 0, 0]])
+        self.assertEqual(A.nnz, 5)
+        self.assertTrue(A.has_sorted_indices)
+        self.assertTrue(np.array_equal(A.toarray(), expected_matrix))
+
+
+    def test_scatter_blocks(self):
+        # 一次写入多个子矩阵, 与逐个调用update_matrix的结果一致
+        matrix = np.arange(36, dtype=float).reshape(6, 6)
+        indices = np.array([[0, 3], [1, 4], [2, 5]])
+        blocks = np.arange(12, dtype=float).reshape(3, 2, 2) + 100
+        expected_matrix = matrix
+        for index, block in zip(indices, blocks):
+            expected_matrix = update_matrix(expected_matrix, index, block)
+        result = scatter_blocks(matrix, indices, blocks)
+        self.assertIs(result, matrix)
+        self.assertTrue(np.array_equal(matrix, expected_matrix))
+
+        # 所有子矩阵共用同一个矩阵
+        scatter_blocks(matrix, indices[:2], np.eye(2))
+        self.assertTrue(np.array_equal(matrix[np.ix_([0, 3], [0, 3])], np.eye(2)))
+
+        # 稀疏矩阵: 与在对角矩阵上写入子矩阵的结果一致, 子矩阵中的零元素保留在非零结构中, 原位替换时结构不变
+        diagonal = np.arange(1, 7, dtype=float)
+        A = sparse_blocks((6, 6), indices[:2], blocks[:2] - 105, diagonal)
+        self.assertTrue(np.array_equal(A.toarray(), scatter_blocks(np.diag(diagonal), indices[:2], blocks[:2] - 105)))
+        self.assertEqual(A.nnz, 10)
+        self.assertIs(scatter_blocks(A, indices[:2], np.eye(2)), A)
+        self.assertEqual(A.nnz, 10)
+        self.assertTrue(np.array_equal(A.toarray(), scatter_blocks(np.diag(diagonal), indices[:2], np.eye(2))))
+
+
+    def test_expand_matrix_all(self):
+        # 一次扩充的结果与逐个索引调用expand_matrix的结果一致
+        matrix = np.arange(25, dtype=float).reshape(5, 5)
+        expected_matrix = matrix
+        for index in [2, 4]:
+            expected_matrix = expand_matrix(expected_matrix, index, 5, 3)
+        self.assertTrue(np.array_equal(expand_matrix_all(matrix, [2, 4], 5, 3), expected_matrix))
+
@@ -1,7 +1,7 @@
 import sys
 sys.path.append('../..')
 import unittest
-from Model.Node import Node, MeasurementNode
+from Model.Node import Node, MeasurementNode, NodeRegistry
 from Model.Wires import Wire, TubeWire, Wires, LumpWire, CoreWire
 from Model.Ground import Ground
 from Model.Cable import Cable
@@ -37,6 +37,33 @@ class TestNodeWire(unittest.TestCase):
         self.assertEqual(node.type, 1)
 
 
+    def test_node_registry(self):
+        # 同名节点返回已注册的节点, 编号按注册顺序
+        nodes = NodeRegistry()
+        node1 = nodes.add(Node("X01", 0.0, 0.0, 0.0))
+        node2 = nodes.add(Node("X02", 0.0, 0.0, 0.0))
+        self.assertIs(nodes.add(Node("X01", 5.0, 0.0, 0.0)), node1)
+        self.assertIsNot(node2, node1)
+        self.assertEqual((len(nodes), nodes.index(node1), nodes.index(node2)), (2, 0, 1))
+        self.assertIs(nodes.get("X02"), node2)
+        self.assertIn("X01", nodes)
+        self.assertIsNone(nodes.find(0.0, 0.0, 0.0))
+
+        # 设置容差时坐标重合的节点合并, 包括落在相邻网格单元中的节点
+        nodes = NodeRegistry(tol=1e-3)
+        node1 = nodes.add(Node("X01", 1.0, 2.0, 3.0))
+        self.assertIs(nodes.add(Node("X02", 1.0 + 4e-4, 2.0 - 4e-4, 3.0)), node1)
+        self.assertIs(nodes.find(0.9995, 2.0, 3.0), node1)
+        self.assertIsNot(nodes.add(Node("X03", 1.002, 2.0, 3.0)), node1)
+        self.assertEqual(len(nodes), 2)
+
+        # 注销后注册的节点, 其名字和坐标可重新注册
+        nodes.truncate(1)
+        self.assertEqual(len(nodes), 1)
+        self.assertIsNone(nodes.get("X03"))
+        self.assertEqual(nodes.index(nodes.add(Node("X04", 1.002, 2.0, 3.0))), 1)
+
+
     def test_wire_initialization(self):
         # 测试Wire类的初始化
         start_node = Node("X01", 0, 0, 0)
@@ -309,6 +336,44 @@ class TestWiresMethods(unittest.TestCase):
         self.assertEqual(wires.tube_wires[2].core_wires[0].name, "Y11_Splited_3")
         self.assertEqual(wires.tube_wires[2].core_wires[0].start_node.name, "Y11_MiddleNode_2")
 
+    def test_Wires_split_tube_nodes(self):
+        # 套管切分为多段时, 各中间节点按套管起点等距排列, 与芯线的中间节点位置一致
+        VF = {}
+        sheath_wire = Wire("Y10", Node("X52", 10, 0, 0), Node("X56", 10, 0, 20), 0, 2, 0, 0, 1e7, 50, 1, VF)
+        tube_wire = TubeWire(sheath_wire, 2.05, 2.1, 2)
+        tube_wire.add_core_wire(CoreWire("Y11", Node("X53", 10, 0, 0), Node("X57", 10, 0, 20), 0, 0.0087, 0, 0, 58000000, 1, 1, VF, 1.9, 0))
+        tube_wire.add_core_wire(CoreWire("Y12", Node("X54", 10, 0, 0), Node("X58", 10, 0, 20), 0, 0.0087, 0, 0, 58000000, 1, 1, VF, 1.9, 180))
+        wires = Wires()
+        wires.add_tube_wire(tube_wire)
+        wires.split_long_wires_all(5)
+
+        self.assertEqual(len(wires.tube_wires), 4)
+        for i, tube in enumerate(wires.tube_wires):
+            self.assertEqual((tube.sheath.start_node.z, tube.sheath.end_node.z), (5.0 * i, 5.0 * (i + 1)))
+            self.assertAlmostEqual(tube.sheath.length(), 5.0)
+            for core in tube.core_wires:
+                self.assertEqual((core.start_node.z, core.end_node.z), (5.0 * i, 5.0 * (i + 1)))
+        self.assertEqual(wires.tube_wires[-1].sheath.end_node.name, "X56")
+
+    def test_Wires_shared_nodes(self):
+        # 切分产生的中间节点注册到共用的节点注册表, 相连线段共用节点时编号一致
+        nodes = NodeRegistry()
+        node1, node2, node3 = [nodes.add(Node(name, x, 0, 0)) for name, x in [('X01', 0), ('X02', 10), ('X03', 20)]]
+        wires = Wires(nodes=nodes)
+        wires.add_air_wire(Wire("Y01", node1, node2, 0, 0.005, 0, 0, 58000000, 1, 1, []))
+        wires.add_ground_wire(Wire("Y02", node2, node3, 0, 0.005, 0, 0, 58000000, 1, 1, []))
+        wires.split_long_wires_all(4)
+
+        self.assertEqual(len(wires.air_wires) + len(wires.ground_wires), 6)
+        self.assertIs(wires.air_wires[1].end_node, nodes.get('Y01_MiddleNode_2'))
+        self.assertIs(wires.air_wires[2].start_node, wires.air_wires[1].end_node)
+        self.assertEqual(wires.count_distinct_points(), 7)
+        self.assertEqual(len(nodes), 7)
+        self.assertTrue(np.array_equal(wires.get_bran_index(), [[1, 2], [2, 3], [3, 4], [4, 5], [5, 6], [6, 7]]))
+        node_index = wires.get_node_index()
+        self.assertEqual([node_index[node] for node in wires.get_all_nodes()], list(range(7)))
+
+
     def test_Wires_get_parameters_matrix(self):
         # 初始化节点数据
         node1 = Node('X01', 0, 0, 10.5)
@@ -364,6 +429,145 @@ class TestWiresMethods(unittest.TestCase):
         self.assertEqual(points_num, expected_points_num)
         self.assertTrue(np.allclose(index, expected_index, rtol=1e-05))
 
+    def test_Wires_split_lazy(self):
+        node1, node2 = Node('X01', 0, 0, 10), Node('X02', 10, 0, 0)
+        short_wire = Wire('Y02', node1, Node('X03', 0, 0, 9.6), 0, 0.01, 0, 0, 1e7, 1, 1, [])
+        wires = Wires([Wire('Y01', node1, node2, 0.5, 0.005, 1e-3, 1e-6, 58000000, 1, 1, []), short_wire])
+        wires.split_long_wires_all(0.5)
+
+        # 参数数组直接由切分结果给出, 不创建子线段对象; 中间节点只预留编号, 不创建节点对象
+        air_wires = wires.air_wires
+        self.assertEqual(len(air_wires), 30)
+        self.assertEqual(len(wires.nodes), 31)
+        self.assertEqual(wires.nodes.nodes.count(None), 28)
+        lengths = wires.get_lengths()
+        self.assertTrue(np.allclose(lengths[:29], np.sqrt(200) / 29))
+        self.assertTrue(np.allclose(wires.get_end_points()[28], [10, 0, 0]))
+        self.assertTrue(np.allclose(wires.get_heights()[27], 10 - 27.5 * 10 / 29))
+        self.assertEqual(wires.get_bran_coordinates()[5], ('Y01_Splited_6', 'Y01_MiddleNode_5', 'Y01_MiddleNode_6'))
+        self.assertEqual(wires.count_distinct_points(), 31)
+        self.assertEqual(wires.nodes.nodes.count(None), 28)
+
+        # 访问时创建的子线段与逐段切分一致, 相邻子线段共用中间节点
+        self.assertIs(air_wires[29], short_wire)
+        self.assertIs(air_wires[28].end_node, node2)
+        self.assertEqual(air_wires[5].name, 'Y01_Splited_6')
+        self.assertEqual(air_wires[5].start_node.name, 'Y01_MiddleNode_5')
+        self.assertIs(air_wires[4].end_node, air_wires[5].start_node)
+        self.assertEqual((air_wires[5].offset, air_wires[5].R), (0.5, 1e-3))
+        self.assertTrue(np.allclose([air_wires[5].end_node.x, air_wires[5].end_node.z], [60 / 29, 10 - 60 / 29]))
+
+        # 已创建的线段对象被修改后, 数组按对象重建
+        air_wires[5].r = 0.1
+        wires.invalidate()
+        self.assertEqual(wires.get_radii()[5, 0], 0.1)
+        self.assertTrue(np.array_equal(wires.get_lengths(), lengths))
+
+        # 同一次切分中坐标重合的中间节点合并, 数组中的端点坐标取被合并节点的坐标, 与创建的对象一致
+        nodes = NodeRegistry(tol=0.1)
+        wires = Wires([Wire('Y01', Node('X01', 0, 0, 10), Node('X02', 2, 0, 10), 0, 0.005, 0, 0, 1e7, 1, 1, []),
+                       Wire('Y02', Node('X03', 1.05, -1, 10), Node('X04', 1.05, 1, 10), 0, 0.005, 0, 0, 1e7, 1, 1, [])], nodes=nodes)
+        wires.split_long_wires_all(1.5)
+        self.assertEqual(wires.get_bran_coordinates()[3][1], 'Y01_MiddleNode_1')
+        self.assertTrue(np.array_equal(wires.get_start_points()[3], [1, 0, 10]))
+        self.assertTrue(np.array_equal(wires.get_end_points()[2], [1, 0, 10]))
+        self.assertIs(wires.air_wires[3].start_node, wires.air_wires[0].end_node)
+
+
+    def test_Wires_arrays(self):
+        node1, node2, node3 = Node('X01', 0, 0, 10), Node('X02', 3, 4, 10), Node('X03', 3, 4, -1)
+        wires = Wires()
+        wires.add_air_wire(Wire('Y01', node1, node2, 0, 0.005, 1e-3, 1e-6, 58000000, 1, 1, []))
+        wires.add_ground_wire(Wire('Y02', node2, node3, 0, 0.01, 2e-3, 2e-6, 1e7, 1, 1, []))
+
+        # 列式存储按类别给出切片, 各get_*方法返回其只读视图
+        arrays = wires.arrays
+        self.assertEqual(len(arrays), 2)
+        self.assertEqual(arrays.ranges['ground'], slice(1, 2))
+        self.assertIs(wires.get_start_points(), arrays.start)
+        self.assertTrue(np.shares_memory(wires.get_radii(), arrays.r))
+        self.assertTrue(np.allclose(wires.get_lengths(), [[5], [11]]))
+        self.assertTrue(np.allclose(arrays.sig, [58000000, 1e7]))
+        with self.assertRaises(ValueError):
+            arrays.r[0] = 1
+
+        # 线段列表变化后重建, 原地修改线段后需调用invalidate
+        wires.add_air_wire(Wire('Y03', node1, node3, 0, 0.02, 0, 0, 1e7, 1, 1, []))
+        self.assertEqual(wires.arrays.ranges['air'], slice(0, 2))
+        self.assertTrue(np.allclose(wires.get_radii(), [[0.005], [0.02], [0.01]]))
+        wires.air_wires[0].r = 0.001
+        wires.invalidate()
+        self.assertEqual(wires.get_radii()[0, 0], 0.001)
+
+    def test_Wires_node_ordering(self):
+        nodes = NodeRegistry()
+        node1, node2, node3, node4 = (nodes.add(Node(name, x, 0, z)) for name, x, z in (('X01', 0, 10), ('X02', 4, 10), ('X03', 4, 0), ('X04', 4, -1)))
+        wires = Wires(nodes=nodes)
+        wires.add_air_wire(Wire('Y01', node2, node1, 0, 0.005, 0, 0, 1e7, 1, 1, []))
+        wires.add_air_wire(Wire('Y02', node2, node3, 0, 0.005, 0, 0, 1e7, 1, 1, []))
+        wires.add_ground_wire(Wire('Y03', node3, node4, 0, 0.005, 0, 0, 1e7, 1, 1, []))
+        wires.add_ground_wire(Wire('Y04', node4, Node('X05', 8, 0, -1), 0, 0.005, 0, 0, 1e7, 1, 1, []))
+
+        # 节点顺序按注册表编号建立一次, 各编号、计数方法共用
+        ordering = wires.node_ordering
+        self.assertEqual(ordering.ids.tolist(), [1, 0, 2, 3, 4])
+        self.assertEqual(nodes.index(wires.ground_wires[1].end_node), 4)
+        self.assertEqual(wires.get_bran_index().tolist(), [[1, 2], [1, 3], [3, 4], [4, 5]])
+        self.assertEqual((wires.count_distinct_airPoints(), wires.count_distinct_gndPoints(), wires.count_distinct_points()), (3, 3, 5))
+        self.assertEqual(wires.get_all_nodes(), [node2, node1, node3, node4, wires.ground_wires[1].end_node])
+        self.assertIs(wires.node_ordering, ordering)
+
+        # 线段变化或重新切分后重建
+        wires.add_air_wire(Wire('Y05', node1, node4, 0, 0.005, 0, 0, 1e7, 1, 1, []))
+        self.assertIsNot(wires.node_ordering, ordering)
+        self.assertEqual(wires.get_bran_index().tolist()[-3:], [[2, 4], [3, 4], [4, 5]])
+        ordering = wires.node_ordering
+        wires.remesh(3)
+        self.assertIsNot(wires.node_ordering, ordering)
+        self.assertEqual(wires.count_distinct_points(), len(wires.get_all_nodes()))
+        self.assertEqual(wires.get_bran_index()[:2].tolist(), [[1, 2], [2, 3]])
+
+    def test_Wires_arrays_modified(self):
+        node1, node2, node3 = Node('X01', 0, 0, 10), Node('X02', 3, 4, 10), Node('X03', 0, 0, 1)
+        wires = Wires([Wire('Y01', node1, node2, 0, 0.005, 0, 0, 1e7, 1, 1, []), Wire('Y02', node2, node3, 0, 0.005, 0, 0, 1e7, 1, 1, [])])
+        arrays = wires.arrays
+        self.assertIs(wires.arrays, arrays)
+
+        # 修改计数属于各Wires对象: 其他Wires的修改和节点、线段对象的属性赋值不影响已建立的列式存储
+        other = Wires()
+        other.add_air_wire(Wire('Y05', node1, node3, 0, 0.005, 0, 0, 1e7, 1, 1, []))
+        wires.air_wires[0].r = 0.001
+        node2.z = 4
+        self.assertIs(wires.arrays, arrays)
+
+        # 原地修改线段参数或节点坐标后调用invalidate重建
+        wires.invalidate()
+        self.assertEqual(wires.get_radii()[0, 0], 0.001)
+        self.assertTrue(np.allclose(wires.get_end_points()[0], [3, 4, 4]))
+
+        # 列表长度不变时原位替换线段, 同样调用invalidate
+        wires.air_wires[1] = Wire('Y03', node1, node3, 0, 0.02, 0, 0, 1e7, 1, 1, [])
+        wires.invalidate()
+        self.assertTrue(np.allclose(wires.get_radii(), [[0.001], [0.02]]))
+        self.assertTrue(np.allclose(wires.get_lengths(), [[np.sqrt(61)], [9]]))
+
+        # 切分后的线段列表相同
+        wires.split_long_wires_all(2)
+        lengths = wires.get_lengths()
+        wires.air_wires[0] = Wire('Y04', node1, node3, 0, 0.005, 0, 0, 1e7, 1, 1, [])
+        wires.invalidate()
+        self.assertEqual(wires.get_lengths()[0, 0], 9)
+        self.assertTrue(np.array_equal(wires.get_lengths()[1:], lengths[1:]))
+
+
+    def test_Tower_capacitance_without_tubes(self):
+        # 没有管状线段时电容矩阵不做更新
+        node1, node2 = Node('X01', 0, 0, 10), Node('X02', 3, 4, 10)
+        tower = Tower(None, Wires([Wire('Y01', node1, node2, 0, 0.005, 0, 0, 1e7, 1, 1, [])]), None, None, None, None, None)
+        self.assertEqual(tower.wires.get_tubeWires_points_index(), [])
+        tower.update_capacitance_matrix_by_tubeWires(np.ones((4, 4)))
+        self.assertTrue(np.array_equal(tower.capacitance_matrix, np.zeros((2, 2))))
+
 
 class TestLightning(unittest.TestCase):
     def test_Lightning_init(self):
@@ -0,0 +1,146 @@
+import sys
+
+sys.path.append('../..')
+
+import unittest
+from unittest import mock
+import numpy as np
+from Benchmark.generators import generate_tower
+from Model.Node import Node
+from Model.Wires import Wire, TubeWire, CoreWire, SplitWireList
+from Driver.initialization.initialization import initialize_tower_from_dict
+from Driver.modeling.tower_modeling import build_impedance_matrix, tower_building, tower_sweep, prepare_building_parameters
+from Utils.Progress import Progress, StageReport
+from Utils.HMatrix import HMatrix, ExpandedHMatrix
+from scipy import sparse
+
+
+class TestModeling(unittest.TestCase):
+    def test_prepare_building_parameters_cores(self):
+        # 芯线数不为3时, 套管与芯线的互感按实际芯线数展开
+        VF = {}
+        sheath_wire = Wire("Y10", Node("X52", 10, 0, 0), Node("X56", 10, 0, 5), 0, 2, 0, 0, 1e7, 50, 1, VF)
+        tube_wire = TubeWire(sheath_wire, 2.05, 2.1, 4)
+        for k in range(4):
+            tube_wire.add_core_wire(CoreWire("Y1{}".format(k + 1), Node("C{}1".format(k), 10, 0, 0), Node("C{}2".format(k), 10, 0, 5),
+                                             0, 0.0087, 0, 0, 58000000, 1, 1, VF, 1.9, 90 * k))
+        frequency, max_length = 2e4, 5
+        Rin, Rx, Lin, Lx, Cin = prepare_building_parameters(tube_wire, max_length, frequency)
+        _, Zcs, Zsc = build_impedance_matrix(tube_wire, frequency)
+
+        self.assertEqual(Lx.shape, (5, 5))
+        self.assertTrue(np.all(Lx[0] == 0) and np.all(Lx[:, 0] == 0))
+        expected = (np.imag(Zcs) + np.imag(Zsc)) / (2 * np.pi * frequency) * max_length
+        np.testing.assert_allclose(Lx[1:, 1:], expected, rtol=1e-12)
+        self.assertEqual(Rx.shape, Lx.shape)
+
+
+    def test_tower_building_split_lazy(self):
+        # 切分后的线段列表在初始化、建模和重新划分网格的过程中都不创建子线段和中间节点对象
+        case = generate_tower(levels=1, spans=1, span_length=100.0)
+        with mock.patch.object(SplitWireList, '_materialize', side_effect=AssertionError("sub-wire materialized")):
+            tower = initialize_tower_from_dict(case, 20)
+            self.assertIsInstance(tower.wires.air_wires, SplitWireList)
+            tower_building(tower, 2e4, 20)
+            reserved = tower.wires.nodes.nodes.count(None)
+            tower.remesh(10)
+            tower_building(tower, 2e4, 10)
+        self.assertGreater(reserved, 0)
+        self.assertEqual(len(tower.nodesList), 2 * len(tower.bransList))
+        self.assertEqual(tower.bransList[-1][0], tower.wires.tube_wires[-1].core_wires[-1].name)
+
+        # 与访问子线段对象后逐个取出的结果一致
+        air_wires = tower.wires.air_wires
+        names = [name for wire in air_wires for name in (wire.start_node.name, wire.end_node.name)]
+        self.assertEqual(tower.nodesList[:len(names)], names)
+        self.assertEqual(tower.bransList[:len(air_wires)], [(wire.name, wire.start_node.name, wire.end_node.name) for wire in air_wires])
+
+    def test_tower_sweep(self):
+        case = generate_tower(levels=2, cores=3, cable_length=50.0)
+        frequencies = np.array([50.0, 1e3, 2e4, 1e5])
+        report = StageReport()
+        tower = initialize_tower_from_dict(case, 20)
+        sweep = tower_sweep(tower, frequencies, 20, progress=Progress([report]))
+
+        k = len(tower.wires.tube_wires)
+        self.assertEqual(len(sweep), 4)
+        self.assertEqual(sweep.resistance_blocks.shape, (4, 4, 4))
+        self.assertEqual(sweep.inductance_blocks.shape, (4, k, 4, 4))
+        # L/P系数只计算一次
+        self.assertEqual([record['stage'] for record in report.stages].count('L/P coefficients'), 1)
+
+        # 各频率下的矩阵与单独按该频率建模的结果一致
+        resistances, inductances = sweep.resistance_matrices(), sweep.inductance_matrices()
+        for index, frequency in enumerate(frequencies):
+            single = initialize_tower_from_dict(case, 20)
+            tower_building(single, frequency, 20)
+            np.testing.assert_allclose(sweep.resistance(index), single.resistance_matrix, rtol=1e-12, atol=0)
+            np.testing.assert_allclose(sweep.inductance(index), single.inductance_matrix, rtol=1e-12, atol=0)
+            self.assertTrue(np.array_equal(resistances[index], sweep.resistance(index)))
+            self.assertTrue(np.array_equal(inductances[index], sweep.inductance(index)))
+            self.assertTrue(np.array_equal(sweep.potential_matrix, single.potential_matrix))
+            self.assertTrue(np.array_equal(sweep.capacitance_matrix, single.capacitance_matrix))
+
+            Rin, Rx, Lin, Lx, Cin = prepare_building_parameters(single.tubeWire, 20, frequency)
+            np.testing.assert_allclose(sweep.tube_parameters['Lin'][index], Lin, rtol=1e-12)
+            np.testing.assert_allclose(sweep.tube_parameters['Rx'][index], Rx, rtol=1e-12)
+        # 芯线的电阻随频率增大、内电感随频率减小(趋肤效应)
+        self.assertTrue(np.all(np.diff(sweep.tube_parameters['Rin'][:, 1, 1]) > 0))
+        self.assertTrue(np.all(np.diff(sweep.tube_parameters['Lin'][:, 1, 1]) < 0))
+
+    def test_tower_sweep_ground_impedance(self):
+        # 电导率很大的有损大地加上复镜像修正后, R、L和P与理想大地的结果一致; 不加修正时只有准静态镜像, 与理想大地相差较大
+        case = generate_tower(levels=2, cores=3, cable_length=50.0)
+        case['Tower']['ground'].update(gnd_model='Lossy', sig=1e9)
+        frequencies = np.array([1e3, 1e5])
+        sweep = tower_sweep(initialize_tower_from_dict(case, 20), frequencies, 20, ground_impedance={})
+        quasi_static = tower_sweep(initialize_tower_from_dict(case, 20), frequencies, 20)
+        case['Tower']['ground'].update(gnd_model='Perfect')
+        perfect = tower_sweep(initialize_tower_from_dict(case, 20), frequencies, 20)
+
+        resistances, inductances, potentials = sweep.resistance_matrices(), sweep.inductance_matrices(), sweep.potential_matrices()
+        for index in range(len(frequencies)):
+            scale = np.abs(perfect.inductance(index)).max()
+            np.testing.assert_allclose(sweep.inductance(index), perfect.inductance(index), rtol=0, atol=1e-4 * scale)
+            self.assertGreater(np.abs(quasi_static.inductance(index) - perfect.inductance(index)).max(), 1e-2 * scale)
+            np.testing.assert_allclose(sweep.resistance(index), perfect.resistance(index), rtol=0, atol=1e-5 * np.abs(perfect.resistance(index)).max())
+            np.testing.assert_allclose(sweep.potential(index), perfect.potential(index), rtol=1e-12, atol=0)
+            self.assertTrue(np.array_equal(resistances[index], sweep.resistance(index)))
+            self.assertTrue(np.array_equal(inductances[index], sweep.inductance(index)))
+            self.assertTrue(np.array_equal(potentials[index], sweep.potential(index)))
+
+    def test_tower_building_hmatrix(self):
+        # 分层矩阵建模时L、P不展开为稠密矩阵, R、C为稀疏矩阵, 与稠密建模的结果一致
+        case = generate_tower(levels=2, cores=3, cable_length=50.0)
+        dense = initialize_tower_from_dict(case, 20)
+        tower_building(dense, 1e3, 20)
+        tower = initialize_tower_from_dict(case, 20)
+        tower_building(tower, 1e3, 20, hmatrix=dict(leaf_size=8, tol=1e-9))
+
+        self.assertIsInstance(tower.inductance_matrix, ExpandedHMatrix)
+        self.assertIsInstance(tower.potential_matrix, HMatrix)
+        self.assertTrue(sparse.issparse(tower.resistance_matrix))
+        self.assertTrue(sparse.issparse(tower.capacitance_matrix))
+        self.assertTrue(np.array_equal(tower.resistance_matrix.toarray(), dense.resistance_matrix))
+        self.assertTrue(np.array_equal(tower.capacitance_matrix.toarray(), dense.capacitance_matrix))
+        for matrix, expected, tol in [(tower.inductance_matrix, dense.inductance_matrix, 1e-6),
+                                      (tower.potential_matrix, dense.potential_matrix, 1e-5)]:
+            np.testing.assert_allclose(matrix.to_dense(), expected, rtol=0, atol=tol * np.abs(expected).max())
+
+        # 扫频时各频率只复制稀疏修正, 与稠密扫频的结果一致
+        frequencies = np.array([50.0, 1e5])
+        sweep = tower_sweep(initialize_tower_from_dict(case, 20), frequencies, 20, hmatrix=dict(leaf_size=8, tol=1e-9))
+        reference = tower_sweep(initialize_tower_from_dict(case, 20), frequencies, 20)
+        inductances = sweep.inductance_matrices()
+        self.assertIsInstance(inductances, list)
+        for index in range(len(frequencies)):
+            scale = np.abs(reference.inductance(index)).max()
+            self.assertIs(inductances[index].hmatrix, sweep.inductance_matrix.hmatrix)
+            np.testing.assert_allclose(inductances[index].to_dense(), reference.inductance(index), rtol=0, atol=1e-6 * scale)
+            self.assertTrue(np.array_equal(sweep.resistance(index).toarray(), reference.resistance(index)))
+        with self.assertRaises(ValueError):
+            tower_sweep(initialize_tower_from_dict(case, 20), frequencies, 20, hmatrix={}, ground_impedance={})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import sys
+
+sys.path.append('../..')
+
+import io
+import json
+import os
+import tempfile
+import unittest
+import numpy as np
+from scipy import sparse
+from Utils.Progress import Progress, QUIET, StageReport, matrix_summary, print_sink
+
+
+class TestProgress(unittest.TestCase):
+    def test_stage_events(self):
+        events = []
+        progress = Progress([events.append])
+        with progress.stage("A matrix", branches=3) as info:
+            info["matrix"] = sparse.csr_matrix(np.array([[-1.0, 1.0, 0.0], [0.0, -1.0, 1.0]]))
+
+        self.assertEqual([(event['stage'], event['event']) for event in events], [("A matrix", 'start'), ("A matrix", 'end')])
+        self.assertEqual(events[0]['branches'], 3)
+        end = events[1]
+        self.assertEqual((end['shape'], end['nnz']), ((2, 3), 4))
+        self.assertGreaterEqual(end['elapsed'], 0)
+        self.assertNotIn('matrix', end)
+
+        # 一行摘要, 不打印矩阵内容
+        output = io.StringIO()
+        print_sink(end, output)
+        self.assertTrue(output.getvalue().startswith("[A matrix] end: elapsed="))
+        self.assertEqual(output.getvalue().count('\n'), 1)
+
+    def test_quiet(self):
+        # 没有输出端时不统计矩阵信息
+        self.assertFalse(QUIET.enabled)
+        with QUIET.stage("P matrix") as info:
+            info["matrix"] = None
+        self.assertEqual(matrix_summary(np.eye(3))['nnz'], 3)
+
+    def test_stage_report(self):
+        report = StageReport()
+        progress = Progress([report], trace_memory=True)
+        with progress.stage("tower building"):
+            with progress.stage("P matrix") as info:
+                matrix = np.ones((200, 300))
+                info["matrix"] = (matrix, matrix[:2])
+                del matrix
+            with self.assertRaises(ValueError):
+                with progress.stage("C matrix"):
+                    raise ValueError
+
+        stages = report.as_dict()['stages']
+        self.assertEqual([(record['stage'], record['depth']) for record in stages], [("tower building", 0), ("P matrix", 1), ("C matrix", 1)])
+        outer, inner, failed = stages
+        self.assertEqual((inner['shape'], inner['nbytes']), ([(200, 300), (2, 300)], 202 * 300 * 8))
+        # 子阶段的内存峰值计入父阶段
+        self.assertGreaterEqual(inner['traced_peak'], 200 * 300 * 8)
+        self.assertGreaterEqual(outer['traced_peak'], inner['traced_peak'])
+        self.assertEqual(failed['error'], 'ValueError')
+        self.assertGreaterEqual(outer['cpu'], 0)
+        self.assertLessEqual(outer['start'], inner['start'])
+
+        with tempfile.TemporaryDirectory() as directory:
+            report.to_json(os.path.join(directory, 'report.json'))
+            with open(os.path.join(directory, 'report.json')) as f:
+                self.assertEqual(len(json.load(f)['stages']), 3)
+            report.to_chrome_trace(os.path.join(directory, 'trace.json'))
+            with open(os.path.join(directory, 'trace.json')) as f:
+                events = json.load(f)['traceEvents']
+        self.assertEqual([event['name'] for event in events], ["tower building", "P matrix", "C matrix"])
+        self.assertTrue(all(event['ph'] == 'X' and event['dur'] >= 0 for event in events))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,440 @@
+import numpy as np
+from scipy import sparse
+from scipy.linalg import lu_factor, lu_solve
+from scipy.sparse.linalg import LinearOperator, gmres
+from Utils.Matrix import scatter_blocks
+
+
+class Cluster:
+    def __init__(self, indices, lower, upper, children=()):
+        """
+        【函数功能】聚类树节点
+        【入参】
+        indices(numpy.ndarray): 节点包含的单元编号
+        lower, upper(numpy.ndarray: 3): 单元支撑范围的包围盒
+        children(tuple): 子节点
+        """
+        self.indices = indices
+        self.lower = lower
+        self.upper = upper
+        self.children = children
+
+    @property
+    def size(self):
+        return len(self.indices)
+
+    @property
+    def diameter(self):
+        return np.linalg.norm(self.upper - self.lower)
+
+    def is_leaf(self):
+        return not self.children
+
+    def reflect(self, signs):
+        """
+        【函数功能】按坐标符号(如(1, 1, -1)表示关于z=0的镜像)给出镜像后的包围盒
+        """
+        lower, upper = self.lower * signs, self.upper * signs
+        return np.minimum(lower, upper), np.maximum(lower, upper)
+
+
+def build_cluster_tree(points, extents=None, leaf_size=64, groups=None):
+    """
+    【函数功能】按包围盒最长边的中位数二分, 建立单元中点的聚类树
+    【入参】
+    points(numpy.ndarray: n*3): 单元的代表点(如线段中点)
+    extents(numpy.ndarray: n*1): 单元支撑范围相对代表点的半径, 用于扩展包围盒
+    leaf_size(int): 叶节点的最大单元数
+    groups(numpy.ndarray: n): 单元的分组, 根节点先按分组划分, 使每个聚类只含一组单元
+
+    【出参】
+    root(Cluster): 聚类树的根节点
+    """
+    points = np.asarray(points, dtype=float)
+    extents = np.zeros(len(points)) if extents is None else np.ravel(extents).astype(float)
+    lower_points = points - extents[:, np.newaxis]
+    upper_points = points + extents[:, np.newaxis]
+    leaf_size = max(1, int(leaf_size))
+
+    def build(indices):
+        lower = lower_points[indices].min(axis=0)
+        upper = upper_points[indices].max(axis=0)
+        if len(indices) <= leaf_size:
+            return Cluster(indices, lower, upper)
+        coords = points[indices]
+        axis = np.argmax(coords.max(axis=0) - coords.min(axis=0))
+        half = len(indices) // 2
+        order = np.argpartition(coords[:, axis], half)
+        return Cluster(indices, lower, upper, (build(indices[order[:half]]), build(indices[order[half:]])))
+
+    indices = np.arange(len(points))
+    if groups is None or len(np.unique(groups)) < 2:
+        return build(indices)
+    children = tuple(build(indices[groups == group]) for group in np.unique(groups))
+    return Cluster(indices, lower_points.min(axis=0), upper_points.max(axis=0), children)
+
+
+def _box_distance(lower1, upper1, lower2, upper2):
+    gap = np.maximum(0, np.maximum(lower1 - upper2, lower2 - upper1))
+    return np.linalg.norm(gap)
+
+
+def is_admissible(row, col, eta, reflect=None):
+    """
+    【函数功能】η容许性判据: min(diam) <= eta * dist, 满足时该矩阵块可低秩近似
+    【入参】
+    row, col(Cluster): 行、列聚类
+    eta(float): 容许性参数, 越小越严格
+    reflect(numpy.ndarray: 3): 矩阵元素含镜像项时的坐标符号, 行聚类的镜像也须满足判据
+
+    【出参】
+    admissible(bool)
+    """
+    size = min(row.diameter, col.diameter)
+    boxes = [(row.lower, row.upper)]
+    if reflect is not None:
+        boxes.append(row.reflect(reflect))
+    for lower, upper in boxes:
+        distance = _box_distance(lower, upper, col.lower, col.upper)
+        if distance == 0 or size > eta * distance:
+            return False
+    return True
+
+
+def aca(get_row, get_col, m, n, tol, max_rank):
+    """
+    【函数功能】部分选主元的自适应交叉近似(ACA), 只计算矩阵块的少量行和列
+    【入参】
+    get_row(callable): get_row(i)给出第i行(n,)
+    get_col(callable): get_col(j)给出第j列(m,)
+    m, n(int): 矩阵块的大小
+    tol(float): 相对Frobenius范数误差
+    max_rank(int): 最大秩, 超过时认为不可压缩
+
+    【出参】
+    U(numpy.ndarray: m*k), V(numpy.ndarray: k*n), 不收敛时为None
+    """
+    us, vs = [], []
+    norm2 = 0.0
+    unused = np.ones(m, dtype=bool)
+    i = 0
+    while len(us) < max_rank:
+        unused[i] = False
+        row = get_row(i)
+        for u, v in zip(us, vs):
+            row = row - u[i] * v
+        j = np.argmax(np.abs(row))
+        if row[j] == 0:
+            # 残差行为零: 换一个未使用的行, 全部行都为零时近似已精确
+            if not unused.any():
+                break
+            i = np.flatnonzero(unused)[0]
+            continue
+        v = row / row[j]
+        u = get_col(j)
+        for uk, vk in zip(us, vs):
+            u = u - vk[j] * uk
+        uv = np.linalg.norm(u) * np.linalg.norm(v)
+        norm2 += uv ** 2 + 2 * sum(np.dot(uk, u) * np.dot(vk, v) for uk, vk in zip(us, vs))
+        us.append(u)
+        vs.append(v)
+        if uv <= tol * np.sqrt(abs(norm2)) or not unused.any():
+            break
+        i = np.argmax(np.where(unused, np.abs(u), -1))
+    else:
+        return None
+    if not us:
+        return np.zeros((m, 0)), np.zeros((0, n))
+    return _recompress(np.column_stack(us), np.vstack(vs), tol)
+
+
+def _recompress(U, V, tol):
+    """
+    【函数功能】对低秩因子U*V做QR-SVD重压缩, 去掉冗余的秩
+    """
+    Qu, Ru = np.linalg.qr(U)
+    Qv, Rv = np.linalg.qr(V.T)
+    W, s, Zt = np.linalg.svd(Ru @ Rv.T)
+    if s[0] == 0:
+        return U[:, :0], V[:0]
+    rank = int(np.count_nonzero(s > tol * s[0]))
+    return Qu @ (W[:, :rank] * s[:rank]), Zt[:rank] @ Qv.T
+
+
+class HMatrix:
+    def __init__(self, shape, blocks, dtype=float):
+        """
+        【函数功能】分层矩阵(H-matrix): 由近场稠密块和远场低秩块拼成的方阵
+        【入参】
+        shape(tuple): 矩阵大小
+        blocks(list): 每项为(rows, cols, D)的稠密块或(rows, cols, (U, V))的低秩块,
+                      rows/cols为原矩阵中的行、列编号
+        """
+        self.shape = shape
+        self.blocks = blocks
+        self.dtype = dtype
+        self._preconditioner = None
+
+    @property
+    def nbytes(self):
+        total = 0
+        for rows, cols, data in self.blocks:
+            total += rows.nbytes + cols.nbytes
+            total += data[0].nbytes + data[1].nbytes if isinstance(data, tuple) else data.nbytes
+        return total
+
+    @property
+    def compression(self):
+        """存储量与稠密矩阵之比"""
+        return self.nbytes / (self.shape[0] * self.shape[1] * np.dtype(self.dtype).itemsize)
+
+    @property
+    def max_rank(self):
+        return max((data[0].shape[1] for _, _, data in self.blocks if isinstance(data, tuple)), default=0)
+
+    def matvec(self, x):
+        """
+        【函数功能】计算矩阵与向量(或多列矩阵)的乘积
+        【入参】
+        x(numpy.ndarray: n 或 n*k)
+
+        【出参】
+        y(numpy.ndarray: m 或 m*k)
+        """
+        x = np.asarray(x)
+        y = np.zeros((self.shape[0],) + x.shape[1:], dtype=np.result_type(self.dtype, x.dtype))
+        for rows, cols, data in self.blocks:
+            if isinstance(data, tuple):
+                y[rows] += data[0] @ (data[1] @ x[cols])
+            else:
+                y[rows] += data @ x[cols]
+        return y
+
+    def __matmul__(self, x):
+        return self.matvec(x)
+
+    def to_dense(self):
+        """
+        【函数功能】展开为稠密矩阵
+        """
+        matrix = np.zeros(self.shape, dtype=self.dtype)
+        for rows, cols, data in self.blocks:
+            matrix[np.ix_(rows, cols)] = data[0] @ data[1] if isinstance(data, tuple) else data
+        return matrix
+
+    def diagonal(self):
+        """
+        【函数功能】矩阵的对角元, 取自对角线上的稠密叶块
+        """
+        diagonal = np.zeros(self.shape[0], dtype=self.dtype)
+        for rows, cols, data in self._diagonal_blocks():
+            diagonal[rows] = np.diagonal(data)
+        return diagonal
+
+    def _diagonal_blocks(self):
+        # 对角线上的聚类对不满足容许性, 一直细分到叶节点, 各对角叶块的行编号构成所有行的划分
+        return [(rows, cols, data) for rows, cols, data in self.blocks if not isinstance(data, tuple) and rows is cols]
+
+    def as_linear_operator(self):
+        return LinearOperator(self.shape, matvec=self.matvec, matmat=self.matvec, dtype=self.dtype)
+
+    def _block_jacobi(self):
+        # 对角叶块构成行编号的划分, 以其LU分解作为块Jacobi预条件
+        if self._preconditioner is None:
+            diagonal = [(rows, lu_factor(data)) for rows, cols, data in self._diagonal_blocks()]
+            self._preconditioner = _block_preconditioner(self.shape, self.dtype, diagonal)
+        return self._preconditioner
+
+    def solve(self, b, rtol=1e-10, maxiter=None):
+        """
+        【函数功能】用块Jacobi预条件的GMRES迭代求解 H x = b
+        【入参】
+        b(numpy.ndarray: n 或 n*k): 右端项
+        rtol(float): 相对残差
+        maxiter(int): 最大重启次数
+
+        【出参】
+        x(numpy.ndarray: n 或 n*k)
+        """
+        return _gmres_solve(self, b, rtol, maxiter)
+
+
+class ExpandedHMatrix:
+    def __init__(self, hmatrix, index, correction):
+        """
+        【函数功能】由分层矩阵按行列编号映射扩展并加上稀疏修正的方阵 A = H[index][:, index] + C, 不展开H。
+        如杆塔的L矩阵: 芯线与其他线段的互感取所在表皮的互感(芯线的行列映射到表皮的行列), 线段自身的电感和管状线段内部的子矩阵由修正给出
+        【入参】
+        hmatrix(HMatrix: N*N): 分层矩阵H
+        index(numpy.ndarray: n): A的第i行(列)取H的第index[i]行(列)
+        correction(scipy.sparse矩阵: n*n): 稀疏修正C
+        """
+        self.hmatrix = hmatrix
+        self.index = np.asarray(index, dtype=int)
+        self.correction = sparse.csr_matrix(correction)
+        n = len(self.index)
+        self.shape = (n, n)
+        self.dtype = np.result_type(hmatrix.dtype, self.correction.dtype)
+        # A = G H G^T + C, G为A的行到H的行的选择矩阵
+        self._selection = sparse.csr_matrix((np.ones(n), (np.arange(n), self.index)), shape=(n, hmatrix.shape[0]))
+        self._preconditioner = None
+
+    @property
+    def nbytes(self):
+        # H为各频率共用的分层矩阵, 另加编号映射和稀疏修正
+        total = self.hmatrix.nbytes + self.index.nbytes
+        for matrix in (self.correction, self._selection):
+            total += matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes
+        return total
+
+    @property
+    def compression(self):
+        """存储量与稠密矩阵之比"""
+        return self.nbytes / (self.shape[0] * self.shape[1] * np.dtype(self.dtype).itemsize)
+
+    def copy(self):
+        """
+        【函数功能】复制稀疏修正, 分层矩阵和编号映射共用
+        """
+        return ExpandedHMatrix(self.hmatrix, self.index, self.correction.copy())
+
+    def matvec(self, x):
+        """
+        【函数功能】计算矩阵与向量(或多列矩阵)的乘积
+        【入参】
+        x(numpy.ndarray: n 或 n*k)
+
+        【出参】
+        y(numpy.ndarray: n 或 n*k)
+        """
+        x = np.asarray(x)
+        return self._selection @ self.hmatrix.matvec(self._selection.T @ x) + self.correction @ x
+
+    def __matmul__(self, x):
+        return self.matvec(x)
+
+    def to_dense(self):
+        """
+        【函数功能】展开为稠密矩阵
+        """
+        return self.hmatrix.to_dense()[np.ix_(self.index, self.index)] + self.correction.toarray()
+
+    def scatter_blocks(self, indices, blocks):
+        """
+        【函数功能】将k个m*m的子矩阵写入A(原地修改稀疏修正), 与Utils.Matrix.scatter_blocks对展开后矩阵的结果相同。
+        每个子矩阵的行列须映射到H的同一行(如同一段管状线段的表皮和芯线), 这时H在子矩阵上的值均为该行的对角元
+        【入参】
+        indices(numpy.ndarray: k*m): 每行为一个子矩阵的行列编号
+        blocks(numpy.ndarray: k*m*m 或 m*m): 子矩阵
+
+        【出参】
+        A(ExpandedHMatrix): 即本矩阵
+        """
+        indices = np.asarray(indices, dtype=int)
+        indices = indices.reshape(-1, indices.shape[-1])
+        source = self.index[indices]
+        if np.any(source != source[:, :1]):
+            raise ValueError("The rows of each block must map to the same row of the H-matrix.")
+        offset = self.hmatrix.diagonal()[source[:, 0]]
+        scatter_blocks(self.correction, indices, np.asarray(blocks) - offset[:, np.newaxis, np.newaxis])
+        self._preconditioner = None
+        return self
+
+    def as_linear_operator(self):
+        return LinearOperator(self.shape, matvec=self.matvec, matmat=self.matvec, dtype=self.dtype)
+
+    def _block_jacobi(self):
+        # H的对角叶块经编号映射得到A的行的划分(映射到同一叶块的行为一组), 以A在各组上的子矩阵的LU分解作为块Jacobi预条件
+        if self._preconditioner is None:
+            leaves = self.hmatrix._diagonal_blocks()
+            leaf, position = np.empty(self.hmatrix.shape[0], dtype=int), np.empty(self.hmatrix.shape[0], dtype=int)
+            for k, (rows, _, _) in enumerate(leaves):
+                leaf[rows], position[rows] = k, np.arange(len(rows))
+            group = leaf[self.index]
+            order = np.argsort(group, kind='stable')
+            members = np.split(order, np.cumsum(np.bincount(group, minlength=len(leaves)))[:-1])
+            diagonal = []
+            for (_, _, data), rows in zip(leaves, members):
+                if rows.size:
+                    local = position[self.index[rows]]
+                    diagonal.append((rows, lu_factor(data[np.ix_(local, local)] + self.correction[rows][:, rows].toarray())))
+            self._preconditioner = _block_preconditioner(self.shape, self.dtype, diagonal)
+        return self._preconditioner
+
+    def solve(self, b, rtol=1e-10, maxiter=None):
+        """
+        【函数功能】用块Jacobi预条件的GMRES迭代求解 A x = b, 参数同HMatrix.solve
+        """
+        return _gmres_solve(self, b, rtol, maxiter)
+
+
+def _block_preconditioner(shape, dtype, diagonal):
+    # diagonal: (行编号, LU分解)的列表, 各组行编号互不重叠
+    def apply(r):
+        z = np.zeros_like(r, dtype=np.result_type(dtype, r.dtype))
+        for rows, factor in diagonal:
+            z[rows] = lu_solve(factor, r[rows])
+        return z
+
+    return LinearOperator(shape, matvec=apply, dtype=dtype)
+
+
+def _gmres_solve(matrix, b, rtol, maxiter):
+    b = np.asarray(b)
+    if b.ndim > 1:
+        return np.column_stack([_gmres_solve(matrix, b[:, k], rtol, maxiter) for k in range(b.shape[1])])
+    x, info = gmres(matrix.as_linear_operator(), b, rtol=rtol, atol=0, maxiter=maxiter, M=matrix._block_jacobi())
+    if info != 0:
+        raise RuntimeError("GMRES did not converge to rtol = {} (info = {})".format(rtol, info))
+    return x
+
+
+def build_hmatrix(entries, points, extents=None, leaf_size=64, eta=1.0, tol=1e-6, max_rank=None, reflect=None, groups=None):
+    """
+    【函数功能】按单元中点的聚类树和η容许性建立分层矩阵, 远场块用ACA压缩, 近场块直接计算
+    【入参】
+    entries(callable): entries(rows, cols)给出矩阵块A[rows][:, cols]
+    points(numpy.ndarray: n*3): 单元的代表点
+    extents(numpy.ndarray: n*1): 单元支撑范围的半径
+    leaf_size(int): 叶节点的最大单元数
+    eta(float): 容许性参数
+    tol(float): ACA的相对误差
+    max_rank(int): 低秩块的最大秩, 默认为块尺寸的一半(超过时低秩存储不再节省)
+    reflect(numpy.ndarray: 3): 矩阵元素含镜像项时的坐标符号, 如(1, 1, -1)
+    groups(numpy.ndarray: n): 单元的分组, 矩阵元素的表达式随分组变化时给出, 使每个矩阵块内的表达式一致
+
+    【出参】
+    H(HMatrix)
+    """
+    n = len(points)
+    if reflect is not None:
+        reflect = np.asarray(reflect, dtype=float)
+    root = build_cluster_tree(points, extents, leaf_size, groups)
+    blocks = []
+
+    def add_dense(row, col):
+        data = np.asarray(entries(row.indices, col.indices))
+        blocks.append((row.indices, row.indices if row is col else col.indices, data))
+
+    def build(row, col):
+        if is_admissible(row, col, eta, reflect):
+            limit = min(row.size, col.size) // 2 if max_rank is None else max_rank
+            factors = aca(lambda i: np.ravel(entries(row.indices[i:i + 1], col.indices)),
+                          lambda j: np.ravel(entries(row.indices, col.indices[j:j + 1])),
+                          row.size, col.size, tol, max(1, limit))
+            if factors is not None:
+                blocks.append((row.indices, col.indices, factors))
+                return
+            add_dense(row, col)
+        elif row.is_leaf() and col.is_leaf():
+            add_dense(row, col)
+        else:
+            # 只细分非叶节点, 避免叶节点与大聚类之间形成大的稠密块
+            for child_row in row.children or (row,):
+                for child_col in col.children or (col,):
+                    build(child_row, child_col)
+
+    if n:
+        build(root, root)
+    dtype = np.result_type(float, *[data[0] if isinstance(data, tuple) else data for _, _, data in blocks])
+    return HMatrix((n, n), blocks, dtype)
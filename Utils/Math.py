@@ -1,4 +1,14 @@
 import numpy as np
+from scipy.special import ive, kve
+
+# Bessel函数表: 在w = log(z)平面上按step划分网格, 每个网格存储log f在网格中心处的degree阶Taylor系数,
+# 并在网格边界上每条边CHECKS个点处与精确值比较
+BESSEL_TABLE_STEP = 0.05
+BESSEL_TABLE_DEGREE = 8
+BESSEL_TABLE_SAMPLES = 16
+BESSEL_TABLE_CHECKS = 8
+BESSEL_TABLE_TOL = 1e-11
+BESSEL_TABLE_RANGE = (1e-6, 1e4)
 
 
 def Bessel_K2(z, n1, n2):
@@ -38,6 +48,185 @@ def Bessel_IK(z1, n1, z2, n2):
     return IK
 
 
+class BesselTable:
+    def __init__(self, log_func, r_range=BESSEL_TABLE_RANGE, step=BESSEL_TABLE_STEP, degree=BESSEL_TABLE_DEGREE,
+                 samples=BESSEL_TABLE_SAMPLES, tol=BESSEL_TABLE_TOL, checks=BESSEL_TABLE_CHECKS):
+        """
+        【函数功能】复变量Bessel函数的插值表。
+        log f(z)在w = log(z)平面上解析, 网格覆盖|z|在r_range内、-pi/2 <= arg(z) <= pi/2的区域。
+        每个网格的Taylor系数由网格中心周围圆周上的采样值经FFT得到(Cauchy积分), 在首次用到时计算。
+        展开的误差在网格内解析, 其模的最大值在网格边界上取到, 因此在边界上均匀取4*checks个点(含四角和各边中点)
+        与精确值比较: 相对误差超过tol的网格改为精确计算。这是抽样检查而不是严格的误差界,
+        并且以log_func的精度为准(如scipy在虚轴附近自身的误差无法区分)。表外的自变量直接精确计算。
+        【入参】
+        log_func(callable): log_func(z)给出log f(z)的精确值
+        r_range(tuple): |z|的范围
+        step(float): w平面上的网格边长
+        degree(int): Taylor展开阶数
+        samples(int): 每个圆周上的采样点数
+        tol(float): 检查点上允许的相对误差
+        checks(int): 网格每条边上的检查点数
+        """
+        self.log_func = log_func
+        self.step = step
+        self.degree = degree
+        self.samples = samples
+        self.tol = tol
+        # 网格边界上的检查点(相对网格中心): 从四角出发沿各边逆时针等分
+        t = np.arange(checks) / checks
+        edge = 0.5 * step * np.array([1 - 1j, 1 + 1j, -1 + 1j, -1 - 1j])
+        self.checkpoints = (edge[:, np.newaxis] + (np.roll(edge, -1) - edge)[:, np.newaxis] * t).ravel()
+        self.lower = np.array([np.log(r_range[0]), -np.pi / 2])
+        self.shape = tuple(np.ceil((np.array([np.log(r_range[1]), np.pi / 2]) - self.lower) / step).astype(int))
+        self.coefficients = np.zeros((self.shape[0] * self.shape[1], degree + 1), dtype=complex)
+        # 0: 未计算, 1: 使用Taylor展开, 2: 精确计算
+        self.state = np.zeros(self.shape[0] * self.shape[1], dtype=np.int8)
+        i, j = np.divmod(np.arange(self.shape[0] * self.shape[1]), self.shape[1])
+        self.centers = self.lower[0] + (i + 0.5) * step + 1j * (self.lower[1] + (j + 0.5) * step)
+
+    def _build(self, cells):
+        # 圆周半径取网格边长, 圆周上的log f沿圆周连续展开后做FFT
+        w0 = self.centers[cells]
+        theta = 2 * np.pi * np.arange(self.samples) / self.samples
+        with np.errstate(all='ignore'):
+            G = self.log_func(np.exp(w0[:, np.newaxis] + self.step * np.exp(1j * theta)))
+            G = G.real + 1j * np.unwrap(G.imag, axis=1)
+            c = np.fft.fft(G, axis=1)[:, :self.degree + 1] / self.samples
+            c = c / self.step ** np.arange(self.degree + 1)
+        self.coefficients[cells] = c
+
+        # 在网格边界上验证
+        w = w0[:, np.newaxis] + self.checkpoints
+        with np.errstate(all='ignore'):
+            error = np.abs(np.exp(self._horner(c[:, np.newaxis, :], self.checkpoints) - self.log_func(np.exp(w))) - 1).max(axis=1)
+        self.state[cells] = np.where(error <= self.tol, 1, 2)
+
+    @staticmethod
+    def _horner(c, d):
+        value = c[..., -1]
+        for k in range(c.shape[-1] - 2, -1, -1):
+            value = value * d + c[..., k]
+        return value
+
+    def __call__(self, z):
+        """
+        【函数功能】计算log f(z)
+        【入参】
+        z(numpy.ndarray): 复自变量
+
+        【出参】
+        log_f(numpy.ndarray): 与z形状相同
+        """
+        z = np.asarray(z, dtype=complex)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            w = np.log(z).ravel()
+            x = np.floor((w.real - self.lower[0]) / self.step)
+            y = np.floor((w.imag - self.lower[1]) / self.step)
+        inside = (x >= 0) & (x < self.shape[0]) & (y >= 0) & (y < self.shape[1])
+        cells = np.where(inside, x * self.shape[1] + y, 0).astype(int)
+        state = self.state[cells]
+        if np.any(inside & (state == 0)):
+            self._build(np.unique(cells[inside & (state == 0)]))
+            state = self.state[cells]
+        table = inside & (state == 1)
+        if table.all():
+            return self._horner(self.coefficients[cells], w - self.centers[cells]).reshape(z.shape)
+
+        result = np.empty(w.shape, dtype=complex)
+        result[table] = self._horner(self.coefficients[cells[table]], w[table] - self.centers[cells[table]])
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            result[~table] = self.log_func(z.ravel()[~table])
+        return result.reshape(z.shape)
+
+
+_bessel_tables = {}
+
+
+def bessel_table(kind, n):
+    """
+    【函数功能】取得(首次使用时创建)Bessel函数的对数插值表
+    【入参】
+    kind(str): 'I'表示log(In(z)) - z, 'K'表示log(Kn(z)) + z,
+               'I_ratio'表示log(In(z) / In+1(z)), 'K_ratio'表示log(Kn(z) / Kn+1(z))
+    n(int): 阶数
+
+    【出参】
+    table(BesselTable)
+    """
+    key = (kind, int(n))
+    if key not in _bessel_tables:
+        n = key[1]
+        # 取缩放的Bessel函数避免溢出; log(In(z)) - z = log(ive(n, z)) + |Re z| - z, 在w平面上解析
+        # (网格的采样圆周会越过虚轴, 不能写成只在Re z >= 0成立的log(ive(n, z)) - i*Im(z))
+        log_funcs = {'I': lambda z: np.log(ive(n, z)) + np.abs(z.real) - z,
+                     'K': lambda z: np.log(kve(n, z)),
+                     'I_ratio': lambda z: np.log(ive(n, z) / ive(n + 1, z)),
+                     'K_ratio': lambda z: np.log(kve(n, z) / kve(n + 1, z))}
+        _bessel_tables[key] = BesselTable(log_funcs[kind])
+    return _bessel_tables[key]
+
+
+def _log_bessel(kind, n, z):
+    # 按阶数分组查表, n可以是与z可广播的数组
+    n, z = np.broadcast_arrays(np.asarray(n), np.asarray(z, dtype=complex))
+    if n.size and np.all(n == n.flat[0]):
+        return bessel_table(kind, n.flat[0])(z)
+    result = np.empty(z.shape, dtype=complex)
+    for order in np.unique(n):
+        mask = n == order
+        result[mask] = bessel_table(kind, order)(z[mask])
+    return result
+
+
+def Bessel_K_ratio(z, n1, n2):
+    """
+    【函数功能】修正的第二类Bessel函数相除Kn1(z)/Kn2(z), 由插值表计算
+    【入参】
+    z(numpy.ndarray): Bessel函数变量
+    n1(int/numpy.ndarray): 分子的Bessel函数阶数
+    n2(int/numpy.ndarray): 分母的Bessel函数阶数
+
+    【出参】
+    K2(numpy.ndarray): Kn1(z)/Kn2(z)
+    """
+    if np.all(np.asarray(n2) == np.asarray(n1) + 1):
+        return np.exp(_log_bessel('K_ratio', n1, z))
+    return np.exp(_log_bessel('K', n1, z) - _log_bessel('K', n2, z))
+
+
+def Bessel_I_ratio(z, n1, n2):
+    """
+    【函数功能】修正的第一类Bessel函数相除In1(z)/In2(z), 由插值表计算
+    【入参】
+    z(numpy.ndarray): Bessel函数变量
+    n1(int/numpy.ndarray): 分子的Bessel函数阶数
+    n2(int/numpy.ndarray): 分母的Bessel函数阶数
+
+    【出参】
+    I2(numpy.ndarray): In1(z)/In2(z)
+    """
+    if np.all(np.asarray(n2) == np.asarray(n1) + 1):
+        return np.exp(_log_bessel('I_ratio', n1, z))
+    return np.exp(_log_bessel('I', n1, z) - _log_bessel('I', n2, z))
+
+
+def Bessel_IK_product(z1, n1, z2, n2):
+    """
+    【函数功能】修正的第一类Bessel函数和第二类Bessel函数相乘In1(z1)*Kn2(z2), 由插值表计算(Re z1 >= 0)
+    【入参】
+    z1(numpy.ndarray): 第一类Bessel函数变量
+    n1(int): 第一类Bessel函数阶数
+    z2(numpy.ndarray): 第二类Bessel函数变量
+    n2(int): 第二类Bessel函数阶数
+
+    【出参】
+    IK(numpy.ndarray): In1(z1)*Kn2(z2)
+    """
+    z1 = np.asarray(z1, dtype=complex)
+    z2 = np.asarray(z2, dtype=complex)
+    return np.exp(_log_bessel('I', n1, z1) + _log_bessel('K', n2, z2) + z1 - z2)
+
+
 def calculate_distances(points1, points2):
     """
     计算两个 n x 3 矩阵中对应行之间的距离.
@@ -52,10 +241,8 @@ def calculate_distances(points1, points2):
     if points1.shape != points2.shape:
         raise ValueError("两个输入矩阵必须有相同的形状!")
     
-    distances = np.zeros((points1.shape[0], 1))
-    for i in range(points1.shape[0]):
-        distances[i] = np.sum((points1[i] - points2[i])**2)
-    
+    distances = np.sum((points1 - points2) ** 2, axis=1, keepdims=True).astype(float)
+
     return distances
 
 
@@ -1,4 +1,5 @@
 import numpy as np
+from scipy import sparse
 
 
 def expand_matrix(matrix, i, end, m):
@@ -31,6 +32,30 @@ def expand_matrix(matrix, i, end, m):
     return expanded_matrix
 
 
+def expand_matrix_all(matrix, indices, end, m):
+    """
+    对indices中的每个行列索引依次调用expand_matrix(每次复制m次)的结果, 一次分配最终大小的矩阵完成扩充
+
+    参数:
+    matrix (numpy.ndarray): 输入n*n矩阵
+    indices (list): k个要取出的行和列索引
+    end (int): 要取出的行列的截止位置和赋值的截止位置(不超过n)
+    m (int): 每个索引复制的次数
+
+    返回:
+    expanded_matrix (numpy.ndarray): 扩充后的(n+k*m)*(n+k*m)矩阵
+    """
+    n = matrix.shape[0]
+    indices = np.asarray(indices, dtype=int)
+    size = n + len(indices) * m
+    expanded_matrix = np.zeros((size, size), dtype=matrix.dtype)
+    expanded_matrix[:n, :n] = matrix
+    # 第j个索引的行、列依次复制到第n+j*m行(列)开始的m行(列)
+    expanded_matrix[n:, :end] = np.repeat(matrix[indices, :end], m, axis=0)
+    expanded_matrix[:end, n:] = np.repeat(matrix[:end, indices], m, axis=1)
+    return expanded_matrix
+
+
 def copy_and_expand_matrix(original_matrix, m):
     """
     将一个n*n的矩阵扩展为一个mn*mn的矩阵,其中主对角线上的m*m矩阵块为0,
@@ -44,24 +69,13 @@ def copy_and_expand_matrix(original_matrix, m):
     expanded_matrix (numpy.ndarray): 扩展后的mn*mn矩阵
     """
     n = original_matrix.shape[0]  # 原始矩阵的大小
-    expanded_size = n * m  # 扩展后矩阵的大小
-
-    # 创建一个全零的扩展矩阵
-    expanded_matrix = np.zeros((expanded_size, expanded_size), dtype=original_matrix.dtype)
 
-    # 遍历原始矩阵的每个元素
-    for i in range(n):
-        for j in range(n):
-            # 计算子矩阵块的起始位置
-            row_start = i * m
-            col_start = j * m
+    # 每个元素按行、列各复制m次成为m*m的子矩阵块(Kronecker积 A ⊗ ones(m, m))
+    expanded_matrix = np.repeat(np.repeat(original_matrix, m, axis=0), m, axis=1)
 
-            # 将当前元素复制为m*m的子矩阵块
-            expanded_matrix[row_start:row_start+m, col_start:col_start+m] = np.full((m, m), original_matrix[i, j])
-
-            # 将主对角线上的m*m矩阵块设置为0
-            if i == j:
-                expanded_matrix[row_start:row_start+m, col_start:col_start+m] = 0
+    # 将主对角线上的m*m矩阵块设置为0
+    blocks = expanded_matrix.reshape(n, m, n, m)
+    blocks[np.arange(n), :, np.arange(n), :] = 0
 
     return expanded_matrix
 
@@ -89,6 +103,59 @@ def update_matrix(matrix, indices, submatrix):
     return updated_matrix
 
 
+def scatter_blocks(matrix, indices, blocks):
+    """
+    将 k 个 m*m 的子矩阵按各自的行列索引一次写入 n*n 矩阵(原地修改, 不复制整个矩阵),
+    等价于对每个子矩阵调用 update_matrix, 各子矩阵的索引互不重叠。
+
+    参数:
+    matrix (numpy.ndarray): 输入的 n*n 矩阵, 原地更新
+    indices (numpy.ndarray): k*m 的矩阵, 每行为一个子矩阵的行列索引
+    blocks (numpy.ndarray): k*m*m 的子矩阵, 或所有子矩阵共用的 m*m 矩阵
+
+    返回:
+    matrix (numpy.ndarray): 更新后的矩阵(即输入矩阵)
+    """
+    indices = np.asarray(indices, dtype=int)
+    indices = indices.reshape(-1, indices.shape[-1])
+    if sparse.issparse(matrix):
+        # 稀疏矩阵逐元素写入, 子矩阵的位置已在非零结构中(见sparse_blocks)时不改变存储结构
+        rows, cols = np.broadcast_arrays(indices[:, :, np.newaxis], indices[:, np.newaxis, :])
+        matrix[rows.ravel(), cols.ravel()] = np.broadcast_to(blocks, rows.shape).ravel()
+        return matrix
+    matrix[indices[:, :, np.newaxis], indices[:, np.newaxis, :]] = blocks
+    return matrix
+
+
+def sparse_blocks(shape, indices, blocks, diagonal=None):
+    """
+    由对角元和 k 个 m*m 的子矩阵一次生成稀疏矩阵, 与在对角矩阵(或零矩阵)上调用 scatter_blocks 的结果相同。
+    子矩阵中的零元素也保留在非零结构中, 之后可用 scatter_blocks 原位替换子矩阵。
+
+    参数:
+    shape (tuple): 矩阵大小
+    indices (numpy.ndarray): k*m 的矩阵, 每行为一个子矩阵的行列索引
+    blocks (numpy.ndarray): k*m*m 的子矩阵, 或所有子矩阵共用的 m*m 矩阵
+    diagonal (numpy.ndarray): 长度为 shape[0] 的对角元, 默认为0; 子矩阵覆盖的对角元取子矩阵的值
+
+    返回:
+    matrix (scipy.sparse.csr_matrix): 稀疏矩阵
+    """
+    indices = np.asarray(indices, dtype=int)
+    indices = indices.reshape(-1, indices.shape[-1]) if indices.size else np.zeros((0, 0), dtype=int)
+    rows, cols = np.broadcast_arrays(indices[:, :, np.newaxis], indices[:, np.newaxis, :])
+    data = np.broadcast_to(blocks, rows.shape).ravel() if indices.size else np.zeros(0)
+    rows, cols = rows.ravel(), cols.ravel()
+    if diagonal is not None:
+        keep = np.ones(shape[0], dtype=bool)
+        keep[indices.ravel()] = False
+        keep &= np.asarray(diagonal) != 0
+        diagonal_index = np.flatnonzero(keep)
+        rows, cols = np.concatenate((diagonal_index, rows)), np.concatenate((diagonal_index, cols))
+        data = np.concatenate((np.asarray(diagonal)[diagonal_index], data))
+    return sparse.csr_matrix((data, (rows, cols)), shape=shape)
+
+
 def update_and_sum_matrix(matrix):
     """
     对给定的 n*n 方阵执行矩阵操作:
@@ -110,4 +177,33 @@ def update_and_sum_matrix(matrix):
     # 处理第一行和第一列
     new_matrix[0, 0] = -0.5* (np.sum(new_matrix[0, 1:]) + np.sum(new_matrix[1:, 0]))
 
-    return new_matrix
\ No newline at end of file
+    return new_matrix
+
+
+def sparse_incidence_matrix(bran_index, shape):
+    """
+    由支路起点、终点的节点编号一次生成稀疏的邻接矩阵: 第k行的起点列为-1, 终点列为+1。
+    起点与终点相同的支路与逐个赋值一致, 取后写入的+1(按CSR的三个数组直接生成, 不对重复元素求和)。
+
+    参数:
+    bran_index (numpy.ndarray): n*2 的矩阵, 每行为一条支路起点、终点的节点编号(从0开始)
+    shape (tuple): 邻接矩阵的大小, 行数不少于支路数(多出的行为零)
+
+    返回:
+    incidence_matrix (scipy.sparse.csr_matrix): 邻接矩阵
+    """
+    bran_index = np.asarray(bran_index, dtype=int).reshape(-1, 2)
+    n = len(bran_index)
+    # 起点与终点相同时只保留终点的+1
+    degenerate = bran_index[:, 0] == bran_index[:, 1]
+    keep = np.ones((n, 2), dtype=bool)
+    keep[:, 0] = ~degenerate
+    data = np.tile([-1.0, 1.0], n)[keep.ravel()]
+    indices = bran_index.ravel()[keep.ravel()]
+    indptr = np.zeros(shape[0] + 1, dtype=int)
+    indptr[1:n + 1] = np.cumsum(keep.sum(axis=1))
+    indptr[n + 1:] = indptr[n]
+    matrix = sparse.csr_matrix((data, indices, indptr), shape=shape)
+    matrix.sort_indices()
+    return matrix
+
@@ -0,0 +1,61 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+
+def resolve_workers(workers):
+    """
+    【函数功能】解析线程数
+    【入参】
+    workers(int/None): 线程数, None或小于等于0表示使用全部CPU核
+
+    【出参】
+    workers(int): 实际使用的线程数
+    """
+    if workers is None or workers <= 0:
+        return os.cpu_count() or 1
+    return int(workers)
+
+
+@contextmanager
+def parallel_executor(workers):
+    """
+    【函数功能】按线程数创建共享线程池, 串行(workers == 1)时给出None
+    【入参】
+    workers(int/None): 线程数
+
+    【出参】
+    executor(ThreadPoolExecutor/None): 线程池
+    """
+    workers = resolve_workers(workers)
+    if workers == 1:
+        yield None
+        return
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        yield executor
+
+
+def run_tasks(func, tasks, workers=1, executor=None):
+    """
+    【函数功能】执行func(*task), 按任务顺序返回结果。
+    numpy的逐元素运算会释放GIL, 因此以矩阵块为单位的任务可以用线程并行。
+
+    【入参】
+    func(callable): 任务函数
+    tasks(iterable): 任务参数元组的集合
+    workers(int/None): 线程数(未给出executor时使用), 1为串行
+    executor(Executor): 共享的线程池, 给出时任务提交到该线程池
+
+    【出参】
+    results(list): 各任务的返回值
+    """
+    tasks = list(tasks)
+    if executor is None:
+        workers = resolve_workers(workers)
+        if workers == 1 or len(tasks) <= 1:
+            return [func(*task) for task in tasks]
+        with ThreadPoolExecutor(max_workers=min(workers, len(tasks))) as pool:
+            futures = [pool.submit(func, *task) for task in tasks]
+            return [future.result() for future in futures]
+    futures = [executor.submit(func, *task) for task in tasks]
+    return [future.result() for future in futures]
@@ -0,0 +1,227 @@
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+import numpy as np
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def peak_memory():
+    """
+    【函数功能】进程的峰值常驻内存(bytes), 无法获取时为None
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux下单位为KB, macOS下为bytes
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def matrix_summary(matrix):
+    """
+    【函数功能】矩阵的摘要信息(不格式化矩阵内容)
+    【入参】
+    matrix(numpy.ndarray/scipy.sparse矩阵/HMatrix/ExpandedHMatrix, 或它们的tuple/list)
+
+    【出参】
+    summary(dict): shape, nnz(非零元素数), nbytes(存储量); 多个矩阵时shape为列表, nnz、nbytes为总和
+    """
+    if isinstance(matrix, (tuple, list)):
+        summaries = [matrix_summary(item) for item in matrix]
+        nnz = [summary['nnz'] for summary in summaries]
+        return {'shape': [summary['shape'] for summary in summaries],
+                'nnz': None if None in nnz else sum(nnz),
+                'nbytes': sum(summary['nbytes'] for summary in summaries)}
+    matrix = np.asarray(matrix) if np.isscalar(matrix) else matrix
+    if hasattr(matrix, 'blocks') or hasattr(matrix, 'hmatrix'):
+        # HMatrix、ExpandedHMatrix: 低秩块不统计非零元素数
+        return {'shape': tuple(matrix.shape), 'nnz': None, 'nbytes': matrix.nbytes}
+    if hasattr(matrix, 'tocsr'):
+        nbytes = sum(getattr(matrix, name).nbytes for name in ('data', 'indices', 'indptr', 'row', 'col') if hasattr(matrix, name))
+        return {'shape': tuple(matrix.shape), 'nnz': matrix.nnz, 'nbytes': nbytes}
+    return {'shape': tuple(matrix.shape), 'nnz': int(np.count_nonzero(matrix)), 'nbytes': matrix.nbytes}
+
+
+class Progress:
+    def __init__(self, sinks=(), trace_memory=False):
+        """
+        【函数功能】建模过程的进度事件: 每个阶段开始、结束时向各输出端发送一个事件(dict)
+        没有输出端时不计时、不统计矩阵信息, 不产生任何开销。
+        【入参】
+        sinks(iterable): 输出端, 每个为接收事件dict的callable, 如print_sink、StageReport、list.append、queue.Queue.put_nowait;
+                         输出端在建模线程中同步调用, 耗时的处理应放到队列中由其他线程完成
+        trace_memory(bool): 是否用tracemalloc统计各阶段新分配内存的峰值(有明显的额外开销, 用于性能分析);
+                            未在跟踪时由最外层阶段启动和停止tracemalloc
+
+        事件字段:
+        stage(str): 阶段名称
+        event(str): 'start'或'end'
+        time(float): 事件时刻(time.perf_counter, s)
+        thread(int): 线程编号
+        elapsed(float): 阶段耗时(s), 仅'end'事件
+        cpu(float): 阶段的进程CPU时间(s, 含所有线程), 仅'end'事件
+        memory(int): 进程峰值内存(bytes), 仅'end'事件
+        traced_peak(int): 阶段内tracemalloc跟踪的内存峰值相对阶段开始时的增量(bytes), 仅trace_memory时的'end'事件
+        error(str): 阶段因异常退出时的异常类型, 仅'end'事件
+        以及调用方给出的字段, 其中matrix字段在发送前替换为shape、nnz、nbytes
+        """
+        self.sinks = list(sinks)
+        self.trace_memory = trace_memory
+        # 嵌套阶段的[开始时的跟踪内存, 子阶段的峰值]
+        self._memory_stack = []
+        self._started_tracing = False
+
+    @property
+    def enabled(self):
+        return bool(self.sinks)
+
+    def emit(self, stage, event, **fields):
+        """
+        【函数功能】向各输出端发送一个事件
+        """
+        if not self.sinks:
+            return
+        matrix = fields.pop('matrix', None)
+        if matrix is not None:
+            fields.update(matrix_summary(matrix))
+        record = dict(stage=stage, event=event, time=time.perf_counter(), thread=threading.get_ident(), **fields)
+        for sink in self.sinks:
+            sink(record)
+
+    @contextmanager
+    def stage(self, name, **fields):
+        """
+        【函数功能】记录一个阶段: 进入时发送'start'事件, 退出时发送带耗时和峰值内存的'end'事件
+        【入参】
+        name(str): 阶段名称
+        fields: 'start'事件的附加字段
+
+        【出参】
+        info(dict): 调用方可在阶段中写入'end'事件的附加字段(如matrix=结果矩阵)
+        """
+        info = {}
+        if not self.sinks:
+            yield info
+            return
+        self.emit(name, 'start', **fields)
+        if self.trace_memory:
+            self._enter_memory()
+        start, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield info
+        except BaseException as error:
+            info['error'] = type(error).__name__
+            raise
+        finally:
+            elapsed, cpu = time.perf_counter() - start, time.process_time() - cpu
+            if self.trace_memory:
+                info['traced_peak'] = self._exit_memory()
+            self.emit(name, 'end', elapsed=elapsed, cpu=cpu, memory=peak_memory(), **info)
+
+    def _enter_memory(self):
+        if not self._memory_stack and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        current, peak = tracemalloc.get_traced_memory()
+        if self._memory_stack:
+            # 重置峰值前把父阶段到目前为止的峰值记入父阶段
+            self._memory_stack[-1][1] = max(self._memory_stack[-1][1], peak)
+        tracemalloc.reset_peak()
+        self._memory_stack.append([current, 0])
+
+    def _exit_memory(self):
+        start, child_peak = self._memory_stack.pop()
+        peak = max(tracemalloc.get_traced_memory()[1], child_peak)
+        if self._memory_stack:
+            self._memory_stack[-1][1] = max(self._memory_stack[-1][1], peak)
+        elif self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+        return peak - start
+
+
+# 默认不输出任何信息
+QUIET = Progress()
+
+
+def print_sink(event, file=None):
+    """
+    【函数功能】把事件打印为一行摘要(不打印矩阵内容)
+    """
+    fields = ', '.join('{}={}'.format(key, '{:.3f}s'.format(value) if key == 'elapsed' else value)
+                       for key, value in event.items() if key not in ('stage', 'event', 'time', 'thread') and value is not None)
+    print('[{}] {}{}'.format(event['stage'], event['event'], ': ' + fields if fields else ''), file=file or sys.stdout)
+
+
+def logging_sink(logger, level=20):
+    """
+    【函数功能】生成把事件写入logging.Logger的输出端(默认INFO级别)
+    """
+    def sink(event):
+        logger.log(level, '%s %s %s', event['stage'], event['event'],
+                   {key: value for key, value in event.items() if key not in ('stage', 'event', 'time', 'thread')})
+    return sink
+
+
+class StageReport:
+    def __init__(self):
+        """
+        【函数功能】收集各阶段'end'事件的输出端, 给出可机读的统计报告, 并可导出为JSON或Chrome trace(chrome://tracing, Perfetto)
+        每个阶段的记录包含stage, start、end(相对第一个事件的时刻, s), depth(嵌套层数)以及'end'事件的字段
+        """
+        self.stages = []
+        self._origin = None
+        # 各线程未结束阶段的开始时刻
+        self._open = {}
+
+    def __call__(self, event):
+        if self._origin is None:
+            self._origin = event['time']
+        opened = self._open.setdefault(event['thread'], [])
+        if event['event'] == 'start':
+            opened.append(event['time'] - self._origin)
+            return
+        record = {key: value for key, value in event.items() if key not in ('event', 'time')}
+        record['start'] = opened.pop()
+        record['end'] = event['time'] - self._origin
+        record['depth'] = len(opened)
+        self.stages.append(record)
+
+    def as_dict(self):
+        """
+        【函数功能】按开始时刻排序的各阶段记录
+        """
+        return {'stages': sorted(self.stages, key=lambda record: (record['start'], record['depth']))}
+
+    def to_json(self, path):
+        """
+        【函数功能】把报告写入JSON文件
+        """
+        with open(path, 'w') as f:
+            json.dump(self.as_dict(), f, indent=2, default=_json_default)
+
+    def to_chrome_trace(self, path):
+        """
+        【函数功能】把报告写入Chrome trace格式(完整事件'X', 时间单位为us)的JSON文件
+        """
+        events = []
+        for record in self.as_dict()['stages']:
+            args = {key: value for key, value in record.items() if key not in ('stage', 'start', 'end', 'thread', 'depth')}
+            events.append({'name': record['stage'], 'ph': 'X', 'ts': record['start'] * 1e6, 'dur': (record['end'] - record['start']) * 1e6,
+                           'pid': os.getpid(), 'tid': record['thread'], 'args': args})
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f, default=_json_default)
+
+
+def _json_default(value):
+    # numpy标量等不能直接序列化的值
+    if hasattr(value, 'item'):
+        return value.item()
+    return str(value)
@@ -7,6 +7,7 @@ from Model.Contant import Constant
 from Model.Tower import Tower
 from Driver.initialization.initialization import initialize_tower
 from Driver.modeling.tower_modeling import tower_building
+from Utils.Progress import Progress, print_sink
 
 
 if __name__ == '__main__':
@@ -24,7 +25,11 @@ if __name__ == '__main__':
     # 线段的最大长度, 后续会按照这个长度, 对不符合长度规范的线段进行切分
     max_length = 50
 
+    # 按阶段输出建模进度的摘要(耗时、矩阵大小、非零元素数、内存)
+    progress = Progress([print_sink])
+
     tower = initialize_tower(file_name = "01_2",
-                             max_length = max_length)
+                             max_length = max_length,
+                             progress = progress)
 
-    tower_building(tower, f0, max_length)
\ No newline at end of file
+    tower_building(tower, f0, max_length, progress=progress)
\ No newline at end of file